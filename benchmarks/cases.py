@@ -0,0 +1,209 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+"""
+Benchmark cases.
+
+Each case is a function taking the number of particles and returning a
+callable that performs the measured operation. Everything that should not be
+timed (line construction, twiss, kernel compilation, ...) happens in the
+setup function, before the callable is returned.
+"""
+
+import functools
+
+import numpy as np
+
+import toy_lines
+
+NEMITT_X = 2e-6
+NEMITT_Y = 2.5e-6
+SIGMA_Z = 0.08
+
+CASES = {}
+
+
+def case(name, max_num_particles=int(1e8)):
+    def decorator(setup):
+        CASES[name] = dict(setup=setup, max_num_particles=max_num_particles)
+        return setup
+    return decorator
+
+
+@functools.lru_cache(maxsize=None)
+def _line(kind):
+    if kind == 'segment':
+        return toy_lines.make_segment_line()
+    elif kind == 'segment_linear':
+        return toy_lines.make_segment_line(longitudinal_mode='linear_fixed_qs')
+    elif kind == 'cavity':
+        return toy_lines.make_cavity_line()
+    raise ValueError(f'Unknown line {kind}')
+
+
+# Transverse generators
+
+@case('hypersphere_2D')
+def setup_hypersphere_2D(num_particles):
+    import xpart as xp
+    return lambda: xp.generate_hypersphere_2D(num_particles)
+
+
+@case('hypersphere_4D')
+def setup_hypersphere_4D(num_particles):
+    import xpart as xp
+    return lambda: xp.generate_hypersphere_4D(num_particles)
+
+
+@case('hypersphere_6D')
+def setup_hypersphere_6D(num_particles):
+    import xpart as xp
+    return lambda: xp.generate_hypersphere_6D(num_particles)
+
+
+@case('gaussian_2D_sobol')
+def setup_gaussian_2D_sobol(num_particles):
+    import xpart as xp
+    return lambda: xp.generate_2D_gaussian(num_particles, sampling='sobol')
+
+
+@case('pencil_2D')
+def setup_pencil_2D(num_particles):
+    import xpart as xp
+    return lambda: xp.generate_2D_pencil(num_particles, pos_cut_sigmas=5.,
+                                         dr_sigmas=0.1, side='+-')
+
+
+@case('q_gaussian_round_4D', max_num_particles=int(1e6))
+def setup_q_gaussian_round_4D(num_particles):
+    import xpart as xp
+    sample_space = np.linspace(0, 15, 1000)
+    return lambda: xp.generate_round_4D_q_gaussian_normalised(
+        q=1.2, beta=1., n_part=num_particles, sample_space=sample_space)
+
+
+# Particles construction
+
+def _setup_build_particles(num_particles, mode):
+    import xpart as xp
+
+    line = _line('segment')
+    # Twiss is done once at setup, the timing covers the particle creation
+    tw = line.twiss()
+    rng = np.random.default_rng(0)
+    x_norm, px_norm, y_norm, py_norm = rng.normal(size=(4, num_particles))
+    zeta = rng.normal(scale=SIGMA_Z, size=num_particles)
+    delta = rng.normal(scale=1e-4, size=num_particles)
+
+    if mode == 'normalized':
+        return lambda: xp.build_particles(
+            mode='normalized_transverse',
+            W_matrix=tw.W_matrix[0], particle_on_co=tw.particle_on_co,
+            x_norm=x_norm, px_norm=px_norm, y_norm=y_norm, py_norm=py_norm,
+            zeta=zeta, delta=delta,
+            nemitt_x=NEMITT_X, nemitt_y=NEMITT_Y)
+    return lambda: xp.build_particles(
+        line=line, mode=mode, x=1e-3*x_norm, px=1e-5*px_norm,
+        y=1e-3*y_norm, py=1e-5*py_norm, zeta=zeta, delta=delta)
+
+
+@case('build_particles_set')
+def setup_build_particles_set(num_particles):
+    return _setup_build_particles(num_particles, 'set')
+
+
+@case('build_particles_shift')
+def setup_build_particles_shift(num_particles):
+    return _setup_build_particles(num_particles, 'shift')
+
+
+@case('build_particles_normalized')
+def setup_build_particles_normalized(num_particles):
+    return _setup_build_particles(num_particles, 'normalized')
+
+
+# Longitudinal matchers
+
+@case('rfbucket_matcher', max_num_particles=int(1e7))
+def setup_rfbucket_matcher(num_particles):
+    import xpart as xp
+    from xpart.longitudinal.rfbucket_matching import (
+        RFBucketMatcher, ThermalDistribution)
+
+    rfbucket = xp.longitudinal.generate_longitudinal.get_bucket(
+        _line('segment'))
+    matcher = RFBucketMatcher(rfbucket=rfbucket,
+                              distribution_type=ThermalDistribution,
+                              sigma_z=SIGMA_Z)
+    return lambda: matcher.generate(num_particles)
+
+
+def _setup_single_rf_harmonic(num_particles, distribution):
+    import xpart as xp
+
+    line = _line('segment')
+    return lambda: xp.generate_longitudinal_coordinates(
+        line=line, num_particles=num_particles, distribution=distribution,
+        sigma_z=SIGMA_Z, engine='single-rf-harmonic')
+
+
+@case('single_rf_harmonic_gaussian')
+def setup_single_rf_harmonic_gaussian(num_particles):
+    return _setup_single_rf_harmonic(num_particles, 'gaussian')
+
+
+@case('single_rf_harmonic_parabolic')
+def setup_single_rf_harmonic_parabolic(num_particles):
+    return _setup_single_rf_harmonic(num_particles, 'parabolic')
+
+
+# Full bunches
+
+def _setup_matched_bunch(num_particles, line_kind, engine):
+    import xpart as xp
+
+    line = _line(line_kind)
+    return lambda: xp.generate_matched_gaussian_bunch(
+        line=line, num_particles=num_particles,
+        nemitt_x=NEMITT_X, nemitt_y=NEMITT_Y, sigma_z=SIGMA_Z,
+        total_intensity_particles=1e11, engine=engine)
+
+
+@case('matched_bunch_pyheadtail', max_num_particles=int(1e6))
+def setup_matched_bunch_pyheadtail(num_particles):
+    return _setup_matched_bunch(num_particles, 'segment', 'pyheadtail')
+
+
+@case('matched_bunch_single_rf_harmonic')
+def setup_matched_bunch_single_rf_harmonic(num_particles):
+    return _setup_matched_bunch(num_particles, 'segment',
+                                'single-rf-harmonic')
+
+
+@case('matched_bunch_cavity')
+def setup_matched_bunch_cavity(num_particles):
+    return _setup_matched_bunch(num_particles, 'cavity',
+                                'single-rf-harmonic')
+
+
+@case('matched_bunch_linear')
+def setup_matched_bunch_linear(num_particles):
+    return _setup_matched_bunch(num_particles, 'segment_linear', None)
+
+
+@case('multibunch_beam', max_num_particles=int(1e7))
+def setup_multibunch_beam(num_particles):
+    import xpart as xp
+
+    line = _line('segment')
+    filling_scheme = np.zeros(35640, dtype=int)
+    filling_scheme[:10] = 1
+    return lambda: xp.generate_matched_gaussian_multibunch_beam(
+        filling_scheme=filling_scheme,
+        bunch_num_particles=num_particles // 10,
+        bunch_intensity_particles=1e11,
+        nemitt_x=NEMITT_X, nemitt_y=NEMITT_Y, sigma_z=SIGMA_Z,
+        line=line, bucket_length=toy_lines.CIRCUMFERENCE/35640,
+        bunch_spacing_buckets=1)
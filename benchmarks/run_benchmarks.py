@@ -0,0 +1,216 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+"""
+Benchmark runner for the xpart generators and matchers.
+
+Every (case, size) pair is run in a fresh subprocess, so that the peak
+resident memory of one measurement is not polluted by the previous ones.
+For each pair the runner records:
+
+- wall_time_s: minimum wall-clock time over the repeats
+- peak_rss_mb: increase of the peak resident set size during the runs
+- peak_alloc_mb: peak of the memory traced by tracemalloc (numpy arrays
+  included) during one additional run
+- num_allocs: number of live allocated blocks at the tracemalloc peak
+
+Examples
+--------
+Run a subset of the cases and store the results:
+
+    python run_benchmarks.py --sizes 1e4 1e5 --cases hypersphere \\
+        --output results.json
+
+Compare against the results of a previous release (non-zero exit code if
+any case is slower than the tolerance allows):
+
+    python run_benchmarks.py --output new.json --compare results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _peak_rss_mb():
+    import resource
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on linux, bytes on macOS
+    if sys.platform == 'darwin':
+        return maxrss / 1024**2
+    return maxrss / 1024
+
+
+def run_single(case_name, num_particles, repeat):
+    '''
+    Run one benchmark in the current process and return the measurements.
+    '''
+
+    import gc
+    import tracemalloc
+
+    from cases import CASES
+
+    setup = CASES[case_name]['setup']
+    # Warm up with few particles (kernel compilation, caches, lazy imports)
+    setup(min(num_particles, 1000))()
+    func = setup(num_particles)
+
+    gc.collect()
+    rss_before = _peak_rss_mb()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+        gc.collect()
+    rss_after = _peak_rss_mb()
+
+    # Separate run, tracemalloc slows down the execution
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    func()
+    _, peak_alloc = tracemalloc.get_traced_memory()
+    num_allocs = len(tracemalloc.take_snapshot().traces)
+    tracemalloc.stop()
+
+    return dict(wall_time_s=min(times),
+                peak_rss_mb=max(rss_after - rss_before, 0.),
+                peak_alloc_mb=peak_alloc / 1024**2,
+                num_allocs=num_allocs)
+
+
+def _run_in_subprocess(case_name, num_particles, repeat, timeout):
+    cmd = [sys.executable, os.path.join(HERE, 'run_benchmarks.py'),
+           '--_child', case_name, str(num_particles), str(repeat)]
+    try:
+        out = subprocess.run(cmd, cwd=HERE, capture_output=True, text=True,
+                             timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return dict(error=f'timeout after {timeout} s')
+    if out.returncode != 0:
+        return dict(error=out.stderr.strip().splitlines()[-1]
+                    if out.stderr.strip() else f'exit code {out.returncode}')
+    # Last line of stdout holds the results, the rest is output of the case
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _metadata():
+    import numpy as np
+    import xobjects as xo
+    import xpart as xp
+    import xtrack as xt
+
+    return dict(xpart=xp.__version__, xtrack=xt.__version__,
+                xobjects=xo.__version__, numpy=np.__version__,
+                python=platform.python_version(),
+                platform=platform.platform(),
+                machine=platform.machine(),
+                date=time.strftime('%Y-%m-%dT%H:%M:%S'))
+
+
+def compare(results, baseline, tolerance):
+    '''
+    Compare the wall times of two result sets. Return the list of the
+    (case, size) pairs slower than `(1 + tolerance)` times the baseline.
+    '''
+
+    regressions = []
+    for key, res in results.items():
+        ref = baseline.get(key)
+        if ref is None or 'error' in res or 'error' in ref:
+            continue
+        ratio = res['wall_time_s'] / ref['wall_time_s']
+        flag = ''
+        if ratio > 1 + tolerance:
+            regressions.append(key)
+            flag = '  <-- REGRESSION'
+        print(f'{key:50s} {ref["wall_time_s"]:10.4f} s -> '
+              f'{res["wall_time_s"]:10.4f} s  (x{ratio:.2f}){flag}')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0],
+                        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', type=float,
+                        default=[1e4, 1e5, 1e6],
+                        help='numbers of particles (up to 1e8)')
+    parser.add_argument('--cases', nargs='+', default=None,
+                        help='run only cases whose name contains one of '
+                             'these strings')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=3600.)
+    parser.add_argument('--output', default=None,
+                        help='JSON file where results are stored')
+    parser.add_argument('--compare', default=None,
+                        help='JSON file with baseline results')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed relative slow-down w.r.t. baseline')
+    parser.add_argument('--list', action='store_true',
+                        help='list the available cases and exit')
+    parser.add_argument('--_child', nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, HERE)
+
+    if args._child is not None:
+        case_name, num_particles, repeat = args._child
+        res = run_single(case_name, int(num_particles), int(repeat))
+        print(json.dumps(res))
+        return 0
+
+    from cases import CASES
+
+    if args.list:
+        for name, cc in CASES.items():
+            print(f'{name:40s} max_num_particles={cc["max_num_particles"]:.0e}')
+        return 0
+
+    names = [nn for nn in CASES
+             if args.cases is None or any(ss in nn for ss in args.cases)]
+
+    results = {}
+    for name in names:
+        for size in args.sizes:
+            num_particles = int(size)
+            if num_particles > CASES[name]['max_num_particles']:
+                continue
+            key = f'{name}[{num_particles:.0e}]'
+            res = _run_in_subprocess(name, num_particles, args.repeat,
+                                     args.timeout)
+            res.update(case=name, num_particles=num_particles)
+            results[key] = res
+            if 'error' in res:
+                print(f'{key:50s} ERROR: {res["error"]}')
+            else:
+                print(f'{key:50s} {res["wall_time_s"]:10.4f} s '
+                      f'{res["peak_rss_mb"]:10.1f} MB rss '
+                      f'{res["peak_alloc_mb"]:10.1f} MB alloc')
+
+    if args.output is not None:
+        with open(args.output, 'w') as fid:
+            json.dump(dict(metadata=_metadata(), results=results), fid,
+                      indent=2)
+
+    if args.compare is not None:
+        with open(args.compare, 'r') as fid:
+            baseline = json.load(fid)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f'{len(regressions)} regression(s) found.')
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
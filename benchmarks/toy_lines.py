@@ -0,0 +1,69 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+"""
+In-memory toy lines used by the benchmarks, so that the suite runs offline
+and does not depend on external lattice files.
+"""
+
+import xtrack as xt
+
+# LHC-like parameters at injection
+CIRCUMFERENCE = 26658.883
+P0C = 450e9
+RF_FREQUENCY = 400.79e6
+RF_VOLTAGE = 6e6
+MOMENTUM_COMPACTION = 3.48e-4
+
+
+def _particle_ref():
+    return xt.Particles(p0c=P0C, mass0=xt.PROTON_MASS_EV, q0=1)
+
+
+def make_segment_line(longitudinal_mode='nonlinear'):
+    '''
+    One-turn map line with a single RF harmonic (LineSegmentMap).
+    '''
+
+    kwargs = dict(length=CIRCUMFERENCE, betx=100., bety=100.,
+                  qx=62.31, qy=60.32, dqx=2., dqy=2.)
+    if longitudinal_mode == 'nonlinear':
+        kwargs.update(longitudinal_mode='nonlinear',
+                      momentum_compaction_factor=MOMENTUM_COMPACTION,
+                      voltage_rf=[RF_VOLTAGE], frequency_rf=[RF_FREQUENCY],
+                      lag_rf=[180.])
+    elif longitudinal_mode == 'linear_fixed_qs':
+        kwargs.update(longitudinal_mode='linear_fixed_qs', qs=2e-3,
+                      bets=300.)
+    else:
+        raise ValueError(f'Unknown longitudinal mode {longitudinal_mode}')
+
+    line = xt.Line(elements=[xt.LineSegmentMap(**kwargs)],
+                   element_names=['segment'])
+    line.particle_ref = _particle_ref()
+    line.build_tracker()
+    return line
+
+
+def make_cavity_line():
+    '''
+    Line made of a linear one-turn map for the transverse planes followed by
+    an RF cavity (xt.Cavity), providing the longitudinal focusing.
+    '''
+
+    segment = xt.LineSegmentMap(length=CIRCUMFERENCE, betx=100., bety=100.,
+                                qx=62.31, qy=60.32,
+                                momentum_compaction_factor=MOMENTUM_COMPACTION,
+                                longitudinal_mode='nonlinear',
+                                # slippage only, the RF is in the cavity
+                                voltage_rf=[0.], frequency_rf=[RF_FREQUENCY],
+                                lag_rf=[0.])
+    cavity = xt.Cavity(frequency=RF_FREQUENCY, voltage=RF_VOLTAGE, lag=180.)
+
+    line = xt.Line(elements=[segment, cavity],
+                   element_names=['segment', 'cavity'])
+    line.particle_ref = _particle_ref()
+    line.build_tracker()
+    return line
@@ -0,0 +1,95 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+import numpy as np
+
+import xpart as xp
+
+CIRCUMFERENCE = 26658.883
+H_RF = 35640
+
+
+def test_bucket_train_satellites():
+    particle_ref = xp.Particles(p0c=450e9, mass0=xp.PROTON_MASS_EV)
+    bunch_spacing_buckets = 10
+    filling_scheme = np.zeros(H_RF // bunch_spacing_buckets, dtype=int)
+    filling_scheme[[0, 1, 2, 5, 100]] = 1
+
+    train = xp.get_bucket_train(filling_scheme,
+                                bunch_spacing_buckets=bunch_spacing_buckets,
+                                particle_ref=particle_ref,
+                                circumference=CIRCUMFERENCE,
+                                momentum_compaction_factor=3.48e-4,
+                                rf_harmonic=[H_RF], rf_voltage=[6e6],
+                                rf_phase=[np.pi])
+    bucket_length = CIRCUMFERENCE / H_RF
+    assert train.num_buckets == H_RF
+    assert train.num_bunches == 5
+    assert np.all(train.filled_buckets == [0, 10, 20, 50, 1000])
+    assert np.allclose(train.bucket_centres, -train.filled_buckets
+                       * bucket_length, rtol=0, atol=1e-12)
+
+    # Particles in the first bucket, classified with the separatrix
+    rfbucket = train.rfbucket
+    rng = np.random.default_rng(0)
+    n_part = 20000
+    dp_max = rfbucket.separatrix(rfbucket.z_sfp_extr)
+    z0 = rng.uniform(rfbucket.z_left, rfbucket.z_right, n_part)
+    dp0 = rng.uniform(-1.1, 1.1, n_part) * dp_max
+    captured = rfbucket.is_in_separatrix(z0, dp0)
+
+    # Main bunches, plus the same particles in a satellite bucket (next to
+    # bunch 2) and one particle beyond the end of the ring
+    buckets = np.concatenate([np.repeat(train.filled_buckets, n_part),
+                              np.full(n_part, 21), [H_RF + 3]])
+    zeta = np.concatenate([np.tile(z0, train.num_bunches + 1), [0.]])
+    delta = np.concatenate([np.tile(dp0, train.num_bunches + 1), [0.]])
+    zeta -= buckets * bucket_length
+
+    in_bucket, bucket_index = train.classify(zeta, delta)
+    assert np.all(bucket_index == buckets)
+    assert np.all(in_bucket[:-1] == np.tile(captured,
+                                            train.num_bunches + 1))
+
+    bunch_number = train.get_bunch_number(bucket_index)
+    assert np.all(bunch_number == np.concatenate([
+        np.repeat(np.arange(train.num_bunches), n_part), # bunches
+        np.full(n_part + 1, -1)])) # satellites and beyond the ring
+
+    population = train.get_bucket_population(zeta, delta)
+    assert len(population) == H_RF
+    assert np.all(population[train.filled_buckets] == captured.sum())
+    assert population[21] == captured.sum()
+    assert population.sum() == (train.num_bunches + 1) * captured.sum()
+
+    weights = np.full(len(zeta), 2.)
+    population_w = train.get_bucket_population(zeta, delta, weights=weights)
+    assert np.all(population_w == 2 * population)
+
+
+def test_bucket_train_main_harmonic():
+    # The bucket length is given by the harmonic of the largest voltage, as
+    # for the bunch spacing in generate_matched_gaussian_multibunch_beam
+    particle_ref = xp.Particles(p0c=450e9, mass0=xp.PROTON_MASS_EV)
+    filling_scheme = np.zeros(100, dtype=int)
+    filling_scheme[[0, 3]] = 1
+
+    train = xp.get_bucket_train(filling_scheme, bunch_spacing_buckets=10,
+                                particle_ref=particle_ref,
+                                circumference=CIRCUMFERENCE,
+                                momentum_compaction_factor=3.48e-4,
+                                rf_harmonic=[H_RF // 2, H_RF],
+                                rf_voltage=[1e6, 6e6],
+                                rf_phase=[np.pi, np.pi])
+    bucket_length = CIRCUMFERENCE / H_RF
+    assert np.isclose(train.bucket_length, bucket_length, rtol=1e-14)
+    assert len(train.filling_scheme) == H_RF // 10
+    assert train.num_buckets == H_RF
+    assert np.all(train.filled_buckets == [0, 30])
+
+    zeta = train.rfbucket.z_sfp_extr - np.array([0, 30, 31]) * bucket_length
+    _, bucket_index = train.classify(zeta, np.zeros(3))
+    assert np.all(bucket_index == [0, 30, 31])
+    assert np.all(train.get_bunch_number(bucket_index) == [0, 1, -1])
@@ -241,3 +241,35 @@ def test_build_perticles_dispersion(test_context):
     xo.assert_allclose(norm_coords['px_norm'], [0.5, 0.6], 1e-12)
     xo.assert_allclose(norm_coords['y_norm'], [0.7, 0.8], 1e-12)
     xo.assert_allclose(norm_coords['py_norm'], [0.9, 1.0], 1e-12)
+
+
+def test_build_particles_match_at_s_analytic_drift():
+    line = xt.Line(
+        elements=[xt.Multipole(knl=[1e-4, 0.1], ksl=[2e-5]),
+                  xt.Drift(length=2.), xt.Marker(), xt.Drift(length=3.),
+                  xt.Multipole(knl=[0, -0.1]), xt.Drift(length=5.)],
+        element_names=['qf', 'd1', 'm1', 'd2', 'qd', 'd3'])
+    line.particle_ref = xp.Particles(p0c=1e9, mass0=xp.PROTON_MASS_EV)
+    line.build_tracker()
+
+    match_at_s = line.get_s_position('m1') + 1.5
+    tw_at_s = line.twiss(method='4d', delta0=1e-3, at_s=[match_at_s])
+
+    particles = line.build_particles(
+                    x=2e-3, px_norm=np.linspace(-1, 1, 11),
+                    y_norm=0.5, py_norm=-0.3,
+                    delta=1e-3 + np.linspace(-1e-4, 1e-4, 11),
+                    nemitt_x=2e-6, nemitt_y=2e-6, method='4d', delta0=1e-3,
+                    at_element='m1', match_at_s=match_at_s)
+
+    assert np.all(particles.at_element == line.element_names.index('m1'))
+    assert np.all(particles.s == line.get_s_position('m1'))
+
+    xt.Drift(length=1.5).track(particles)
+    xo.assert_allclose(particles.x, 2e-3, rtol=0, atol=1e-14)
+    norm_coords = tw_at_s.get_normalized_coordinates(particles,
+                        nemitt_x=2e-6, nemitt_y=2e-6, _force_at_element=0)
+    xo.assert_allclose(norm_coords.px_norm, np.linspace(-1, 1, 11),
+                       rtol=0, atol=1e-7)
+    xo.assert_allclose(norm_coords.y_norm, 0.5, rtol=0, atol=1e-7)
+    xo.assert_allclose(norm_coords.py_norm, -0.3, rtol=0, atol=1e-7)
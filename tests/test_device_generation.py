@@ -0,0 +1,124 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+import numpy as np
+
+import xpart as xp
+import xobjects as xo
+import xtrack.linear_normal_form as lnf
+from xobjects.test_helpers import for_all_test_contexts
+from xpart.sampling import normal_on_context
+
+
+def _rotation(mu, beta):
+    return np.array([[np.cos(mu), beta * np.sin(mu)],
+                     [-np.sin(mu) / beta, np.cos(mu)]])
+
+
+@for_all_test_contexts
+def test_build_particles_from_context_arrays(test_context):
+    R_matrix = np.eye(6)
+    R_matrix[:2, :2] = _rotation(2 * np.pi * 0.31, 80.)
+    R_matrix[2:4, 2:4] = _rotation(2 * np.pi * 0.32, 30.)
+    R_matrix[4:, 4:] = _rotation(2 * np.pi * 0.002, 900.)
+
+    particle_on_co = xp.Particles(p0c=450e9, mass0=xp.PROTON_MASS_EV,
+                                  x=1e-3, py=2e-5)
+
+    num_particles = 1000
+    rng = np.random.default_rng(0)
+    coords = {nn: rng.normal(size=num_particles)
+              for nn in ['x_norm', 'px_norm', 'y_norm', 'py_norm']}
+    coords['zeta'] = 0.1 * rng.normal(size=num_particles)
+    coords['pzeta'] = 1e-4 * rng.normal(size=num_particles)
+
+    particles = xp.build_particles(
+        _context=test_context, particle_on_co=particle_on_co,
+        R_matrix=R_matrix, nemitt_x=2e-6, nemitt_y=3e-6,
+        **{kk: test_context.nparray_to_context_array(vv)
+           for kk, vv in coords.items()})
+
+    # Reference from the full linear system solved on the host
+    gemitt_x = 2e-6 / particle_on_co.beta0[0] / particle_on_co.gamma0[0]
+    gemitt_y = 3e-6 / particle_on_co.beta0[0] / particle_on_co.gamma0[0]
+    WW, _, _, _ = lnf.compute_linear_normal_form(R_matrix)
+    AA = np.zeros((12, 12))
+    AA[:6, :6] = np.eye(6)
+    AA[:6, 6:] = -WW
+    for ii, jj in enumerate([4, 5, 6, 7, 8, 9]):
+        AA[6 + ii, jj] = 1
+    BB = np.zeros((12, num_particles))
+    BB[0] = 1e-3
+    BB[3] = 2e-5
+    BB[6] = coords['zeta']
+    BB[7] = coords['pzeta']
+    BB[8] = np.sqrt(gemitt_x) * coords['x_norm']
+    BB[9] = np.sqrt(gemitt_x) * coords['px_norm']
+    BB[10] = np.sqrt(gemitt_y) * coords['y_norm']
+    BB[11] = np.sqrt(gemitt_y) * coords['py_norm']
+    XX = np.linalg.solve(AA, BB)[:6]
+
+    dct = particles.to_dict()
+    for ii, nn in enumerate(['x', 'px', 'y', 'py', 'zeta']):
+        xo.assert_allclose(dct[nn], XX[ii], rtol=0,
+                           atol=1e-12 * np.max(np.abs(XX[ii])))
+    xo.assert_allclose(dct['ptau'], XX[5] * particle_on_co.beta0[0],
+                       rtol=0, atol=1e-16)
+    xo.assert_allclose(dct['particle_id'], np.arange(num_particles))
+    assert np.all(dct['state'] == 1)
+
+
+@for_all_test_contexts
+def test_matched_gaussian_bunch_on_context(test_context):
+    R_matrix = np.eye(6)
+    R_matrix[:2, :2] = _rotation(2 * np.pi * 0.31, 80.)
+    R_matrix[2:4, 2:4] = _rotation(2 * np.pi * 0.32, 30.)
+    R_matrix[4:, 4:] = _rotation(2 * np.pi * 0.002, 900.)
+    particle_on_co = xp.Particles(p0c=450e9, mass0=xp.PROTON_MASS_EV)
+
+    xx = normal_on_context(100, test_context)
+    assert len(xx) == 100
+    if isinstance(test_context, xo.ContextCpu):
+        # Same stream as np.random on cpu
+        np.random.seed(1)
+        xx = normal_on_context(100, test_context)
+        np.random.seed(1)
+        assert np.all(xx == np.random.normal(size=100))
+
+    num_particles = 20000
+    particles = xp.generate_matched_gaussian_bunch(
+        _context=test_context, num_particles=num_particles,
+        nemitt_x=2e-6, nemitt_y=3e-6, sigma_z=0.09,
+        particle_on_co=particle_on_co, R_matrix=R_matrix,
+        circumference=26658.883, momentum_compaction_factor=3.48e-4,
+        rf_harmonic=[35640], rf_voltage=[6e6], rf_phase=[np.pi])
+
+    dct = particles.to_dict()
+    gemitt_x = 2e-6 / particle_on_co.beta0[0] / particle_on_co.gamma0[0]
+    assert np.isclose(np.std(dct['x']), np.sqrt(80. * gemitt_x), rtol=0.03)
+    assert np.isclose(np.std(dct['zeta']), 0.09, rtol=0.03)
+    assert np.all(dct['state'] == 1)
+
+
+@for_all_test_contexts
+def test_build_particles_per_particle_fields(test_context):
+    particle_ref = xp.Particles(p0c=450e9, mass0=xp.PROTON_MASS_EV,
+                                spin_x=0.5)
+    weight = np.linspace(1., 2., 10)
+    particles = xp.build_particles(_context=test_context,
+                                   particle_ref=particle_ref,
+                                   x=np.linspace(-1e-3, 1e-3, 10),
+                                   delta=1e-3, weight=weight, spin_z=0.25,
+                                   _capacity=15)
+
+    dct = particles.to_dict()
+    xo.assert_allclose(dct['x'][:10], np.linspace(-1e-3, 1e-3, 10))
+    xo.assert_allclose(dct['delta'][:10], 1e-3, rtol=1e-12)
+    xo.assert_allclose(dct['weight'][:10], weight)
+    xo.assert_allclose(dct['spin_x'][:10], 0.5)
+    xo.assert_allclose(dct['spin_z'][:10], 0.25)
+    assert np.all(dct['particle_id'][:10] == np.arange(10))
+    assert np.all(dct['state'][:10] == 1)
+    assert np.all(dct['state'][10:] < 0)
@@ -0,0 +1,90 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+import numpy as np
+import pytest
+from scipy.special import erfc
+
+import xpart as xp
+
+
+def _rotation(mu, beta):
+    return np.array([[np.cos(mu), beta * np.sin(mu)],
+                     [-np.sin(mu) / beta, np.cos(mu)]])
+
+
+def test_gaussian_tail_uniform_action():
+    rng = np.random.default_rng(0)
+    x1, x2, weight = xp.generate_2D_gaussian_tail(
+        100000, mode='uniform_action', n_sigma_min=5, n_sigma_max=7, rng=rng)
+    amplitude = np.sqrt(x1**2 + x2**2)
+    assert np.all((amplitude >= 5 - 1e-12) & (amplitude <= 7 + 1e-12))
+
+    p_window = xp.gaussian_tail_probability(5, 7)
+    stats = xp.check_weights(weight, expected_mean=p_window)
+    assert np.isclose(stats['mean'], p_window, rtol=1e-2)
+
+    # Unbiased estimate of the Gaussian tail population beyond 6 sigma
+    estimate = np.sum(weight * (amplitude > 6)) / len(weight)
+    assert np.isclose(estimate, xp.gaussian_tail_probability(6, 7),
+                      rtol=2e-2)
+
+    with pytest.raises(ValueError):
+        xp.check_weights(weight, expected_mean=1.)
+    with pytest.raises(ValueError):
+        xp.generate_2D_gaussian_tail(10, mode='uniform_action',
+                                     n_sigma_min=5)
+
+
+def test_gaussian_tail_tilted():
+    x1, x2, weight = xp.generate_2D_gaussian_tail(
+        2**16, mode='tilted', scale=3., sampling='sobol',
+        rng=np.random.default_rng(1))
+    stats = xp.check_weights(weight, expected_mean=1.)
+    assert stats['effective_sample_size'] < len(weight)
+
+    # Many more particles beyond 4 sigma than for the Gaussian, with the
+    # correct weighted population
+    beyond = np.abs(x1) > 4
+    assert np.sum(beyond) > 1000
+    assert np.isclose(np.sum(weight * beyond) / len(weight),
+                      erfc(4 / np.sqrt(2)), rtol=5e-2)
+
+
+def test_hypersphere_gaussian_weights():
+    coords = xp.generate_hypersphere_4D(100000, rx=3, ry=3, rng_seed=3)
+    weight = xp.hypersphere_gaussian_weights(coords, r=3)
+    p_inside = 1 - np.exp(-4.5) * (1 + 4.5) # P(chi2_4 < 9)
+    xp.check_weights(weight, expected_mean=p_inside)
+
+    # Anisotropic radii
+    coords = xp.generate_hypersphere_4D(100000, rx=3, ry=2, rng_seed=3)
+    weight = xp.hypersphere_gaussian_weights(coords, r=[3, 3, 2, 2])
+    assert 0.5 < np.mean(weight) < p_inside
+
+
+def test_matched_gaussian_bunch_tail_sampling():
+    R_matrix = np.zeros((6, 6))
+    R_matrix[0:2, 0:2] = _rotation(2 * np.pi * 0.31, 100.)
+    R_matrix[2:4, 2:4] = _rotation(2 * np.pi * 0.32, 80.)
+    R_matrix[4:6, 4:6] = _rotation(-2 * np.pi * 0.002, 300.)
+
+    particle_on_co = xp.Particles(p0c=450e9, mass0=xp.PROTON_MASS_EV)
+    intensity = 1e11
+    part = xp.generate_matched_gaussian_bunch(
+        num_particles=10000, total_intensity_particles=intensity,
+        nemitt_x=2e-6, nemitt_y=2e-6, sigma_z=0.01,
+        particle_on_co=particle_on_co, R_matrix=R_matrix,
+        circumference=26658.883, momentum_compaction_factor=3.48e-4,
+        rf_harmonic=[35640], rf_voltage=[6e6], rf_phase=[np.pi],
+        tail_sampling={'x': dict(mode='uniform_action', n_sigma_min=4,
+                                 n_sigma_max=6)})
+
+    gemitt_x = 2e-6 / particle_on_co.beta0[0] / particle_on_co.gamma0[0]
+    amplitude = np.sqrt((part.x**2 + (100. * part.px)**2) / (100. * gemitt_x))
+    assert np.all((amplitude > 4 - 1e-6) & (amplitude < 6 + 1e-6))
+    assert np.isclose(np.sum(part.weight),
+                      intensity * xp.gaussian_tail_probability(4, 6),
+                      rtol=5e-2)
@@ -0,0 +1,54 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+import json
+import subprocess
+import sys
+
+# Generous budget, to be robust against slow CI machines. The import
+# of the full xtrack stack alone takes typically ~1 s.
+IMPORT_TIME_BUDGET_S = 0.5
+
+
+def _run_in_fresh_interpreter(code):
+    out = subprocess.run([sys.executable, '-c', code], check=True,
+                         capture_output=True, text=True)
+    return json.loads(out.stdout.splitlines()[-1])
+
+
+def test_import_transverse_generators_is_light():
+    res = _run_in_fresh_interpreter(
+        'import json, sys, time\n'
+        'import numpy\n'
+        't0 = time.perf_counter()\n'
+        'import xpart.transverse_generators\n'
+        'dt = time.perf_counter() - t0\n'
+        'heavy = [mm for mm in ("xtrack", "xobjects", "scipy") '
+        '         if mm in sys.modules]\n'
+        'print(json.dumps({"dt": dt, "heavy": heavy}))\n')
+
+    assert res['heavy'] == []
+    assert res['dt'] < IMPORT_TIME_BUDGET_S
+
+
+def test_lazy_attributes():
+    res = _run_in_fresh_interpreter(
+        'import json, sys\n'
+        'import xpart as xp\n'
+        'loaded_before = "xtrack" in sys.modules\n'
+        'import xtrack as xt\n'
+        'print(json.dumps({\n'
+        '    "loaded_before": loaded_before,\n'
+        '    "particles": xp.Particles is xt.Particles,\n'
+        '    "pmass": xp.pmass == xt.PROTON_MASS_EV,\n'
+        '    "bunch": callable(xp.generate_matched_gaussian_bunch),\n'
+        '    "longitudinal": hasattr(xp.longitudinal, "RFBucket") or '
+        '        hasattr(xp.longitudinal, "SingleRFHarmonicMatcher"),\n'
+        '    "build_particles": callable(xp.build_particles),\n'
+        '}))\n')
+
+    assert res == {'loaded_before': False, 'particles': True, 'pmass': True,
+                   'bunch': True, 'longitudinal': True,
+                   'build_particles': True}
@@ -0,0 +1,85 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+import os
+
+import numpy as np
+import pytest
+from scipy.constants import c as clight
+from scipy.constants import e as qe
+from scipy.constants import m_p
+
+from xpart.longitudinal import match_cache
+from xpart.longitudinal.rf_bucket import RFBucket
+from xpart.longitudinal.rfbucket_matching import (RFBucketMatcher,
+                                                  ThermalDistribution)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(match_cache, '_match_cache', None)
+    return match_cache.enable_match_cache(tmp_path / 'cache')
+
+
+def test_match_cache_store_and_evict(cache):
+    params = [dict(voltage=np.array([6e6, 1e6]), name='lhc', index=ii)
+              for ii in range(3)]
+    data = dict(table=np.linspace(0, 1, 1000))
+
+    assert cache.get(params[0]) is None
+    cache.put(params[0], data)
+    assert np.all(cache.get(params[0])['table'] == data['table'])
+    assert cache.get(dict(params[0], index=-1)) is None
+
+    path_0 = cache._path(match_cache.compute_key(params[0]))
+    entry_size = os.path.getsize(path_0)
+    t0 = os.path.getmtime(path_0)
+    cache.max_size = 2.5 * entry_size
+    for ii, pp in enumerate(params[1:3]):
+        # Make the access times distinguishable
+        os.utime(path_0, (t0 - 100,) * 2)
+        cache.put(pp, data)
+        os.utime(cache._path(match_cache.compute_key(pp)), (t0 + ii,) * 2)
+    # params[0] is the least recently used entry
+    assert cache.get(params[0]) is None
+    assert cache.get(params[1]) is not None
+    assert cache.get(params[2]) is not None
+
+    # No temporary files are left behind
+    assert sorted(pp.suffix for pp in cache.directory.iterdir()) == [
+                                                            '.npz', '.npz']
+
+
+def test_rfbucket_matcher_uses_cache(cache, monkeypatch):
+    gamma = 450e9 / (m_p * clight**2 / qe)
+
+    def make_matcher():
+        rfbucket = RFBucket(circumference=26658.883, gamma=gamma,
+                            mass_kg=m_p, charge_coulomb=qe,
+                            alpha_array=[3.48e-4], p_increment=0.,
+                            harmonic_list=[35640], voltage_list=[6e6],
+                            phi_offset_list=[np.pi])
+        return RFBucketMatcher(rfbucket=rfbucket,
+                               distribution_type=ThermalDistribution,
+                               sigma_z=0.09)
+
+    matcher = make_matcher()
+    matcher._match_with_cache()
+    H0 = matcher.psi_object.H0
+    z_left, z_right = matcher.rfbucket.z_left, matcher.rfbucket.z_right
+
+    # Second matching is served from the cache
+    def fail(*args, **kwargs):
+        raise AssertionError('matching was recomputed')
+    monkeypatch.setattr(RFBucketMatcher, 'psi_for_bunchlength_newton_method',
+                        fail)
+    matcher_2 = make_matcher()
+    monkeypatch.setattr(RFBucket, '_get_bucket_boundaries', fail)
+    z, dp, _, _ = matcher_2.generate(1000)
+
+    assert matcher_2.psi_object.H0 == H0
+    assert matcher_2.rfbucket.z_left == z_left
+    assert matcher_2.rfbucket.z_right == z_right
+    assert len(z) == len(dp) == 1000
@@ -0,0 +1,79 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+import numpy as np
+from scipy.constants import c as clight
+from scipy.constants import e as qe
+from scipy.constants import m_p
+
+import xpart as xp
+from xpart.longitudinal import MultiHarmonicMatcher, SingleRFHarmonicMatcher
+
+P0C = 450e9
+GAMMA0 = np.sqrt(1 + (P0C / (m_p * clight**2 / qe))**2)
+BETA0 = np.sqrt(1 - 1 / GAMMA0**2)
+CIRCUMFERENCE = 26658.883
+ALPHA = 3.48e-4
+ETA = ALPHA - 1 / GAMMA0**2
+F_RF = 400.79e6
+
+
+def test_multi_harmonic_matcher_single_harmonic_limit():
+    kwargs = dict(q0=1, length=CIRCUMFERENCE, p0c=P0C, slip_factor=ETA,
+                  beta0=BETA0, rms_bunch_length=0.09 / BETA0,
+                  distribution='parabolic')
+    multi = MultiHarmonicMatcher(voltage_list=[6e6], freq_list=[F_RF],
+                                 phase_list=[np.pi], **kwargs)
+    single = SingleRFHarmonicMatcher(voltage=6e6, freq=F_RF,
+                                     transformation_particles=20000, **kwargs)
+
+    assert np.isclose(multi.get_unstable_fixed_point(),
+                      single.get_unstable_fixed_point(), rtol=1e-8)
+    assert np.isclose(multi.get_synchrotron_tune(),
+                      single.get_synchrotron_tune(), rtol=1e-10)
+    rng = np.random.default_rng(0)
+    tau = rng.uniform(-0.3, 0.3, 100)
+    ptau = rng.uniform(-3e-4, 3e-4, 100)
+    assert np.allclose(multi.get_m(tau, ptau), single.get_m(tau, ptau),
+                       rtol=0, atol=1e-12)
+
+    # The tabulated action-angle map stays on the orbit of the requested m
+    m = rng.uniform(0, 0.95, 10000)
+    tau, ptau = multi.get_airbag_from_m(m, n_particles=None,
+                                        theta=rng.uniform(0, 2 * np.pi, 10000))
+    assert np.allclose(multi.get_m(tau, ptau), m, rtol=0, atol=1e-10)
+
+    tau, ptau = multi.sample(50000, sampling='sobol')
+    assert np.isclose(np.std(tau) * BETA0, 0.09, rtol=0.01)
+
+
+def test_generate_longitudinal_double_rf():
+    particle_ref = xp.Particles(p0c=P0C, mass0=xp.PROTON_MASS_EV)
+    voltage = [6e6, 3e6]
+    harmonic = [35640, 71280]
+    phase = [np.pi, np.pi] # bunch shortening mode
+    zeta, delta, matcher = xp.generate_longitudinal_coordinates(
+        num_particles=50000, distribution='gaussian', sigma_z=0.09,
+        engine='single-rf-harmonic', particle_ref=particle_ref,
+        circumference=CIRCUMFERENCE, momentum_compaction_factor=ALPHA,
+        rf_harmonic=harmonic, rf_voltage=voltage, rf_phase=phase,
+        sampling='sobol', return_matcher=True)
+
+    assert isinstance(matcher, MultiHarmonicMatcher)
+    assert np.isclose(np.std(zeta), 0.09, rtol=0.01)
+
+    # The distribution is stationary under a simple one-turn map
+    tau = zeta / BETA0
+    ptau = delta * BETA0
+    freq = np.array(harmonic) * BETA0 * clight / CIRCUMFERENCE
+    hist_0, edges = np.histogram(tau, bins=30, range=(-0.3, 0.3))
+    for _ in range(1000):
+        ptau = ptau + sum(vv * np.sin(pp - 2 * np.pi * ff / clight * tau)
+                          for vv, ff, pp in zip(voltage, freq, phase)) / P0C
+        tau = tau - CIRCUMFERENCE * ETA * ptau / BETA0**2
+    hist_1, _ = np.histogram(tau, bins=edges)
+    assert np.max(np.abs(hist_1 - hist_0)) < 0.03 * np.max(hist_0)
+    assert np.isclose(np.std(tau[np.abs(tau) < 0.37]) * BETA0, 0.09,
+                      rtol=0.01)
@@ -0,0 +1,138 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+import numpy as np
+
+import xpart as xp
+import xpart.linear_normal_form as lnf
+import xobjects as xo
+from xobjects.test_helpers import for_all_test_contexts
+
+
+def _rotation(mu, beta, alpha=0.):
+    gamma = (1 + alpha**2) / beta
+    return np.array([[np.cos(mu) + alpha * np.sin(mu), beta * np.sin(mu)],
+                     [-gamma * np.sin(mu), np.cos(mu) - alpha * np.sin(mu)]])
+
+
+def _one_turn_matrix(qx=0.31):
+    R_matrix = np.eye(6)
+    R_matrix[:2, :2] = _rotation(2 * np.pi * qx, 80., 1.2)
+    R_matrix[2:4, 2:4] = _rotation(2 * np.pi * 0.32, 30., -0.5)
+    R_matrix[4:, 4:] = _rotation(2 * np.pi * 0.002, 900.)
+    return R_matrix
+
+
+def test_normal_form_cache(monkeypatch):
+    n_calls = []
+    compute = lnf.compute_linear_normal_form
+    def counting_compute(*args, **kwargs):
+        n_calls.append(1)
+        return compute(*args, **kwargs)
+    monkeypatch.setattr(lnf, 'compute_linear_normal_form', counting_compute)
+    xp.clear_normal_form_cache()
+
+    R_matrix = _one_turn_matrix()
+    particle_on_co = xp.Particles(p0c=450e9, mass0=xp.PROTON_MASS_EV)
+    for _ in range(3):
+        particles = xp.build_particles(particle_on_co=particle_on_co,
+                                       R_matrix=R_matrix.copy(),
+                                       x_norm=[0, 1], nemitt_x=2e-6,
+                                       nemitt_y=2e-6)
+    assert len(n_calls) == 1
+
+    # Cached matrices are not modified through the returned copies
+    W, _, _, _ = lnf.compute_linear_normal_form_cached(R_matrix)
+    W[:] = 0
+    nf = xp.NormalForm.from_R_matrix(R_matrix)
+    assert len(n_calls) == 1
+    assert np.all(nf.W_matrix == compute(R_matrix)[0])
+    gemitt_x = 2e-6 / particle_on_co.beta0[0] / particle_on_co.gamma0[0]
+    xo.assert_allclose(particles.x, [0, np.sqrt(gemitt_x) * nf.W_matrix[0, 0]],
+                       rtol=1e-14, atol=0)
+
+    # Different matrix or options trigger a new decomposition
+    xp.NormalForm.from_R_matrix(_one_turn_matrix(qx=0.28))
+    xp.NormalForm.from_R_matrix(R_matrix, symplectify=True)
+    assert len(n_calls) == 3
+
+    # Least recently used entries are dropped
+    monkeypatch.setattr(lnf, 'NORMAL_FORM_CACHE_SIZE', 2)
+    xp.NormalForm.from_R_matrix(_one_turn_matrix(qx=0.27))
+    assert len(lnf._normal_form_cache) == 2
+    xp.NormalForm.from_R_matrix(R_matrix)
+    assert len(n_calls) == 5
+
+    xp.clear_normal_form_cache()
+    assert len(lnf._normal_form_cache) == 0
+
+
+def test_normal_form_transforms():
+    nf = xp.NormalForm.from_R_matrix(_one_turn_matrix())
+    closed_orbit = np.array([1e-3, 2e-5, -1e-3, 0, 1e-2, 1e-5])
+
+    rng = np.random.default_rng(0)
+    XX_norm = rng.normal(size=(6, 1000))
+    XX = nf.to_physical(XX_norm, closed_orbit=closed_orbit)
+    xo.assert_allclose(XX, nf.W_matrix @ XX_norm + closed_orbit[:, None],
+                       rtol=1e-14, atol=1e-14)
+
+    out = np.zeros_like(XX)
+    res = nf.to_normalized(XX, closed_orbit=closed_orbit, out=out)
+    assert res is out
+    xo.assert_allclose(out, XX_norm, rtol=0, atol=1e-10)
+
+    # One turn is a rotation in normalized coordinates
+    R_matrix = _one_turn_matrix()
+    xo.assert_allclose(nf.to_normalized(R_matrix @ nf.to_physical(XX_norm)),
+                       nf.rotation @ XX_norm, rtol=0, atol=1e-10)
+
+
+@for_all_test_contexts
+def test_normalize(test_context):
+    nf = xp.NormalForm.from_R_matrix(_one_turn_matrix())
+    particle_on_co = xp.Particles(p0c=450e9, mass0=xp.PROTON_MASS_EV,
+                                  x=1e-3, py=2e-5, zeta=1e-2)
+
+    num_particles = 100
+    rng = np.random.default_rng(0)
+    XX_norm = rng.normal(size=(6, num_particles))
+    particles = xp.build_particles(_context=test_context,
+                                   particle_on_co=particle_on_co,
+                                   W_matrix=nf.W_matrix,
+                                   x_norm=XX_norm[0], px_norm=XX_norm[1],
+                                   y_norm=XX_norm[2], py_norm=XX_norm[3],
+                                   zeta_norm=XX_norm[4], pzeta_norm=XX_norm[5],
+                                   nemitt_x=2e-6, nemitt_y=3e-6,
+                                   nemitt_zeta=0.5, _capacity=120)
+    particles.state[:10] = 0
+
+    out = test_context.zeros(shape=(6, 120), dtype=np.float64)
+    res = xp.normalize(particles, W_matrix=nf.W_matrix,
+                       particle_on_co=particle_on_co, nemitt_x=2e-6,
+                       nemitt_y=3e-6, nemitt_zeta=0.5, out=out)
+    assert res is out
+    res = test_context.nparray_from_context_array(res)
+
+    # Lost particles and empty slots are not normalized
+    assert np.all(np.isnan(res[:, :10]))
+    assert np.all(np.isnan(res[:, num_particles:]))
+    xo.assert_allclose(res[:, 10:num_particles], XX_norm[:, 10:],
+                       rtol=0, atol=1e-9)
+
+    # Without emittances, same as NormalForm.to_normalized
+    dct = particles.to_dict()
+    XX = np.array([dct['x'], dct['px'], dct['y'], dct['py'], dct['zeta'],
+                   dct['ptau'] / dct['beta0']])[:, 10:num_particles]
+    co = particle_on_co.to_dict()
+    closed_orbit = np.array([co['x'][0], co['px'][0], co['y'][0],
+                             co['py'][0], co['zeta'][0],
+                             co['ptau'][0] / co['beta0'][0]])
+    res = test_context.nparray_from_context_array(
+        xp.normalize(particles, W_matrix=nf.W_matrix,
+                     particle_on_co=particle_on_co))
+    xo.assert_allclose(res[:, 10:num_particles],
+                       nf.to_normalized(XX, closed_orbit=closed_orbit),
+                       rtol=0, atol=1e-12)
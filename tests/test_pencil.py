@@ -59,3 +59,37 @@ def test_pencil(test_context):
     dct = particles.to_dict() # transfers it to cpu
     assert np.min(np.abs(dct['y'])) > 0.0018
     assert np.max(np.abs(dct['y'])) < 0.0021
+
+
+def test_pencil_exact_count_and_shape():
+    pos_cut_sigmas = 6.
+    dr_sigmas = 0.7
+    r_max = pos_cut_sigmas + dr_sigmas
+
+    for num_particles in [1, 7, 100000]:
+        x_norm, px_norm, r_points, theta_points = xp.generate_2D_pencil(
+            num_particles=num_particles, pos_cut_sigmas=pos_cut_sigmas,
+            dr_sigmas=dr_sigmas, side='+-', rng=np.random.default_rng(42))
+        assert (len(x_norm) == len(px_norm) == len(r_points)
+                == len(theta_points) == num_particles)
+        assert np.all(np.abs(x_norm) >= pos_cut_sigmas)
+        assert np.all(r_points <= r_max * (1 + 1e-12))
+
+    # Compare against the uniform distribution in the circular segment
+    # obtained by rejection
+    rng = np.random.default_rng(43)
+    x_ref = rng.uniform(pos_cut_sigmas, r_max, size=4_000_000)
+    px_ref = rng.uniform(-r_max, r_max, size=4_000_000)
+    mask = x_ref**2 + px_ref**2 < r_max**2
+    x_ref = x_ref[mask]
+    px_ref = px_ref[mask]
+
+    x_norm, px_norm, r_points, theta_points = xp.generate_2D_pencil(
+        num_particles=1_000_000, pos_cut_sigmas=pos_cut_sigmas,
+        dr_sigmas=dr_sigmas, side='+', rng=np.random.default_rng(44))
+
+    assert np.isclose(np.mean(x_norm), np.mean(x_ref), rtol=0, atol=1e-3)
+    assert np.isclose(np.std(x_norm), np.std(x_ref), rtol=5e-3, atol=0)
+    assert np.isclose(np.std(px_norm), np.std(px_ref), rtol=5e-3, atol=0)
+    assert np.allclose(np.hypot(x_norm, px_norm), r_points)
+    assert np.allclose(np.arctan2(px_norm, x_norm), theta_points)
@@ -6,6 +6,7 @@
 import json
 from itertools import product
 import numpy as np
+import pytest
 
 import xpart as xp
 import xtrack as xt
@@ -117,3 +118,152 @@ def test_pencil_with_absolute_cut(test_context):
 
         xo.assert_allclose(zeta, particles.zeta, atol=1e-12, rtol=1e-7)
         xo.assert_allclose(delta, particles.delta, atol=1e-12, rtol=1e-7)
+
+
+@fix_random_seed(7363445)
+def test_pencils_with_absolute_cut_batch():
+
+    line = xt.Line(
+        elements=[xt.Drift(length=1.), xt.Multipole(knl=[0, 0.8]),
+                  xt.Drift(length=1.), xt.Multipole(knl=[0, -0.7]),
+                  xt.Drift(length=1.)],
+        element_names=['d1', 'qf', 'd2', 'qd', 'd3'])
+    line.particle_ref = xp.Particles(p0c=1e9, mass0=xp.PROTON_MASS_EV)
+    line.build_tracker()
+
+    specs = [('qf', 'x', '+', 1e-3), ('qd', 'y', '-', -2e-3),
+             ('d3', 'x', '-', -1e-3)]
+    num_particles = 1000
+    nemitt_x = 2.5e-6
+    nemitt_y = 3e-6
+
+    # Reference: one call per pencil
+    np.random.seed(123)
+    expected = []
+    for at_element, plane, side, absolute_cut in specs:
+        expected.append(xp.generate_2D_pencil_with_absolute_cut(num_particles,
+                        plane=plane, absolute_cut=absolute_cut, dr_sigmas=2,
+                        side=side, line=line,
+                        nemitt_x=nemitt_x, nemitt_y=nemitt_y,
+                        at_element=at_element, method='4d'))
+
+    np.random.seed(123)
+    particles = xp.generate_2D_pencils_with_absolute_cut(num_particles,
+                        plane=[ss[1] for ss in specs],
+                        absolute_cut=[ss[3] for ss in specs],
+                        dr_sigmas=2,
+                        side=[ss[2] for ss in specs],
+                        at_element=[ss[0] for ss in specs],
+                        line=line, nemitt_x=nemitt_x, nemitt_y=nemitt_y,
+                        method='4d')
+
+    assert particles._capacity == 3 * num_particles
+    assert np.all(particles.particle_id == np.arange(3 * num_particles))
+
+    for ii, (at_element, plane, side, absolute_cut) in enumerate(specs):
+        sl = slice(ii * num_particles, (ii + 1) * num_particles)
+        i_ele = line.element_names.index(at_element)
+        assert np.all(particles.at_element[sl] == i_ele)
+        assert np.all(particles.s[sl] == line.get_s_position(at_element))
+
+        w = getattr(particles, plane)[sl]
+        pw = getattr(particles, 'p' + plane)[sl]
+        xo.assert_allclose(w, expected[ii][0], rtol=0, atol=1e-14)
+        xo.assert_allclose(pw, expected[ii][1], rtol=0, atol=1e-14)
+        if side == '+':
+            assert np.all(w >= absolute_cut * (1 - 1e-10))
+        else:
+            assert np.all(w <= absolute_cut * (1 - 1e-10))
+
+    dct = xp.generate_2D_pencils_with_absolute_cut(10,
+                        plane='x', absolute_cut=[1e-3, -1e-3], dr_sigmas=2,
+                        side=['+', '-'], at_element='qf',
+                        line=line, nemitt_x=nemitt_x, nemitt_y=nemitt_y,
+                        return_dict=True, method='4d')
+    assert set(dct.keys()) == {('qf', 'x', '+'), ('qf', 'x', '-')}
+    assert np.all(dct[('qf', 'x', '+')].x > 0)
+    assert np.all(dct[('qf', 'x', '-')].x < 0)
+
+    # Reproducible with a generator
+    particles_rng = [xp.generate_2D_pencils_with_absolute_cut(num_particles,
+                        plane=[ss[1] for ss in specs],
+                        absolute_cut=[ss[3] for ss in specs],
+                        dr_sigmas=2,
+                        side=[ss[2] for ss in specs],
+                        at_element=[ss[0] for ss in specs],
+                        line=line, nemitt_x=nemitt_x, nemitt_y=nemitt_y,
+                        rng=np.random.default_rng(42), method='4d')
+                     for _ in range(2)]
+    for nn in ['x', 'px', 'y', 'py']:
+        assert np.all(getattr(particles_rng[0], nn)
+                      == getattr(particles_rng[1], nn))
+    assert not np.all(particles_rng[0].x == particles.x)
+
+
+@fix_random_seed(7363446)
+def test_pencils_with_absolute_cut_batch_match_at_s():
+
+    line = xt.Line(
+        elements=[xt.Drift(length=1.), xt.Multipole(knl=[1e-4, 0.8]),
+                  xt.Drift(length=1.), xt.Multipole(knl=[0, -0.7]),
+                  xt.Drift(length=1.)],
+        element_names=['d1', 'qf', 'd2', 'qd', 'd3'])
+    line.particle_ref = xp.Particles(p0c=1e9, mass0=xp.PROTON_MASS_EV)
+    line.build_tracker()
+
+    num_particles = 1000
+    at_element = 'd2'
+    match_at_s = line.get_s_position(at_element) + 0.4
+
+    np.random.seed(123)
+    x_expected, px_expected = xp.generate_2D_pencil_with_absolute_cut(
+                        num_particles, plane='x', absolute_cut=1e-3,
+                        dr_sigmas=2, side='+', line=line,
+                        nemitt_x=2.5e-6, nemitt_y=3e-6,
+                        at_element=at_element, match_at_s=match_at_s,
+                        method='4d')
+    assert np.min(x_expected) > 1e-3 * (1 - 1e-10)
+
+    # Same pencil from the twiss of the full line
+    np.random.seed(123)
+    x_twiss, px_twiss = xp.generate_2D_pencil_with_absolute_cut(
+                        num_particles, plane='x', absolute_cut=1e-3,
+                        dr_sigmas=2, side='+', line=line,
+                        nemitt_x=2.5e-6, nemitt_y=3e-6,
+                        at_element=at_element, match_at_s=match_at_s,
+                        twiss=line.twiss(method='4d'))
+    xo.assert_allclose(x_twiss, x_expected, rtol=0, atol=1e-14)
+    xo.assert_allclose(px_twiss, px_expected, rtol=0, atol=1e-14)
+
+    np.random.seed(123)
+    particles = xp.generate_2D_pencils_with_absolute_cut(num_particles,
+                        plane='x', absolute_cut=1e-3, dr_sigmas=2,
+                        side='+', at_element=at_element,
+                        match_at_s=match_at_s, line=line,
+                        nemitt_x=2.5e-6, nemitt_y=3e-6, method='4d')
+
+    # Particles are provided at at_element
+    assert np.all(particles.at_element
+                  == line.element_names.index(at_element))
+    assert np.all(particles.s == line.get_s_position(at_element))
+
+    xt.Drift(length=0.4).track(particles)
+    xo.assert_allclose(particles.x, x_expected, rtol=0, atol=1e-14)
+    xo.assert_allclose(particles.px, px_expected, rtol=0, atol=1e-14)
+
+    # The side of the cut is checked against the closed orbit at match_at_s
+    # (x_co = -3.10e-4 at d2 and -2.70e-4 at match_at_s)
+    x_cut, _ = xp.generate_2D_pencil_with_absolute_cut(
+                        num_particles, plane='x', absolute_cut=-2.9e-4,
+                        dr_sigmas=2, side='-', line=line,
+                        nemitt_x=2.5e-6, nemitt_y=3e-6,
+                        at_element=at_element, match_at_s=match_at_s,
+                        method='4d')
+    assert np.all(x_cut <= -2.9e-4 * (1 - 1e-10))
+    with pytest.raises(AssertionError, match='wrong side'):
+        xp.generate_2D_pencil_with_absolute_cut(
+                        num_particles, plane='x', absolute_cut=-2.9e-4,
+                        dr_sigmas=2, side='+', line=line,
+                        nemitt_x=2.5e-6, nemitt_y=3e-6,
+                        at_element=at_element, match_at_s=match_at_s,
+                        method='4d')
@@ -23,3 +23,18 @@ def test_generate_2D_polar_grid():
     assert np.isclose(np.min(r_points), 0.1)
     assert np.isclose(np.max(r_points), 10)
 
+
+def test_generate_2D_polar_grid_tiles():
+    grid_kwargs = dict(r_range=(0.1, 10), nr=7, theta_range=(0, np.pi/2),
+                       ntheta=11)
+    x_norm, px_norm, r_points, theta_points = xp.generate_2D_polar_grid(
+                                                                **grid_kwargs)
+
+    tiles = list(xp.generate_2D_polar_grid_tiles(tile_size=10, **grid_kwargs))
+
+    assert len(tiles) == 8
+    assert all(len(tt[0]) == 10 for tt in tiles[:-1])
+    assert len(tiles[-1][0]) == 7
+
+    for ii, vv in enumerate([x_norm, px_norm, r_points, theta_points]):
+        assert np.array_equal(np.concatenate([tt[ii] for tt in tiles]), vv)
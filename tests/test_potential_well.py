@@ -0,0 +1,125 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+import numpy as np
+from scipy.constants import c as clight
+from scipy.constants import e as qe
+from scipy.constants import m_p
+
+import xobjects as xo
+from xpart.longitudinal import induced_voltage
+from xpart.longitudinal.rf_bucket import RFBucket
+from xpart.longitudinal.rfbucket_matching import (RFBucketMatcher,
+                                                  ThermalDistribution)
+
+try:
+    from numpy import trapezoid
+except ImportError:
+    from numpy import trapz as trapezoid  # numpy<2.0
+
+P0C = 450e9
+GAMMA0 = np.sqrt(1 + (P0C / (m_p * clight**2 / qe))**2)
+BETA0 = np.sqrt(1 - 1 / GAMMA0**2)
+
+
+def _resonator(shunt_impedance, quality_factor, frequency):
+    omega_r = 2 * np.pi * frequency
+    alpha = omega_r / (2 * quality_factor)
+    omega_bar = np.sqrt(omega_r**2 - alpha**2)
+
+    def wake_function(tau):
+        wake = 2 * alpha * shunt_impedance * np.exp(-alpha * np.abs(tau)) * (
+            np.cos(omega_bar * tau) - alpha / omega_bar * np.sin(omega_bar * tau))
+        return np.where(tau > 0, wake,
+                        np.where(tau == 0, alpha * shunt_impedance, 0.))
+
+    def impedance(f):
+        omega = 2 * np.pi * np.where(f == 0, 1., f)
+        return np.where(f == 0, 0., shunt_impedance / (
+            1 + 1j * quality_factor * (omega / omega_r - omega_r / omega)))
+
+    return wake_function, impedance
+
+
+def test_induced_voltage():
+    z = np.linspace(-0.4, 0.4, 1001)
+    line_density = np.exp(-z**2 / (2 * 0.05**2))
+    line_density /= trapezoid(line_density, z)
+    wake_function, impedance = _resonator(1e5, 1., 2e9)
+
+    voltage = induced_voltage(z, line_density, 1e11, qe, BETA0,
+                              wake_function=wake_function)
+
+    # Direct sum of the wakes of the particles ahead
+    dz = z[1] - z[0]
+    direct = np.array([-qe * 1e11 * dz * np.sum(
+        line_density * wake_function((z - zz) / (BETA0 * clight)))
+        for zz in z])
+    xo.assert_allclose(voltage, direct, rtol=0,
+                       atol=1e-12 * np.max(np.abs(direct)))
+
+    # Same result from the impedance
+    voltage_impedance = induced_voltage(z, line_density, 1e11, qe, BETA0,
+                                        impedance=impedance)
+    xo.assert_allclose(voltage_impedance, voltage, rtol=0,
+                       atol=1e-3 * np.max(np.abs(voltage)))
+
+
+def test_potential_well_matching(capsys):
+    rfbucket = RFBucket(circumference=26658.883, gamma=GAMMA0,
+                        mass_kg=m_p, charge_coulomb=qe,
+                        alpha_array=[3.48e-4], p_increment=0.,
+                        harmonic_list=[35640], voltage_list=[6e6],
+                        phi_offset_list=[np.pi])
+    matcher = RFBucketMatcher(rfbucket=rfbucket,
+                              distribution_type=ThermalDistribution,
+                              epsn_z=0.5)
+    z = np.linspace(rfbucket.z_left, rfbucket.z_right, 2001)
+
+    def bunch_length():
+        line_density = matcher.linedensity(z)
+        line_density /= trapezoid(line_density, z)
+        return np.sqrt(trapezoid(z**2 * line_density, z))
+
+    matcher.match()
+    sigma_z0 = bunch_length()
+    capsys.readouterr()
+
+    # Inductive impedance above transition: bunch lengthening at fixed
+    # emittance
+    inductance = 1e-6
+    matcher.set_potential_well(3e11,
+                               impedance=lambda f: 2j * np.pi * f * inductance)
+    z1, _ = matcher.sample(1000, rng=np.random.default_rng(0))
+    potential_well = matcher.potential_well
+    assert potential_well.converged
+    # The diagnostics of the matching are not repeated at each iteration
+    out = capsys.readouterr().out
+    assert 'Emittance' not in out
+    assert 'Potential well converged' in out
+    assert potential_well.residuals[-1] < potential_well.tol
+    assert bunch_length() > 1.003 * sigma_z0
+    assert np.isclose(matcher._compute_emittance(rfbucket, matcher.psi), 0.5,
+                      rtol=1e-4)
+
+    # Purely reactive: the bucket stays symmetric, and the induced voltage
+    # is -L dI/dt with t = -z / (beta c)
+    assert np.abs(trapezoid(z * matcher.linedensity(z), z)) < 1e-6
+    xo.assert_allclose(potential_well.induced_voltage,
+                       np.gradient(potential_well.line_density,
+                                    potential_well.z)
+                       * qe * 3e11 * inductance * (BETA0 * clight)**2,
+                       rtol=0, atol=1e-2 * np.max(np.abs(
+                           potential_well.induced_voltage)))
+
+    # The matcher is reused for the sampling
+    z2, _ = matcher.sample(1000, rng=np.random.default_rng(0))
+    assert np.all(z1 == z2)
+
+    # Removing the distortion restores the RF bucket
+    matcher.set_potential_well(None)
+    assert rfbucket._add_forces == [] and rfbucket._add_potentials == []
+    matcher.match()
+    assert np.isclose(bunch_length(), sigma_z0, rtol=1e-6)
@@ -0,0 +1,80 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+from functools import partial
+
+import numpy as np
+from scipy.constants import c as clight
+from scipy.constants import e as qe
+from scipy.constants import m_p
+from scipy.integrate import fixed_quad
+
+import xobjects as xo
+from xpart.longitudinal.rf_bucket import RFBucket
+from xpart.longitudinal.rfbucket_matching import (RFBucketMatcher,
+                                                  ThermalDistribution)
+
+P0C = 450e9
+GAMMA0 = np.sqrt(1 + (P0C / (m_p * clight**2 / qe))**2)
+
+
+def test_profile_engine():
+    rfbucket = RFBucket(circumference=26658.883, gamma=GAMMA0,
+                        mass_kg=m_p, charge_coulomb=qe,
+                        alpha_array=[3.48e-4], p_increment=0.,
+                        harmonic_list=[35640], voltage_list=[6e6],
+                        phi_offset_list=[np.pi])
+    matcher = RFBucketMatcher(rfbucket=rfbucket,
+                              distribution_type=ThermalDistribution,
+                              sigma_z=0.09)
+    matcher.match()
+
+    n_calls = []
+    psi = matcher.psi
+    def counting_psi(*args):
+        n_calls.append(1)
+        return psi(*args)
+    matcher.psi = counting_psi
+
+    # Same as the integration point by point
+    z = np.linspace(rfbucket.z_left, rfbucket.z_right, 1000)
+    lambda_z = matcher.linedensity(z)
+    assert len(n_calls) == 1
+    lambda_ref = matcher.linedensity(z, quad_type=partial(fixed_quad, n=5))
+    xo.assert_allclose(lambda_z, lambda_ref, rtol=1e-12,
+                       atol=1e-12 * np.max(lambda_ref))
+    assert np.isscalar(matcher.linedensity(0.1)) or np.ndim(
+                                                matcher.linedensity(0.1)) == 0
+
+    # Cached for the matched state
+    n_calls.clear()
+    assert np.all(matcher.linedensity(z) == lambda_z)
+    assert len(n_calls) == 0
+
+    # Profiles of the same distribution
+    lambda_z = matcher.linedensity(z, n_nodes=40)
+    dp = np.linspace(-1.2, 1.2, 801) * rfbucket.dp_max(rfbucket.z_right)
+    lambda_dp = matcher.momentum_profile(dp, n_nodes=10)
+    density = matcher.density_grid(z, dp)
+    assert density.shape == (1000, 801)
+    assert np.all(density[:, 0] == 0) and np.all(density[:, -1] == 0)
+
+    total = np.trapezoid(lambda_z, z)
+    assert np.isclose(np.trapezoid(lambda_dp, dp), total, rtol=1e-3)
+    assert np.isclose(np.trapezoid(np.trapezoid(density, dp, axis=1), z),
+                      total, rtol=1e-3)
+    sigma_z = np.sqrt(np.trapezoid(z**2 * lambda_z, z) / total)
+    assert np.isclose(sigma_z, 0.09, rtol=1e-3)
+
+    # The cache is invalidated by a new matching
+    n_calls.clear()
+    matcher.variable = 0.07
+    matcher.match()
+    n_calls.clear()
+    lambda_short = matcher.linedensity(z, n_nodes=40)
+    assert len(n_calls) == 1
+    sigma_z = np.sqrt(np.trapezoid(z**2 * lambda_short, z)
+                      / np.trapezoid(lambda_short, z))
+    assert np.isclose(sigma_z, 0.07, rtol=1e-3)
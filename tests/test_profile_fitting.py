@@ -0,0 +1,110 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+import numpy as np
+from scipy.constants import c as clight
+
+import xpart as xp
+import xtrack as xt
+import xpart.longitudinal.profile_fitting as pf
+from xpart.longitudinal import SingleRFHarmonicMatcher
+
+try:
+    from numpy import trapezoid
+except ImportError:
+    from numpy import trapz as trapezoid  # numpy<2.0
+
+CIRCUMFERENCE = 26658.883
+HARMONIC = 35640
+
+
+def _measured_profile(distribution, width, parameter, z0, z, rng):
+    z_lim = 0.99 * CIRCUMFERENCE / (2 * HARMONIC)
+    profile = 5. * pf._shape(distribution, z - z0, width, parameter)
+    profile[np.abs(z - z0) > z_lim] = 0
+    return profile + 0.005 * np.max(profile) * rng.normal(size=len(z))
+
+
+def test_fit_longitudinal_profile():
+    pf._cached_fitter.cache_clear()
+    rng = np.random.default_rng(0)
+    z = np.linspace(-0.4, 0.4, 500)
+
+    for m in [2.5, 4.7]:
+        res = xp.longitudinal.fit_longitudinal_profile(
+            z, _measured_profile('binomial', 0.25, m, 0.01, z, rng),
+            'binomial', circumference=CIRCUMFERENCE, rf_harmonic=HARMONIC)
+        assert np.isclose(res['m'], m, rtol=0.03)
+        assert np.isclose(res['z0'], 0.01, rtol=0, atol=1e-3)
+    # Templates computed once for the bucket
+    assert pf._cached_fitter.cache_info().currsize == 1
+
+    res = xp.longitudinal.fit_longitudinal_profile(
+        z, _measured_profile('qgaussian', 0.08, 1.3, 0., z, rng),
+        'qgaussian', circumference=CIRCUMFERENCE, rf_harmonic=HARMONIC)
+    assert np.isclose(res['q'], 1.3, rtol=0.02)
+    assert pf._cached_fitter.cache_info().currsize == 2
+
+    # Sequence options give the same fitter whatever their type
+    fitters = [pf._get_fitter(pf.LongitudinalProfileFitter, 'binomial',
+                              CIRCUMFERENCE, HARMONIC,
+                              {'parameter_range': parameter_range})
+               for parameter_range in [[1., 10.], (1, 10),
+                                       np.array([1., 10.])]]
+    assert fitters[0] is fitters[1] and fitters[0] is fitters[2]
+    assert pf._cached_fitter.cache_info().currsize == 3
+
+    # The matcher with the fitted parameters reproduces the measured shape
+    p0c = 450e9
+    beta0 = p0c / np.sqrt(p0c**2 + xp.PROTON_MASS_EV**2)
+    kwargs = res['generator_kwargs']
+    assert kwargs['engine'] == 'single-rf-harmonic'
+    matcher = SingleRFHarmonicMatcher(
+        q0=1, voltage=16e6, length=CIRCUMFERENCE,
+        freq=HARMONIC * beta0 * clight / CIRCUMFERENCE, p0c=p0c,
+        slip_factor=3.2e-4, beta0=beta0,
+        rms_bunch_length=kwargs['sigma_z'] / beta0,
+        distribution=kwargs['distribution'], q=kwargs['q'],
+        transformation_particles=1000, n_points_in_distribution=100)
+    zeta = beta0 * matcher.tau_distr_x
+    lambda_matcher = matcher.tau_distr_y / trapezoid(matcher.tau_distr_y,
+                                                     zeta)
+    lambda_measured = pf._shape('qgaussian', zeta, 0.08, 1.3)
+    lambda_measured /= trapezoid(lambda_measured, zeta)
+    assert np.allclose(lambda_matcher, lambda_measured, rtol=0,
+                       atol=0.02 * np.max(lambda_measured))
+
+
+def test_profile_fitter_from_line_main_harmonic():
+    elements, names = [], []
+    for ii in range(8):
+        elements += [xt.Multipole(knl=[2 * np.pi / 16, 0.1],
+                                  hxl=2 * np.pi / 16),
+                     xt.Drift(length=5.),
+                     xt.Multipole(knl=[2 * np.pi / 16, -0.1],
+                                  hxl=2 * np.pi / 16),
+                     xt.Drift(length=5.)]
+        names += [f'qf{ii}', f'd1_{ii}', f'qd{ii}', f'd2_{ii}']
+    # Higher harmonic first in the line, with the smaller voltage
+    elements += [xt.Cavity(voltage=2e4, lag=180),
+                 xt.Cavity(voltage=1e5, lag=180)]
+    names += ['cav_h40', 'cav_h20']
+    line = xt.Line(elements=elements, element_names=names)
+    line.particle_ref = xp.Particles(p0c=1e9, mass0=xp.PROTON_MASS_EV)
+    f_rev = line.particle_ref.beta0[0] * clight / line.get_length()
+    line['cav_h40'].frequency = 40 * f_rev
+    line['cav_h20'].frequency = 20 * f_rev
+    line.build_tracker()
+
+    pf._cached_fitter.cache_clear()
+    fitter = pf.LongitudinalProfileFitter.from_line(line, 'gaussian')
+    assert np.isclose(fitter.z_lim, 0.99 * line.get_length() / 40)
+
+    # Same templates for fit_longitudinal_profile
+    z = np.linspace(-1, 1, 200)
+    res = xp.longitudinal.fit_longitudinal_profile(
+        z, np.exp(-z**2 / (2 * 0.2**2)), 'gaussian', line=line)
+    assert pf._cached_fitter.cache_info().currsize == 1
+    assert np.isclose(res['sigma_z'], 0.2, rtol=1e-2)
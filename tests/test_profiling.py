@@ -0,0 +1,66 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+import json
+
+import numpy as np
+
+import xpart as xp
+
+
+def _build(num_particles):
+    return xp.build_particles(
+        particle_ref=xp.Particles(p0c=7e12, mass0=xp.PROTON_MASS_EV),
+        x=np.zeros(num_particles), px=np.zeros(num_particles))
+
+
+def test_profiling_disabled_by_default():
+    assert not xp.profiling.is_enabled()
+    xp.profiling.reset()
+    _build(10)
+    assert xp.profiling.get_report() == {'stages': {}}
+
+
+def test_profiling_nested_stages():
+    with xp.profiling.profile() as prof:
+        assert xp.profiling.is_enabled()
+        with xp.profiling.stage('outer'):
+            _build(100)
+            _build(1000)
+    assert not xp.profiling.is_enabled()
+
+    report = prof.get_report()
+    outer = report['stages']['outer']
+    assert outer['calls'] == 1
+    bp = outer['stages']['build_particles']
+    assert bp['calls'] == 2
+    alloc = bp['stages']['particles_allocation']
+    assert alloc['calls'] == 2
+    assert alloc['peak_array_size'] == 6 * 1000
+    assert alloc['peak_array_bytes'] == 6 * 1000 * 8
+    assert outer['time'] >= bp['time'] >= alloc['time'] > 0
+    assert np.isclose(outer['self_time'], outer['time'] - bp['time'])
+
+    assert json.loads(prof.to_json()) == report
+
+    # Global profile not affected
+    assert xp.profiling.get_report() == {'stages': {}}
+
+
+def test_profiling_enable_disable():
+    xp.profiling.reset()
+    xp.profiling.enable()
+    try:
+        _build(10)
+        _build(10)
+    finally:
+        xp.profiling.disable()
+    _build(10)
+
+    report = xp.profiling.get_report()
+    assert report['stages']['build_particles']['calls'] == 2
+
+    xp.profiling.reset()
+    assert xp.profiling.get_report() == {'stages': {}}
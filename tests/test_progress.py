@@ -0,0 +1,87 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+import logging
+
+import numpy as np
+from scipy.constants import c as clight
+from scipy.constants import e as qe
+from scipy.constants import m_p
+
+from xpart.general import ProgressChannel, progress, silence_progress
+from xpart.longitudinal.rf_bucket import RFBucket
+from xpart.longitudinal.rfbucket_matching import (RFBucketMatcher,
+                                                  ThermalDistribution)
+
+
+def test_progress_throttling_and_callback(caplog):
+    channel = ProgressChannel(min_interval=3600.)
+    reports = []
+    channel.callback = lambda task, fraction, message: reports.append(
+                                                        (task, fraction))
+
+    with caplog.at_level(logging.INFO, logger='xpart.progress'):
+        for ii in range(1000):
+            channel('task', ii/1000)
+        channel('task', 1.)
+
+    # Only the first report and the completion go through
+    assert reports == [('task', 0.), ('task', 1.)]
+    assert [rr.getMessage() for rr in caplog.records] == [
+        'task:   0%', 'task: 100%']
+
+    channel.min_interval = 0.
+    reports.clear()
+    for ii in range(10):
+        channel('other', message=f'step {ii}')
+    assert len(reports) == 10
+
+
+def test_progress_silenced(caplog):
+    channel = ProgressChannel(min_interval=0.)
+    reports = []
+    channel.callback = lambda *args: reports.append(args)
+    channel.enabled = False
+
+    with caplog.at_level(logging.INFO, logger='xpart.progress'):
+        for ii in range(10):
+            channel('task', ii/10)
+        channel('task', 1.)
+
+    assert reports == []
+    assert caplog.records == []
+
+
+def test_progress_of_matcher(caplog, monkeypatch):
+    gamma = np.sqrt(1 + (450e9 / (m_p * clight**2 / qe))**2)
+    rfbucket = RFBucket(circumference=26658.883, gamma=gamma,
+                        mass_kg=m_p, charge_coulomb=qe,
+                        alpha_array=[3.48e-4], p_increment=0.,
+                        harmonic_list=[35640], voltage_list=[6e6],
+                        phi_offset_list=[np.pi])
+    matcher = RFBucketMatcher(rfbucket=rfbucket,
+                              distribution_type=ThermalDistribution,
+                              sigma_z=0.09)
+    n_evaluations = []
+    compute_sigma = matcher._compute_sigma
+    def counting_compute_sigma(*args):
+        n_evaluations.append(1)
+        return compute_sigma(*args)
+    matcher._compute_sigma = counting_compute_sigma
+
+    monkeypatch.setattr(progress, 'min_interval', 3600.)
+    silence_progress(False)
+    task = 'RFBucketMatcher: Matching bunch length'
+    with caplog.at_level(logging.INFO, logger='xpart.progress'):
+        matcher.match()
+
+    # First report and completion only, the task is then reset
+    messages = [rr.getMessage() for rr in caplog.records
+                if rr.name == 'xpart.progress']
+    assert len(n_evaluations) > 3
+    assert len(messages) == 2
+    assert messages[0].startswith(task + ': distance to target bunch length')
+    assert messages[1] == task + ': done'
+    assert task not in progress._last_report
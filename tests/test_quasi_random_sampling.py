@@ -0,0 +1,116 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+import numpy as np
+import pytest
+
+import xpart as xp
+from xpart.longitudinal import SingleRFHarmonicMatcher
+
+
+@pytest.mark.parametrize('sampling', ['sobol', 'halton'])
+def test_gaussian_quasi_random(sampling):
+    num_particles = 2**14
+
+    x_norm, px_norm = xp.generate_2D_gaussian(num_particles,
+                        sampling=sampling, rng=np.random.default_rng(1))
+
+    assert len(x_norm) == len(px_norm) == num_particles
+    # Monte-Carlo error on the std would be ~1/sqrt(2N) ~ 5.5e-3
+    assert np.isclose(np.mean(x_norm), 0, rtol=0, atol=1e-3)
+    assert np.isclose(np.mean(px_norm), 0, rtol=0, atol=1e-3)
+    assert np.isclose(np.std(x_norm), 1, rtol=0, atol=2e-3)
+    assert np.isclose(np.std(px_norm), 1, rtol=0, atol=2e-3)
+
+    # Same scrambling seed gives the same points
+    x_norm2, px_norm2 = xp.generate_2D_gaussian(num_particles,
+                        sampling=sampling, rng=np.random.default_rng(1))
+    assert np.array_equal(x_norm, x_norm2)
+    assert np.array_equal(px_norm, px_norm2)
+
+
+def test_circular_sector_quasi_random():
+    num_particles = 2**14
+    r_range = (1., 2.)
+    theta_range = (0, np.pi/2)
+
+    a1, a2, r, theta = xp.generate_2D_uniform_circular_sector(num_particles,
+                        r_range=r_range, theta_range=theta_range,
+                        sampling='sobol', rng=np.random.default_rng(2))
+
+    assert np.all((r >= r_range[0]) & (r <= r_range[1]))
+    assert np.all((theta >= theta_range[0]) & (theta <= theta_range[1]))
+    # <r^2> over the annulus is (r0^2 + r1^2)/2
+    assert np.isclose(np.mean(r**2), 2.5, rtol=0, atol=1e-4)
+    assert np.isclose(np.mean(theta), np.pi/4, rtol=0, atol=1e-4)
+
+
+def test_hypersphere_quasi_random():
+    num_particles = 2**14
+    rx = 2.5
+    ry = 4.2
+
+    x_norm, px_norm, y_norm, py_norm = xp.generate_hypersphere_4D(
+        num_particles, rx=rx, ry=ry, rng_seed=3, sampling='sobol')
+
+    rr = np.sqrt((x_norm/rx)**2 + (px_norm/rx)**2
+                 + (y_norm/ry)**2 + (py_norm/ry)**2)
+    assert np.all(rr <= 1)
+    # Radii are distributed as r^3 in 4D, hence <r^4> = 1/2
+    assert np.isclose(np.mean(rr**4), 0.5, rtol=0, atol=1e-3)
+    for vv in [x_norm, px_norm, y_norm, py_norm]:
+        assert np.isclose(np.mean(vv), 0, rtol=0, atol=1e-3)
+
+    with pytest.raises(ValueError):
+        xp.generate_hypersphere_4D(10, sampling='random')
+
+
+def test_single_rf_harmonic_matcher_quasi_random():
+
+    rms_bunch_length = 0.1 / 0.99
+
+    matcher = SingleRFHarmonicMatcher(q0=1, voltage=6e6, length=26658.883,
+                                      freq=400.79e6, p0c=450e9,
+                                      slip_factor=3.4e-4, beta0=0.99,
+                                      rms_bunch_length=rms_bunch_length,
+                                      distribution='gaussian',
+                                      transformation_particles=100000)
+
+    tau, ptau = matcher.sample_tau_ptau(n_particles=2**16, sampling='sobol',
+                                        rng=np.random.default_rng(4))
+
+    assert len(tau) == len(ptau) == 2**16
+    assert np.isclose(np.std(tau), rms_bunch_length, rtol=2e-2, atol=0)
+    assert np.isclose(np.mean(tau), 0, rtol=0, atol=1e-3 * rms_bunch_length)
+    assert np.all(matcher.get_m(tau=tau, ptau=ptau) <= max(matcher.m_distr_x)
+                  * (1 + 1e-10))
+
+
+def test_matched_gaussian_bunch_quasi_random_seeded():
+    R_matrix = np.eye(6)
+    for ii, (mu, beta) in enumerate([(0.31, 80.), (0.32, 30.),
+                                     (0.002, 900.)]):
+        cc, ss = np.cos(2 * np.pi * mu), np.sin(2 * np.pi * mu)
+        R_matrix[2*ii: 2*ii + 2, 2*ii: 2*ii + 2] = [[cc, beta * ss],
+                                                    [-ss / beta, cc]]
+    particle_on_co = xp.Particles(p0c=450e9, mass0=xp.PROTON_MASS_EV)
+
+    def generate(seed):
+        return xp.generate_matched_gaussian_bunch(
+            num_particles=1024, nemitt_x=2e-6, nemitt_y=3e-6, sigma_z=0.09,
+            particle_on_co=particle_on_co, R_matrix=R_matrix,
+            circumference=26658.883, momentum_compaction_factor=3.48e-4,
+            rf_harmonic=[35640], rf_voltage=[6e6], rf_phase=[np.pi],
+            sampling='sobol', rng=np.random.default_rng(seed),
+            tail_sampling={'y': {'mode': 'uniform_action', 'n_sigma_min': 3,
+                                 'n_sigma_max': 5}})
+
+    p1 = generate(5)
+    p2 = generate(5)
+    p3 = generate(6)
+    for nn in ['x', 'px', 'y', 'py', 'zeta', 'delta', 'weight']:
+        assert np.array_equal(getattr(p1, nn), getattr(p2, nn))
+    for nn in ['x', 'y', 'zeta']:
+        assert not np.array_equal(getattr(p1, nn), getattr(p3, nn))
@@ -0,0 +1,47 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+import numpy as np
+
+import xpart as xp
+from xpart.longitudinal.rfbucket_matching import RFBucketMatcher
+
+
+def test_match_longitudinal_ramp_warm_start(monkeypatch):
+    n_calls = []
+    compute_sigma = RFBucketMatcher._compute_sigma
+    def counting_compute_sigma(self, *args):
+        n_calls.append(1)
+        return compute_sigma(self, *args)
+    monkeypatch.setattr(RFBucketMatcher, '_compute_sigma',
+                        counting_compute_sigma)
+
+    n_steps = 4
+    res = xp.match_longitudinal_ramp(
+        gamma0=np.linspace(479.6, 490., n_steps),
+        rf_voltage=np.linspace(6e6, 7e6, n_steps), rf_phase=np.pi,
+        circumference=26658.883, momentum_compaction_factor=3.48e-4,
+        rf_harmonic=35640, mass0=xp.PROTON_MASS_EV, sigma_z=0.09,
+        num_particles=5000, sample_steps=[n_steps - 1],
+        rng=np.random.default_rng(0), return_matchers=True)
+    n_calls_ramp = len(n_calls)
+
+    assert np.all(res['warm_start'] == [False] + [True] * (n_steps - 1))
+    assert np.all(np.diff(res['H0']) > 0)
+    assert list(res['samples'].keys()) == [n_steps - 1]
+    zeta, delta = res['samples'][n_steps - 1]
+    assert len(zeta) == len(delta) == 5000
+    assert np.isclose(np.std(zeta), 0.09, rtol=0.05)
+
+    # Same result as a full matching of the last step
+    matcher = res['matchers'][-1]
+    n_calls.clear()
+    cold = RFBucketMatcher(rfbucket=matcher.rfbucket,
+                           distribution_type=type(matcher.psi_object),
+                           sigma_z=0.09).match()
+    assert np.isclose(cold.psi_object.H0, res['H0'][-1], rtol=1e-4)
+
+    # Warm steps are cheaper than the full matching
+    assert n_calls_ramp < n_steps * len(n_calls)
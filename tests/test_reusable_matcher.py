@@ -0,0 +1,115 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+import numpy as np
+from scipy.constants import c as clight
+from scipy.constants import e as qe
+from scipy.constants import m_p
+
+import xpart as xp
+from xpart.longitudinal.rf_bucket import RFBucket
+from xpart.longitudinal.rfbucket_matching import (RFBucketMatcher,
+                                                  ThermalDistribution)
+from xpart.longitudinal.single_rf_harmonic_matcher import (
+                                                    SingleRFHarmonicMatcher)
+
+P0C = 450e9
+GAMMA0 = np.sqrt(1 + (P0C / (m_p * clight**2 / qe))**2)
+BETA0 = np.sqrt(1 - 1 / GAMMA0**2)
+
+
+def test_rfbucket_matcher_match_once_sample_many():
+    rfbucket = RFBucket(circumference=26658.883, gamma=GAMMA0,
+                        mass_kg=m_p, charge_coulomb=qe,
+                        alpha_array=[3.48e-4], p_increment=0.,
+                        harmonic_list=[35640], voltage_list=[6e6],
+                        phi_offset_list=[np.pi])
+    matcher = RFBucketMatcher(rfbucket=rfbucket,
+                              distribution_type=ThermalDistribution,
+                              sigma_z=0.09)
+
+    n_calls = []
+    match_orig = matcher.psi_for_variable
+    def counting_match(variable):
+        n_calls.append(variable)
+        match_orig(variable)
+    matcher.psi_for_variable = counting_match
+
+    z1, dp1 = matcher.sample(1000, rng=np.random.default_rng(42))
+    z2, dp2 = matcher.sample(1000, rng=np.random.default_rng(42))
+    z3, dp3, _, _ = matcher.generate(1000)
+    assert len(n_calls) == 1
+
+    # Reproducible with a seeded generator
+    assert np.all(z1 == z2) and np.all(dp1 == dp2)
+    assert not np.all(z1 == z3)
+
+    out = (np.zeros(1000), np.zeros(1000))
+    res = matcher.sample(1000, rng=np.random.default_rng(42), out=out)
+    assert res[0] is out[0] and res[1] is out[1]
+    assert np.all(out[0] == z1) and np.all(out[1] == dp1)
+
+    particle_ref = xp.Particles(p0c=P0C, mass0=xp.PROTON_MASS_EV)
+    zeta, delta, matcher_out = xp.generate_longitudinal_coordinates(
+        num_particles=1000, matcher=matcher, particle_ref=particle_ref,
+        rng=np.random.default_rng(42), return_matcher=True)
+    assert matcher_out is matcher
+    assert np.all(zeta == z1) and np.all(delta == dp1)
+    assert len(n_calls) == 1
+
+    # Changing the target triggers a new matching
+    matcher.variable = 0.08
+    matcher.sample(1000)
+    assert len(n_calls) == 2
+
+    # So does a modification or a replacement of the bucket
+    H0 = matcher.psi_object.H0
+    rfbucket.voltage_list = [8e6]
+    matcher.sample(1000)
+    assert len(n_calls) == 3
+    assert matcher.psi_object.H0 != H0
+    assert np.isclose(matcher._compute_sigma(rfbucket, matcher.psi), 0.08,
+                      rtol=1e-4)
+
+    # Second harmonic field, vanishing potential at the unstable fix points
+    amplitude = 1e6 * qe / rfbucket.circumference
+    kk = 2 * 35640 / rfbucket.R
+    rfbucket.add_fields([lambda z: amplitude * np.sin(kk * z)],
+                        [lambda z: amplitude / kk * (np.cos(kk * z) + 1)])
+    matcher.sample(1000)
+    assert len(n_calls) == 4
+
+    matcher.rfbucket = RFBucket(circumference=26658.883, gamma=GAMMA0,
+                                mass_kg=m_p, charge_coulomb=qe,
+                                alpha_array=[3.48e-4], p_increment=0.,
+                                harmonic_list=[35640], voltage_list=[4e6],
+                                phi_offset_list=[np.pi])
+    matcher.sample(1000)
+    assert len(n_calls) == 5
+    assert np.isclose(matcher._compute_sigma(matcher.rfbucket, matcher.psi),
+                      0.08, rtol=1e-4)
+    matcher.sample(1000)
+    assert len(n_calls) == 5
+
+
+def test_single_rf_harmonic_matcher_sample_many():
+    matcher = SingleRFHarmonicMatcher(
+        q0=1, voltage=6e6, length=26658.883, freq=400.79e6, p0c=P0C,
+        slip_factor=3.48e-4 - 1 / GAMMA0**2, beta0=BETA0,
+        rms_bunch_length=0.09 / BETA0, distribution='parabolic',
+        transformation_particles=20000)
+    assert matcher.match() is matcher
+
+    tau1, ptau1 = matcher.sample(2000, rng=np.random.default_rng(1))
+    tau2, ptau2 = matcher.sample(2000, rng=np.random.default_rng(1))
+    assert len(tau1) == len(ptau1) == 2000
+    assert np.all(tau1 == tau2) and np.all(ptau1 == ptau2)
+
+    particle_ref = xp.Particles(p0c=P0C, mass0=xp.PROTON_MASS_EV)
+    zeta, delta = xp.generate_longitudinal_coordinates(
+        num_particles=2000, matcher=matcher, particle_ref=particle_ref,
+        rng=np.random.default_rng(1))
+    assert np.allclose(zeta, tau1 * BETA0, rtol=1e-14, atol=0)
+    assert np.isclose(np.std(zeta), 0.09, rtol=0.1)
@@ -0,0 +1,59 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+import numpy as np
+import pytest
+import xobjects as xo
+from scipy.constants import c as clight
+from scipy.constants import e as qe
+from scipy.constants import m_p
+
+from xpart.longitudinal.rf_bucket import RFBucket
+
+CIRCUMFERENCE = 26658.883
+GAMMA = 450e9 / (m_p * clight**2 / qe)
+
+
+@pytest.mark.parametrize('harmonic_list, voltage_list, p_increment', [
+    ([35640], [6e6], 0.),
+    ([35640, 71280], [6e6, 3e6], 0.),
+    ([35640], [6e6], 5e6 * qe / clight / CIRCUMFERENCE),
+], ids=['single-rf', 'double-rf', 'accelerating'])
+def test_rf_bucket_classify(harmonic_list, voltage_list, p_increment):
+    rfbucket = RFBucket(circumference=CIRCUMFERENCE, gamma=GAMMA,
+                        mass_kg=m_p, charge_coulomb=qe,
+                        alpha_array=[3.48e-4], p_increment=p_increment,
+                        harmonic_list=harmonic_list,
+                        voltage_list=voltage_list,
+                        phi_offset_list=[np.pi] * len(harmonic_list))
+    bucket_length = CIRCUMFERENCE / harmonic_list[0]
+
+    rng = np.random.default_rng(0)
+    n_part = 200000
+    dp_max = rfbucket.separatrix(rfbucket.z_sfp_extr)
+    z = rng.uniform(rfbucket.z_left - 1, rfbucket.z_right + 1, n_part)
+    dp = rng.uniform(-1.2, 1.2, n_part) * dp_max
+
+    for margin in [0, 0.3]:
+        in_bucket, bucket_index = rfbucket.classify(z, dp, margin=margin)
+        assert bucket_index.dtype == np.int64
+        assert set(np.unique(bucket_index)) == {-2, -1, 0, 1, 2}
+
+        expected = rfbucket.is_in_separatrix(z, dp, margin=margin)
+        assert np.all((in_bucket & (bucket_index == 0)) == expected)
+
+        # Same classification in the other buckets
+        in_bucket_shifted, bucket_index_shifted = rfbucket.classify(
+                z[expected] - 3 * bucket_length, dp[expected], margin=margin)
+        assert np.all(in_bucket_shifted)
+        assert np.all(bucket_index_shifted == 3)
+
+    in_bucket_ctx, bucket_index_ctx = rfbucket.classify(
+                                                z, dp, _context=xo.ContextCpu())
+    assert np.all(in_bucket_ctx == rfbucket.classify(z, dp)[0])
+
+    # The separatrix tables are cached
+    assert rfbucket.separatrix_table() is rfbucket.separatrix_table()
+    assert len(rfbucket._separatrix_tables) == 2
@@ -0,0 +1,70 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+import numpy as np
+
+import xpart as xp
+import xtrack as xt
+import xobjects as xo
+
+
+def _make_ring():
+    elements, names = [], []
+    for ii in range(8):
+        elements += [xt.Multipole(knl=[2 * np.pi / 16, 0.1], hxl=2 * np.pi / 16),
+                     xt.Drift(length=5.),
+                     xt.Multipole(knl=[2 * np.pi / 16, -0.1], hxl=2 * np.pi / 16),
+                     xt.Drift(length=5.)]
+        names += [f'qf{ii}', f'd1_{ii}', f'qd{ii}', f'd2_{ii}']
+    elements.append(xt.Cavity(voltage=1e5, frequency=1., lag=180))
+    names.append('cav')
+    line = xt.Line(elements=elements, element_names=names)
+    line.particle_ref = xp.Particles(p0c=1e9, mass0=xp.PROTON_MASS_EV)
+    beta0 = line.particle_ref.beta0[0]
+    line['cav'].frequency = 20 * beta0 * 299792458. / line.get_length()
+    line.build_tracker()
+    return line
+
+
+def test_matched_gaussian_bunch_single_twiss():
+    line = _make_ring()
+
+    twiss = line.twiss
+    n_calls = []
+    def counting_twiss(*args, **kwargs):
+        n_calls.append(1)
+        return twiss(*args, **kwargs)
+    line.twiss = counting_twiss
+
+    np.random.seed(0)
+    particles = xp.generate_matched_gaussian_bunch(
+        line=line, num_particles=1000, nemitt_x=2e-6, nemitt_y=3e-6,
+        sigma_z=0.3)
+    assert len(n_calls) == 1
+
+    # Precomputed twiss, no optics computed
+    tw = twiss()
+    np.random.seed(0)
+    particles_tw = xp.generate_matched_gaussian_bunch(
+        line=line, num_particles=1000, nemitt_x=2e-6, nemitt_y=3e-6,
+        sigma_z=0.3, twiss=tw)
+    assert len(n_calls) == 1
+
+    for nn in ['x', 'px', 'y', 'py', 'zeta', 'delta']:
+        xo.assert_allclose(getattr(particles_tw, nn), getattr(particles, nn),
+                           rtol=0, atol=1e-14)
+
+    norm = xp.normalize(particles, twiss_init=tw.get_twiss_init(0),
+                        nemitt_x=2e-6, nemitt_y=3e-6)
+    assert np.allclose(np.std(norm[:4], axis=1), 1, rtol=0.1)
+    assert np.isclose(np.std(particles.zeta), 0.3, rtol=0.1)
+
+    # build_particles with a precomputed twiss
+    particles_bp = xp.build_particles(line=line, x_norm=[0, 1],
+                                      nemitt_x=2e-6, nemitt_y=3e-6, twiss=tw)
+    assert len(n_calls) == 1
+    gemitt_x = 2e-6 / particles.beta0[0] / particles.gamma0[0]
+    xo.assert_allclose(particles_bp.x[1] - particles_bp.x[0],
+                       np.sqrt(tw.betx[0] * gemitt_x), rtol=1e-10, atol=0)
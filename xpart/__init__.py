@@ -3,30 +3,81 @@
 # Copyright (c) CERN, 2024.                 #
 # ######################################### #
 
-from xtrack.particles import (Particles, PROTON_MASS_EV, ELECTRON_MASS_EV,
-                              MUON_MASS_EV, Pb208_MASS_EV, reference_from_pdg_id,
-                              enable_pyheadtail_interface, disable_pyheadtail_interface)
-pmass = PROTON_MASS_EV  # backwards compatibility
+import importlib
 
-from xtrack.particles.pdg import get_pdg_id_from_name, get_name_from_pdg_id
+from ._version import __version__
+
+from . import profiling
 
+# build_particles imports xtrack and xobjects only when called
 from .build_particles import build_particles
-from .matched_gaussian import (generate_matched_gaussian_bunch,
-                               generate_matched_gaussian_multibunch_beam,
-                               )
 
-from .transverse_generators import generate_2D_polar_grid
+from .transverse_generators import generate_2D_polar_grid, generate_2D_polar_grid_tiles
 from .transverse_generators import generate_2D_uniform_circular_sector
 from .transverse_generators import generate_2D_pencil
-from .transverse_generators import generate_2D_pencil_with_absolute_cut
-from .transverse_generators import generate_2D_gaussian
+from .transverse_generators import (generate_2D_pencil_with_absolute_cut,
+                                    generate_2D_pencils_with_absolute_cut)
+from .transverse_generators import (generate_2D_gaussian,
+                                    generate_2D_gaussian_tail,
+                                    gaussian_tail_probability)
 from .transverse_generators import (generate_hypersphere_2D, generate_hypersphere_4D,
                                     generate_hypersphere_6D)
+from .transverse_generators import hypersphere_gaussian_weights
 from .transverse_generators import generate_round_4D_q_gaussian_normalised
+from .sampling import check_weights
 
-from .longitudinal import generate_longitudinal_coordinates
-from .longitudinal.generate_longitudinal import _characterize_line
+# The following objects depend on xtrack and on scipy.optimize/integrate and
+# are imported on first access, so that importing xpart (e.g. in workers that
+# only need the transverse generators) stays cheap.
+_lazy_imports = {
+    'Particles': ('xtrack.particles', 'Particles'),
+    'PROTON_MASS_EV': ('xtrack.particles', 'PROTON_MASS_EV'),
+    'ELECTRON_MASS_EV': ('xtrack.particles', 'ELECTRON_MASS_EV'),
+    'MUON_MASS_EV': ('xtrack.particles', 'MUON_MASS_EV'),
+    'Pb208_MASS_EV': ('xtrack.particles', 'Pb208_MASS_EV'),
+    'reference_from_pdg_id': ('xtrack.particles', 'reference_from_pdg_id'),
+    'enable_pyheadtail_interface': ('xtrack.particles',
+                                    'enable_pyheadtail_interface'),
+    'disable_pyheadtail_interface': ('xtrack.particles',
+                                     'disable_pyheadtail_interface'),
+    'pmass': ('xtrack.particles', 'PROTON_MASS_EV'), # backwards compatibility
+    'get_pdg_id_from_name': ('xtrack.particles.pdg', 'get_pdg_id_from_name'),
+    'get_name_from_pdg_id': ('xtrack.particles.pdg', 'get_name_from_pdg_id'),
+    'generate_matched_gaussian_bunch': ('xpart.matched_gaussian',
+                                        'generate_matched_gaussian_bunch'),
+    'generate_matched_gaussian_multibunch_beam': (
+        'xpart.matched_gaussian', 'generate_matched_gaussian_multibunch_beam'),
+    'get_bucket_train': ('xpart.matched_gaussian', 'get_bucket_train'),
+    'generate_longitudinal_coordinates': ('xpart.longitudinal',
+                                          'generate_longitudinal_coordinates'),
+    'match_longitudinal_ramp': ('xpart.longitudinal',
+                                'match_longitudinal_ramp'),
+    '_characterize_line': ('xpart.longitudinal.generate_longitudinal',
+                           '_characterize_line'),
+    'PhaseMonitor': ('xpart.monitors', 'PhaseMonitor'),
+    'NormalForm': ('xpart.linear_normal_form', 'NormalForm'),
+    'clear_normal_form_cache': ('xpart.linear_normal_form',
+                                'clear_normal_form_cache'),
+    'normalize': ('xpart.linear_normal_form', 'normalize'),
+}
 
-from .monitors import PhaseMonitor
+_lazy_submodules = ('longitudinal', 'matched_gaussian', 'monitors',
+                    'linear_normal_form', 'pyheadtail_interface')
 
-from ._version import __version__
+
+def __getattr__(name):
+    if name in _lazy_submodules:
+        return importlib.import_module(f'xpart.{name}')
+
+    if name not in _lazy_imports:
+        raise AttributeError(f"module 'xpart' has no attribute '{name}'")
+
+    module_name, attr_name = _lazy_imports[name]
+    value = getattr(importlib.import_module(module_name), attr_name)
+    globals()[name] = value # next accesses do not go through __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals().keys()) | set(_lazy_imports.keys())
+                  | set(_lazy_submodules))
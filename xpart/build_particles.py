@@ -7,10 +7,7 @@ import logging
 
 import numpy as np
 
-import xobjects as xo
-from .general import _print
-
-import xtrack as xt
+from . import profiling
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +34,147 @@ def _check_lengths(**kwargs):
         length = 1
     return length
 
+def _inputs_to_context(context, **inputs):
+    # Input arrays are kept (or placed) on the target context, so that on GPU
+    # contexts the particles are generated without going through the host
+    # memory. The arrays provided on the host are gathered in a single
+    # staging array and moved to the context with one transfer.
+    import xobjects as xo
+
+    out = {}
+    staged = {}
+    for nn, xx in inputs.items():
+        if xx is None:
+            out[nn] = None
+        elif np.ndim(xx) == 0:
+            out[nn] = xx.get() if hasattr(xx, 'get') else xx
+        elif isinstance(context, xo.ContextCpu):
+            out[nn] = np.asarray(xx.get() if hasattr(xx, 'get') else xx,
+                                 dtype=np.float64)
+        elif hasattr(xx, 'get'):
+            # Already a device array
+            out[nn] = xx
+        else:
+            staged[nn] = np.asarray(xx, dtype=np.float64)
+
+    if staged:
+        _check_lengths(**staged)
+        staging = np.stack(list(staged.values()))
+        staging = context.nparray_to_context_array(staging)
+        for ii, nn in enumerate(staged.keys()):
+            out[nn] = staging[ii, :]
+
+    return out
+
+def _linear_combination(offset, matrix, values):
+    # Rows offset[i] + sum_j matrix[i, j] * values[j], with values being
+    # scalars or arrays on the target context. Vanishing terms are skipped
+    # (e.g. for uncoupled optics).
+    rows = []
+    for ii in range(len(offset)):
+        row = offset[ii]
+        for jj, vv in enumerate(values):
+            if matrix[ii, jj] != 0:
+                row = row + matrix[ii, jj] * vv
+        rows.append(row)
+    return rows
+
+def _stack_on_context(rows, num_particles, context):
+    XX = context.zeros(shape=(len(rows), num_particles), dtype=np.float64)
+    for ii, row in enumerate(rows):
+        XX[ii, :] = row
+    return XX
+
+def _check_drift_to_match_at_s(line, at_element, match_at_s, s_elements=None):
+    import xtrack as xt
+
+    if s_elements is None:
+        s_elements = line.get_s_elements()
+    expected_at_element = np.where(np.array(s_elements)<=match_at_s)[0][-1]
+    assert at_element == expected_at_element or (
+            at_element < expected_at_element and
+                all([xt._is_aperture(line.element_dict[nn], line)
+                    or xt._behaves_like_drift(line.element_dict[nn], line)
+            for nn in line._element_names_unique[at_element:expected_at_element]])), (
+        "`match_at_s` can only be placed in the drifts downstream of the "
+        "specified `at_element`. No active element can be present in between."
+        )
+
+def _drift_map(x, px, y, py, zeta, delta, rvv, length, exact=False,
+               sqrt=np.sqrt):
+    # Same as Drift_single_particle_expanded / Drift_single_particle_exact
+    # in xtrack, vectorised over the particles
+    if exact:
+        one_over_pz = 1. / sqrt((1. + delta)**2 - px * px - py * py)
+        xp = px * one_over_pz
+        yp = py * one_over_pz
+        dzeta = 1. - (1. + delta) * one_over_pz / rvv
+    else:
+        rpp = 1. / (1. + delta)
+        xp = px * rpp
+        yp = py * rpp
+        dzeta = 1. - (1. + (xp * xp + yp * yp) / 2.) / rvv
+    return x + xp * length, y + yp * length, zeta + dzeta * length
+
+def _drift_particles(particles, num_particles, length, exact=False):
+    # Track the first num_particles through a drift (all of them are
+    # assumed to be alive), in place on the context of the particles
+    nn = num_particles
+    x, y, zeta = _drift_map(particles.x[:nn], particles.px[:nn],
+                            particles.y[:nn], particles.py[:nn],
+                            particles.zeta[:nn], particles.delta[:nn],
+                            particles.rvv[:nn], length, exact=exact,
+                            sqrt=particles._context.nplike_lib.sqrt)
+    particles.x[:nn] = x
+    particles.y[:nn] = y
+    particles.zeta[:nn] = zeta
+    particles.s[:nn] = particles.s[:nn] + length
+
+# Steps for the derivatives of the drift map (same as the defaults used by
+# the twiss for the R matrix)
+_DRIFT_JACOBIAN_STEPS = np.array([1e-7, 1e-10, 1e-7, 1e-10, 1e-6, 1e-7])
+
+def _propagate_through_drift(W_matrix, particle_on_co, length, exact=False):
+    '''
+    Propagate the W matrix and the closed orbit through a drift of the given
+    length. The W matrix is rotated to have the same phase convention as the
+    twiss (W[0, 1] = W[2, 3] = W[4, 5] = 0).
+    '''
+    beta0 = particle_on_co._xobject.beta0[0]
+    X_co = np.array([particle_on_co._xobject.x[0],
+                     particle_on_co._xobject.px[0],
+                     particle_on_co._xobject.y[0],
+                     particle_on_co._xobject.py[0],
+                     particle_on_co._xobject.zeta[0],
+                     particle_on_co._xobject.ptau[0] / beta0])
+
+    # Jacobian of the drift map around the closed orbit (central differences)
+    XX = np.tile(X_co[:, None], (1, 12))
+    for ii in range(6):
+        XX[ii, 2 * ii] += _DRIFT_JACOBIAN_STEPS[ii]
+        XX[ii, 2 * ii + 1] -= _DRIFT_JACOBIAN_STEPS[ii]
+    ptau = XX[5] * beta0
+    delta = np.sqrt(ptau**2 + 2 * ptau / beta0 + 1) - 1
+    rvv = (1 + delta) / (1 + beta0 * ptau)
+    XX_out = XX.copy()
+    XX_out[0], XX_out[2], XX_out[4] = _drift_map(
+        XX[0], XX[1], XX[2], XX[3], XX[4], delta, rvv, length, exact=exact)
+    jacobian = ((XX_out[:, ::2] - XX_out[:, 1::2])
+                / (2 * _DRIFT_JACOBIAN_STEPS[None, :]))
+
+    WW = jacobian @ W_matrix
+    for ii in range(3):
+        phi = np.arctan2(WW[2 * ii, 2 * ii + 1], WW[2 * ii, 2 * ii])
+        cc, ss = np.cos(phi), np.sin(phi)
+        WW[:, 2 * ii: 2 * ii + 2] = (WW[:, 2 * ii: 2 * ii + 2]
+                                     @ np.array([[cc, -ss], [ss, cc]]))
+
+    particle_on_co = particle_on_co.copy()
+    _drift_particles(particle_on_co, 1, length, exact=exact)
+
+    return WW, particle_on_co
+
+@profiling.timed('build_particles')
 def build_particles(_context=None, _buffer=None, _offset=None, _capacity=None,
                       mode=None,
                       particle_ref=None,
@@ -58,14 +196,23 @@ def build_particles(_context=None, _buffer=None, _offset=None, _capacity=None,
                       weight=None,
                       s_tol=1e-6,
                       include_collective=False,
+                      twiss=None,
                       **kwargs, # They are passed to the twiss
                     ):
 
     """
     Same as `xtrack.Line.build_particles`. See there for documentation.
 
+    A precomputed `xtrack.TwissTable` of the line can be provided with
+    `twiss` to skip the computation of the optics.
+
     """
 
+    # Imported here to keep `import xpart` light
+    import xobjects as xo
+    import xtrack as xt
+    from .general import _print
+
     if line is not None and tracker is not None:
         raise ValueError(
             'line and tracker cannot be provided at the same time.')
@@ -106,24 +253,29 @@ def build_particles(_context=None, _buffer=None, _offset=None, _capacity=None,
     if not isinstance(particle_ref._buffer.context, xo.ContextCpu):
         particle_ref = particle_ref.copy(_context=xo.ContextCpu())
 
-    # Move other input parameters to cpu if needed
-    # Generated by:
-    # for nn in 'x px y py zeta delta x_norm px_norm y_norm py_norm'.split():
-    #     _print(f'{nn} = ({nn}.get() if hasattr({nn}, "get") else {nn})')
-    x = (x.get() if hasattr(x, "get") else x)
-    px = (px.get() if hasattr(px, "get") else px)
-    y = (y.get() if hasattr(y, "get") else y)
-    py = (py.get() if hasattr(py, "get") else py)
-    zeta = (zeta.get() if hasattr(zeta, "get") else zeta)
-    delta = (delta.get() if hasattr(delta, "get") else delta)
-    pzeta = (pzeta.get() if hasattr(pzeta, "get") else pzeta)
-    ptau = (ptau.get() if hasattr(ptau, "get") else ptau)
-    x_norm = (x_norm.get() if hasattr(x_norm, "get") else x_norm)
-    px_norm = (px_norm.get() if hasattr(px_norm, "get") else px_norm)
-    y_norm = (y_norm.get() if hasattr(y_norm, "get") else y_norm)
-    py_norm = (py_norm.get() if hasattr(py_norm, "get") else py_norm)
-    zeta_norm = (zeta_norm.get() if hasattr(zeta_norm, "get") else zeta_norm)
-    pzeta_norm = (pzeta_norm.get() if hasattr(pzeta_norm, "get") else pzeta_norm)
+    if _context is None and _buffer is None and line is not None:
+        _context = line._buffer.context
+    if _context is not None:
+        target_context = _context
+    elif _buffer is not None:
+        target_context = _buffer.context
+    else:
+        target_context = xo.context_default
+
+    # Move the input arrays to the target context if needed (the optics
+    # is computed on cpu, the particles are generated on the target context)
+    inputs = _inputs_to_context(target_context,
+        x=x, px=px, y=y, py=py, zeta=zeta, delta=delta, pzeta=pzeta,
+        ptau=ptau, x_norm=x_norm, px_norm=px_norm, y_norm=y_norm,
+        py_norm=py_norm, zeta_norm=zeta_norm, pzeta_norm=pzeta_norm,
+        weight=weight)
+    x, px, y, py = inputs['x'], inputs['px'], inputs['y'], inputs['py']
+    zeta, delta = inputs['zeta'], inputs['delta']
+    pzeta, ptau = inputs['pzeta'], inputs['ptau']
+    x_norm, px_norm = inputs['x_norm'], inputs['px_norm']
+    y_norm, py_norm = inputs['y_norm'], inputs['py_norm']
+    zeta_norm, pzeta_norm = inputs['zeta_norm'], inputs['pzeta_norm']
+    weight = inputs['weight']
 
     if line is not None and line.iscollective and not include_collective:
         logger.warning('Ignoring collective elements in particles generation.')
@@ -133,8 +285,6 @@ def build_particles(_context=None, _buffer=None, _offset=None, _capacity=None,
     if delta is not None:
         assert pzeta is None
         assert ptau is None
-        if not np.isscalar(delta):
-            delta = np.array(delta)
         beta0 = particle_ref._xobject.beta0[0]
         delta_beta0 = delta * beta0
         ptau_beta0 = (delta_beta0 * delta_beta0
@@ -145,8 +295,6 @@ def build_particles(_context=None, _buffer=None, _offset=None, _capacity=None,
     if ptau is not None:
         assert pzeta is None
         assert delta is None
-        if not np.isscalar(ptau):
-            ptau = np.array(ptau)
         pzeta = ptau / particle_ref._xobject.beta0[0]
 
     if (x_norm is not None or px_norm is not None
@@ -172,7 +320,6 @@ def build_particles(_context=None, _buffer=None, _offset=None, _capacity=None,
         'pdg_id': particle_ref.pdg_id[0],
         'anomalous_magnetic_moment': particle_ref.anomalous_magnetic_moment[0],
     }
-    part_dict = ref_dict.copy()
 
     if at_element is not None or match_at_s is not None:
         # Only this case is covered if not starting at element 0
@@ -192,51 +339,45 @@ def build_particles(_context=None, _buffer=None, _offset=None, _capacity=None,
         s_elements = line.get_s_elements()
         s_at_element = s_elements[at_element]
         if np.abs(match_at_s - s_at_element) < s_tol:
-            at_element_line_rmat = at_element
-            line_rmat = line
             match_at_s = None
         else:
             # Match at a position where there is no marker and backtrack to the previous marker
-            expected_at_element = np.where(np.array(s_elements)<=match_at_s)[0][-1]
-            assert at_element == expected_at_element or (
-                    at_element < expected_at_element and
-                        all([xt._is_aperture(line.element_dict[nn], line)
-                            or xt._behaves_like_drift(line.element_dict[nn], line)
-                    for nn in line._element_names_unique[at_element:expected_at_element]])), (
-                "`match_at_s` can only be placed in the drifts downstream of the "
-                "specified `at_element`. No active element can be present in between."
-                )
-            (tracker_rmat, _
-                ) = xt.twiss._build_auxiliary_tracker_with_extra_markers(
-                    tracker=line.tracker, at_s=[match_at_s],
-                    marker_prefix='xpart_rmat_')
-            at_element_line_rmat = tracker_rmat.line._element_names_unique.index(
-                                                                    'xpart_rmat_0')
-            line_rmat = tracker_rmat.line
-    else:
-        line_rmat = line
-        at_element_line_rmat = at_element
+            _check_drift_to_match_at_s(line, at_element, match_at_s,
+                                       s_elements=s_elements)
+            # The optics is computed at at_element and propagated
+            # analytically through the drift to match_at_s (see below)
 
     if mode == 'normalized_transverse':
 
         if W_matrix is None and line is not None:
-            if method is not None:
-                kwargs['method'] = method
-            tw = line_rmat.twiss(particle_on_co=particle_on_co,
-                                    particle_ref=particle_ref,
-                                    R_matrix=R_matrix, **kwargs)
+            if twiss is not None:
+                assert R_matrix is None, (
+                    '`twiss` and `R_matrix` cannot be provided together')
+                tw = twiss
+            else:
+                if method is not None:
+                    kwargs['method'] = method
+                with profiling.stage('twiss'):
+                    tw = line.twiss(particle_on_co=particle_on_co,
+                                        particle_ref=particle_ref,
+                                        R_matrix=R_matrix, **kwargs)
             tw_state = tw.get_twiss_init(at_element=
-                (at_element_line_rmat if at_element_line_rmat is not None else 0))
+                (at_element if at_element is not None else 0))
 
             # This is not initialized by get_twiss_init
-            tw_state.particle_on_co.at_element = line_rmat._element_names_unique.index(
+            tw_state.particle_on_co.at_element = line._element_names_unique.index(
                                                         tw_state.element_name)
 
             WW = tw_state.W_matrix
             particle_on_co = tw_state.particle_on_co
+            if match_at_s is not None:
+                WW, particle_on_co = _propagate_through_drift(WW,
+                        particle_on_co, length=match_at_s - s_at_element,
+                        exact=line.config.get('XTRACK_USE_EXACT_DRIFTS',
+                                              False))
         elif W_matrix is None and R_matrix is not None:
-            import xtrack.linear_normal_form as lnf
-            WW, _, _, _ = lnf.compute_linear_normal_form(R_matrix, **kwargs)
+            from .linear_normal_form import compute_linear_normal_form_cached
+            WW, _, _, _ = compute_linear_normal_form_cached(R_matrix, **kwargs)
         else:
             WW = W_matrix
 
@@ -326,25 +467,26 @@ def build_particles(_context=None, _buffer=None, _offset=None, _capacity=None,
         #     if pzeta is None and pzeta_norm is None:
         #         pzeta_norm = 0
 
-        BB = np.zeros(shape=(12, num_particles), dtype=np.float64)
         AA = np.zeros(shape=(12, 12), dtype=np.float64)
 
         # The first 6 equations are X - WW * X_norm = X_CO
         AA[:6, :6] = np.eye(6)
         AA[:6, 6:] = -WW
 
-        BB[0, :] = particle_on_co._xobject.x[0]
-        BB[1, :] = particle_on_co._xobject.px[0]
-        BB[2, :] = particle_on_co._xobject.y[0]
-        BB[3, :] = particle_on_co._xobject.py[0]
-        BB[4, :] = particle_on_co._xobject.zeta[0]
-        BB[5, :] = particle_on_co._xobject.ptau[0] / particle_on_co._xobject.beta0[0]
+        X_co = np.array([
+            particle_on_co._xobject.x[0],
+            particle_on_co._xobject.px[0],
+            particle_on_co._xobject.y[0],
+            particle_on_co._xobject.py[0],
+            particle_on_co._xobject.zeta[0],
+            particle_on_co._xobject.ptau[0] / particle_on_co._xobject.beta0[0]])
 
         # The next 6 equations fix either X or X_norm
+        constraints = []
         i_fill = 6
         for ii, rr in enumerate([x, px, y, py, zeta, pzeta]):
             if rr is not None:
-                BB[i_fill, :] = np.array(rr)
+                constraints.append(rr)
                 AA[i_fill, ii] = 1
                 i_fill += 1
 
@@ -352,14 +494,16 @@ def build_particles(_context=None, _buffer=None, _offset=None, _capacity=None,
                     [x_norm, px_norm, y_norm, py_norm, zeta_norm, pzeta_norm],
                     [gemitt_x, gemitt_x, gemitt_y, gemitt_y, gemitt_zeta, gemitt_zeta])):
             if rr_norm is not None:
-                rr_norm_scaled = np.sqrt(gemitt) * np.array(rr_norm)
-                BB[i_fill, :] = rr_norm_scaled
+                constraints.append(np.sqrt(gemitt) * rr_norm)
                 AA[i_fill, ii + 6] = 1
                 i_fill += 1
 
-        # Solve and extract geometric coordinates
-        X_Xhat = np.linalg.solve(AA, BB)
-        XX = X_Xhat[:6, :]
+        # The system is the same for all particles: it is inverted once and
+        # the geometric coordinates are obtained with array operations on
+        # the target context
+        AA_inv = np.linalg.inv(AA)
+        XX = _linear_combination(offset=AA_inv[:6, :6] @ X_co,
+                                 matrix=AA_inv[:6, 6:], values=constraints)
 
     elif mode == 'set':
 
@@ -377,13 +521,7 @@ def build_particles(_context=None, _buffer=None, _offset=None, _capacity=None,
             zeta=zeta, delta=delta, x=x, px=px,
             y=y, py=py)
 
-        XX = np.zeros(shape=(6, num_particles), dtype=np.float64)
-        XX[0, :] = x
-        XX[1, :] = px
-        XX[2, :] = y
-        XX[3, :] = py
-        XX[4, :] = zeta
-        XX[5, :] = pzeta
+        XX = [x, px, y, py, zeta, pzeta]
 
     elif mode == "shift":
 
@@ -401,62 +539,58 @@ def build_particles(_context=None, _buffer=None, _offset=None, _capacity=None,
             zeta=zeta, delta=delta, x=x, px=px,
             y=y, py=py)
 
-        XX = np.zeros(shape=(6, num_particles), dtype=np.float64)
-        XX[0, :] = x + particle_ref.x
-        XX[1, :] = px + particle_ref.px
-        XX[2, :] = y + particle_ref.y
-        XX[3, :] = py + particle_ref.py
-        XX[4, :] = zeta + particle_ref.zeta
-        XX[5, :] = pzeta + particle_ref.ptau / particle_ref._xobject.beta0[0]
+        XX = [x + particle_ref._xobject.x[0],
+              px + particle_ref._xobject.px[0],
+              y + particle_ref._xobject.y[0],
+              py + particle_ref._xobject.py[0],
+              zeta + particle_ref._xobject.zeta[0],
+              pzeta + particle_ref._xobject.ptau[0]
+                        / particle_ref._xobject.beta0[0]]
     else:
         raise ValueError('What?!')
 
-    part_dict['x'] = XX[0, :]
-    part_dict['px'] = XX[1, :]
-    part_dict['y'] = XX[2, :]
-    part_dict['py'] = XX[3, :]
-    part_dict['zeta'] = XX[4, :]
-    part_dict['ptau'] = XX[5, :] * particle_ref._xobject.beta0[0]
-
-    part_dict['weight'] = np.ones(num_particles, dtype=np.float64)
-
-    if _context is None and _buffer is None and line is not None:
-        _context = line._buffer.context
-
-    particles = Particles(_context=_context, _buffer=_buffer, _offset=_offset,
-                          _capacity=_capacity,**part_dict)
-
-    particles.particle_id[:num_particles] = particles._buffer.context.nparray_to_context_array(
-                                   np.arange(0, num_particles, dtype=np.int64))
-    if weight is not None:
-        particles.weight[:num_particles] = weight
+    # Fields that are the same for all particles are set when the particles
+    # object is initialized (no transfer needed)
+    init_fields = ref_dict.copy()
+    for nn in ['spin_x', 'spin_y', 'spin_z']:
+        init_fields[nn] = kwargs.get(nn,
+                                     getattr(particle_ref._xobject, nn)[0])
+    if weight is not None and np.ndim(weight) == 0:
+        init_fields['weight'] = weight
+    if at_element is not None:
+        if match_at_s is None:
+            assert particle_on_co.at_element[0] == at_element
+        # In case of match_at_s, s is updated by the backtracking below
+        init_fields['s'] = particle_on_co._xobject.s[0]
+        init_fields['at_element'] = at_element
+        init_fields['start_tracking_at_element'] = at_element
+
+    with profiling.stage('particles_allocation'):
+        XX = _stack_on_context(XX, num_particles, target_context)
+        particles = Particles(_context=_context, _buffer=_buffer,
+                              _offset=_offset, _capacity=_capacity,
+                              particle_id=np.arange(0, num_particles,
+                                                    dtype=np.int64),
+                              **init_fields)
+        # The coordinates are written in place in the particles buffer (the
+        # energy deviations are updated from ptau)
+        particles.x[:num_particles] = XX[0, :]
+        particles.px[:num_particles] = XX[1, :]
+        particles.y[:num_particles] = XX[2, :]
+        particles.py[:num_particles] = XX[3, :]
+        particles.zeta[:num_particles] = XX[4, :]
+        particles.ptau[:num_particles] = (XX[5, :]
+                                          * particle_ref._xobject.beta0[0])
+        if weight is not None and np.ndim(weight) > 0:
+            particles.weight[:num_particles] = weight
+        profiling.record_arrays(XX)
 
     if match_at_s is not None:
         # Backtrack to at_element
         length_aux_drift = -match_at_s + line.get_s_position(at_element)
         assert length_aux_drift <= 0
-        auxdrift = xt.Drift(length=length_aux_drift,
-                            _context=line._buffer.context)
-        auxdrift.track(particles)
-
-    if at_element is not None:
-        if match_at_s is not None:
-            particles.s[:num_particles] = particle_on_co._xobject.s[0] + length_aux_drift
-        else:
-            assert particle_on_co.at_element[0] == at_element
-            particles.s[:num_particles] = particle_on_co._xobject.s[0]
-        particles.at_element[:num_particles] = at_element
-
-        particles.start_tracking_at_element = at_element
-
-    particles.spin_x[:num_particles] = particle_ref._xobject.spin_x[0]
-    particles.spin_y[:num_particles] = particle_ref._xobject.spin_y[0]
-    particles.spin_z[:num_particles] = particle_ref._xobject.spin_z[0]
-    if 'spin_x' in kwargs:
-        particles.spin_x[:num_particles] = kwargs['spin_x']
-    if 'spin_y' in kwargs:
-        particles.spin_y[:num_particles] = kwargs['spin_y']
-    if 'spin_z' in kwargs:
-        particles.spin_z[:num_particles] = kwargs['spin_z']
+        _drift_particles(particles, num_particles, length_aux_drift,
+                         exact=line.config.get('XTRACK_USE_EXACT_DRIFTS',
+                                               False))
 
     return particles
@@ -3,7 +3,105 @@
 # Copyright (c) CERN, 2021.                 #
 # ######################################### #
 
+import logging
+import time
 from pathlib import Path
 from xobjects.general import _print
 
 _pkg_root = Path(__file__).parent.absolute()
+
+progress_logger = logging.getLogger('xpart.progress')
+
+
+class ProgressChannel:
+
+    '''
+    Rate-limited channel for the progress reports of long-running loops
+    (matching, sampling, ...).
+
+    Reports are emitted as INFO records of the `xpart.progress` logger and
+    passed to an optional callback, at most once every `min_interval`
+    seconds for each task. The first report and the completion
+    (fraction >= 1, or `done` for the tasks reported without fraction) of a
+    task are always emitted.
+
+    Parameters
+    ----------
+    min_interval : float
+        Minimum time in seconds between two reports of the same task.
+
+    Attributes
+    ----------
+    enabled : bool
+        If False, all reports are discarded.
+    callback : callable
+        Called as `callback(task, fraction, message)` for each emitted report
+        (e.g. to drive a job-level progress bar).
+    '''
+
+    def __init__(self, min_interval=1.):
+        self.enabled = True
+        self.min_interval = min_interval
+        self.callback = None
+        self._last_report = {}
+
+    def __call__(self, task, fraction=None, message=None):
+        '''
+        Report the progress of `task`. `fraction` is the completed fraction
+        (None if unknown) and `message` an optional string.
+        '''
+        if not self.enabled:
+            return
+
+        now = time.monotonic()
+        done = fraction is not None and fraction >= 1
+        last = self._last_report.get(task)
+        if (not done and last is not None
+                and now - last < self.min_interval):
+            return
+        if done:
+            self._last_report.pop(task, None)
+        else:
+            self._last_report[task] = now
+
+        self._emit(task, fraction, message)
+
+    def done(self, task, message=None):
+        '''
+        Report the completion of a task reported with messages only (no
+        fraction, e.g. iterations of unknown number). Nothing is emitted if
+        the task was not reported.
+        '''
+        if self._last_report.pop(task, None) is None or not self.enabled:
+            return
+        self._emit(task, None, message)
+
+    def _emit(self, task, fraction, message):
+        if progress_logger.isEnabledFor(logging.INFO):
+            text = task
+            if fraction is not None:
+                text += f': {round(fraction*100):3d}%'
+            if message is not None:
+                text += f': {message}'
+            progress_logger.info(text)
+
+        if self.callback is not None:
+            self.callback(task, fraction, message)
+
+
+progress = ProgressChannel()
+
+
+def set_progress_callback(callback):
+    '''
+    Set the function called as `callback(task, fraction, message)` for each
+    progress report (None to remove it).
+    '''
+    progress.callback = callback
+
+
+def silence_progress(silent=True):
+    '''
+    Globally disable (or re-enable) the progress reports.
+    '''
+    progress.enabled = not silent
@@ -1,7 +1,278 @@
 # copyright ############################### #
 # This file is part of the Xpart Package.   #
-# Copyright (c) CERN, 2021.                 #
+# Copyright (c) CERN, 2025.                 #
 # ######################################### #
 
-from xtrack.linear_normal_form import healy_symplectify, compute_linear_normal_form
+import hashlib
+from collections import OrderedDict
 
+import numpy as np
+
+from xtrack.linear_normal_form import compute_linear_normal_form
+
+NORMAL_FORM_CACHE_SIZE = 64
+
+_normal_form_cache = OrderedDict()
+_inverse_cache = OrderedDict()
+
+
+def _normal_form_key(R_matrix, kwargs):
+    R_matrix = np.ascontiguousarray(R_matrix, dtype=np.float64)
+    hh = hashlib.sha256(R_matrix.tobytes())
+    hh.update(repr(R_matrix.shape).encode())
+    hh.update(repr(sorted(kwargs.items())).encode())
+    return hh.hexdigest()
+
+
+def _lru_get(cache, key, compute):
+    if key in cache:
+        cache.move_to_end(key)
+    else:
+        cache[key] = compute()
+        while len(cache) > NORMAL_FORM_CACHE_SIZE:
+            cache.popitem(last=False)
+    return cache[key]
+
+
+def _cached_inverse(W_matrix):
+    W_matrix = np.array(W_matrix, dtype=np.float64)
+    return _lru_get(_inverse_cache, _normal_form_key(W_matrix, {}),
+                    lambda: np.linalg.inv(W_matrix)).copy()
+
+
+def compute_linear_normal_form_cached(R_matrix, **kwargs):
+    '''
+    Same as `compute_linear_normal_form`, with the results kept in a least
+    recently used cache keyed on the content of the R matrix and on the
+    keyword arguments, so that identical matrices (e.g. in scans or in
+    repeated calls of the generators) are decomposed only once.
+
+    Returns
+    -------
+    W : np.ndarray
+        Normalization matrix.
+    invW : np.ndarray
+        Inverse of W.
+    Rot : np.ndarray
+        One-turn rotation in normalized coordinates.
+    eigenvalues : np.ndarray
+        Eigenvalues of the three modes.
+    '''
+    res = _lru_get(_normal_form_cache, _normal_form_key(R_matrix, kwargs),
+                   lambda: compute_linear_normal_form(
+                            np.array(R_matrix, dtype=np.float64), **kwargs))
+
+    # Copies, so that the cached matrices cannot be modified by the caller
+    return tuple(vv.copy() for vv in res)
+
+
+def clear_normal_form_cache():
+    '''
+    Clear the cache of linear normal forms (and of the inverted W matrices).
+    '''
+    _normal_form_cache.clear()
+    _inverse_cache.clear()
+
+
+def _apply_matrix(matrix, XX, out=None):
+    # matrix @ XX for XX of shape (6, num_particles), on the context of XX
+    if isinstance(XX, np.ndarray):
+        return np.matmul(matrix, XX, out=out)
+
+    # Device arrays: linear combination of the rows (skipping vanishing terms)
+    rows_in = [XX[jj, :] for jj in range(XX.shape[0])]
+    if out is None:
+        out = XX.copy()
+    elif out is XX:
+        rows_in = [rr.copy() for rr in rows_in]
+    for ii in range(matrix.shape[0]):
+        row = 0.
+        for jj in range(matrix.shape[1]):
+            if matrix[ii, jj] != 0:
+                row = row + matrix[ii, jj] * rows_in[jj]
+        out[ii, :] = row
+    return out
+
+
+class NormalForm:
+
+    '''
+    Linear normal form of a one-turn matrix, with the transformations
+    between physical and normalized coordinates.
+
+    Coordinates are handled as arrays of shape (6, num_particles) with rows
+    (x, px, y, py, zeta, pzeta), on the cpu or on a device context.
+
+    Parameters
+    ----------
+    W_matrix : array_like
+        Normalization matrix (e.g. from the twiss).
+    W_inv : array_like, optional
+        Inverse of W (computed if not provided).
+    rotation : array_like, optional
+        One-turn rotation in normalized coordinates.
+    eigenvalues : array_like, optional
+        Eigenvalues of the three modes.
+    '''
+
+    def __init__(self, W_matrix, W_inv=None, rotation=None,
+                 eigenvalues=None):
+        self.W_matrix = np.array(W_matrix, dtype=np.float64)
+        if W_inv is None:
+            W_inv = _cached_inverse(self.W_matrix)
+        self.W_inv = np.array(W_inv, dtype=np.float64)
+        self.rotation = rotation
+        self.eigenvalues = eigenvalues
+
+    @classmethod
+    def from_R_matrix(cls, R_matrix, **kwargs):
+        '''
+        Build the normal form of a one-turn matrix. The decomposition is
+        cached (see `compute_linear_normal_form_cached`), kwargs are passed
+        to `compute_linear_normal_form`.
+        '''
+        W, invW, Rot, eigenvalues = compute_linear_normal_form_cached(
+                                                        R_matrix, **kwargs)
+        return cls(W_matrix=W, W_inv=invW, rotation=Rot,
+                   eigenvalues=eigenvalues)
+
+    @classmethod
+    def from_twiss_init(cls, twiss_init):
+        '''
+        Build the normal form from the W matrix of a TwissInit (e.g. from
+        `TwissTable.get_twiss_init`).
+        '''
+        return cls(W_matrix=twiss_init.W_matrix)
+
+    def to_physical(self, XX_norm, closed_orbit=None, out=None):
+        '''
+        Transform normalized coordinates to physical coordinates:
+        X = W @ X_norm + X_co.
+
+        Parameters
+        ----------
+        XX_norm : array
+            Normalized coordinates, shape (6, num_particles).
+        closed_orbit : array_like, optional
+            Closed orbit (x, px, y, py, zeta, pzeta) added to the result.
+        out : array, optional
+            Output array of shape (6, num_particles).
+        '''
+        out = _apply_matrix(self.W_matrix, XX_norm, out=out)
+        if closed_orbit is not None:
+            for ii in range(6):
+                out[ii, :] += closed_orbit[ii]
+        return out
+
+    def to_normalized(self, XX, closed_orbit=None, out=None):
+        '''
+        Transform physical coordinates to normalized coordinates:
+        X_norm = W_inv @ (X - X_co).
+
+        Parameters
+        ----------
+        XX : array
+            Physical coordinates, shape (6, num_particles).
+        closed_orbit : array_like, optional
+            Closed orbit (x, px, y, py, zeta, pzeta) subtracted before the
+            transformation.
+        out : array, optional
+            Output array of shape (6, num_particles).
+        '''
+        if closed_orbit is not None:
+            # W_inv @ (X - X_co) = W_inv @ X - W_inv @ X_co
+            offset = self.W_inv @ np.asarray(closed_orbit, dtype=np.float64)
+        out = _apply_matrix(self.W_inv, XX, out=out)
+        if closed_orbit is not None:
+            for ii in range(6):
+                out[ii, :] -= offset[ii]
+        return out
+
+
+def normalize(particles, W_matrix=None, twiss_init=None, particle_on_co=None,
+              nemitt_x=None, nemitt_y=None, nemitt_zeta=None, out=None):
+    '''
+    Compute the normalized coordinates of the particles.
+
+    The closed orbit subtraction, the inverse of the W matrix (cached) and
+    the emittance scaling are combined in a single matrix applied to all the
+    particles at once, on the context of the particles. The particles are
+    not compacted: the result has one column per slot of the particles
+    object and is set to nan for the particles that are not active
+    (state <= 0).
+
+    Parameters
+    ----------
+    particles : xtrack.Particles
+        Particles at the location of the W matrix.
+    W_matrix : array_like, optional
+        Normalization matrix. Alternatively `twiss_init` can be provided.
+    twiss_init : xtrack.TwissInit, optional
+        Optics at the location of the particles (e.g. from
+        `TwissTable.get_twiss_init`), providing the W matrix and the
+        particle on the closed orbit.
+    particle_on_co : xtrack.Particles, optional
+        Particle on the closed orbit. It is taken from `twiss_init` if not
+        provided. If neither is available the closed orbit is zero.
+    nemitt_x : float, optional
+        Horizontal normalized emittance (in m rad). If provided, x_norm and
+        px_norm are expressed in units of beam sigma.
+    nemitt_y : float, optional
+        Vertical normalized emittance (in m rad).
+    nemitt_zeta : float, optional
+        Longitudinal normalized emittance (in m).
+    out : array, optional
+        Output array of shape (6, particles._capacity) on the context of
+        the particles.
+
+    Returns
+    -------
+    out : array
+        Normalized coordinates, with rows
+        (x_norm, px_norm, y_norm, py_norm, zeta_norm, pzeta_norm).
+    '''
+
+    if (W_matrix is None) == (twiss_init is None):
+        raise ValueError(
+            'Exactly one of `W_matrix` and `twiss_init` must be provided.')
+    if twiss_init is not None:
+        W_matrix = twiss_init.W_matrix
+        if particle_on_co is None:
+            particle_on_co = twiss_init.particle_on_co
+
+    if particle_on_co is not None:
+        ref = particle_on_co._xobject
+        X_co = np.array([ref.x[0], ref.px[0], ref.y[0], ref.py[0],
+                         ref.zeta[0], ref.ptau[0] / ref.beta0[0]])
+    else:
+        ref = particles._xobject
+        X_co = np.zeros(6)
+    beta0 = ref.beta0[0]
+    gamma0 = ref.gamma0[0]
+
+    scale = np.ones(6)
+    for ii, nemitt in zip([0, 2, 4], [nemitt_x, nemitt_y, nemitt_zeta]):
+        if nemitt is not None:
+            scale[ii: ii + 2] = 1 / np.sqrt(nemitt / beta0 / gamma0)
+
+    # X_norm = S W_inv (X - X_co) = MM X - MM X_co
+    MM = scale[:, None] * _cached_inverse(W_matrix)
+    offset = MM @ X_co
+
+    context = particles._context
+    XX = context.zeros(shape=(6, particles._capacity), dtype=np.float64)
+    XX[0, :] = particles.x
+    XX[1, :] = particles.px
+    XX[2, :] = particles.y
+    XX[3, :] = particles.py
+    XX[4, :] = particles.zeta
+    XX[5, :] = particles.ptau / particles.beta0
+
+    out = _apply_matrix(MM, XX, out=out)
+
+    nplike = context.nplike_lib
+    active = particles.state > 0
+    for ii in range(6):
+        out[ii, :] = nplike.where(active, out[ii, :] - offset[ii], np.nan)
+
+    return out
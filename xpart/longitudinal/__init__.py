@@ -6,6 +6,14 @@
 from .generate_longitudinal import (generate_longitudinal_coordinates,
                                     _characterize_line, get_bucket)
 from .single_rf_harmonic_matcher import SingleRFHarmonicMatcher
+from .multi_harmonic_matcher import MultiHarmonicMatcher
 from .generate_binomial_longitudinal_distribution import generate_binomial_longitudinal_coordinates
 from .generate_parabolic_longitudinal_distribution import generate_parabolic_longitudinal_coordinates
 from .generate_qgaussian_longitudinal_distribution import generate_qgaussian_longitudinal_coordinates
+from .match_cache import (MatchCache, enable_match_cache, disable_match_cache,
+                          get_match_cache)
+from .ramp_matching import match_longitudinal_ramp
+from .bucket_train import BucketTrain
+from .profiles import ProfileEngine
+from .profile_fitting import LongitudinalProfileFitter, fit_longitudinal_profile
+from .potential_well import PotentialWell, induced_voltage
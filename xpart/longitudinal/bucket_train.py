@@ -0,0 +1,154 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+import numpy as np
+
+
+class BucketTrain:
+
+    '''
+    Geometry of the RF buckets along the ring for a bunch train, used to
+    find the RF bucket occupied by each particle and whether it is captured
+    (e.g. to monitor satellite or ghost bunches).
+
+    RF bucket i is centred at `z_offset - i * bucket_length`, with the
+    bucket length given by the harmonic of the largest RF voltage and the
+    bunches of the filling scheme placed as in
+    `generate_matched_gaussian_multibunch_beam`: the bunch in slot j of the
+    filling scheme occupies RF bucket `j * bunch_spacing_buckets`.
+
+    Parameters
+    ----------
+    filling_scheme : array_like
+        Filling scheme (non-zero for the filled slots), with one entry per
+        bunch slot. It is padded with empty slots to cover the ring.
+    rfbucket : RFBucket
+        RF bucket at zeta = 0, providing the tabulated separatrix.
+    bunch_spacing_buckets : int
+        Number of RF buckets between two slots of the filling scheme.
+    margin : float
+        Classify with respect to the equihamiltonian margin * h_sfp instead
+        of the separatrix (see RFBucket.is_in_separatrix).
+    n_points : int
+        Number of points of the separatrix table.
+    '''
+
+    def __init__(self, filling_scheme, rfbucket, bunch_spacing_buckets=1,
+                 margin=0, n_points=10001):
+
+        self.rfbucket = rfbucket
+        self.bunch_spacing_buckets = bunch_spacing_buckets
+        self.margin = margin
+        self.n_points = n_points
+
+        from ..matched_gaussian import _pad_filling_scheme
+
+        # Main harmonic as in generate_matched_gaussian_multibunch_beam
+        main_harmonic = np.floor(
+            np.atleast_1d(rfbucket.h)[np.argmax(rfbucket.V)] + 0.5)
+        self.bucket_length = rfbucket.circumference / main_harmonic
+        self.z_offset = rfbucket.z_sfp_extr
+
+        self.filling_scheme = _pad_filling_scheme(
+            np.asarray(filling_scheme, dtype=np.int64),
+            rfbucket.circumference,
+            bunch_spacing_buckets * self.bucket_length)
+
+        self.num_buckets = len(self.filling_scheme) * bunch_spacing_buckets
+        self.filled_buckets = (self.filling_scheme.nonzero()[0]
+                               * bunch_spacing_buckets)
+        self.bucket_centres = (self.z_offset
+                               - self.filled_buckets * self.bucket_length)
+
+        # Bunch number (index in the list of filled buckets) of each RF
+        # bucket, -1 for empty buckets
+        self.bunch_number_of_bucket = np.full(self.num_buckets, -1,
+                                              dtype=np.int64)
+        self.bunch_number_of_bucket[self.filled_buckets] = np.arange(
+                                                    len(self.filled_buckets))
+
+        # Computed once, shared by all the calls
+        self.rfbucket.separatrix_table(margin, n_points)
+
+    @property
+    def num_bunches(self):
+        return len(self.filled_buckets)
+
+    def classify(self, zeta, delta, _context=None):
+        '''
+        Find whether each particle is inside the separatrix of its RF bucket,
+        and the index of that bucket (same order as RFBucket.classify).
+
+        Parameters
+        ----------
+        zeta : array_like
+            Longitudinal positions.
+        delta : array_like
+            Momentum deviations.
+        _context : xobjects context, optional
+            Context of the arrays (CPU by default).
+
+        Returns
+        -------
+        in_bucket : np.ndarray
+            True for the particles captured in their RF bucket.
+        bucket_index : np.ndarray
+            Index of the RF bucket containing each particle (see class
+            docstring). Values outside [0, num_buckets) correspond to
+            particles beyond the ring.
+        '''
+        return self.rfbucket.classify(
+                zeta, delta, margin=self.margin, n_points=self.n_points,
+                _context=_context, bucket_length=self.bucket_length)
+
+    def get_bunch_number(self, bucket_index, _context=None):
+        '''
+        Return the bunch number (index among the filled buckets) for each
+        RF bucket index, -1 for empty buckets and for indices outside the
+        ring.
+        '''
+        if _context is None:
+            nplike = np
+            table = self.bunch_number_of_bucket
+        else:
+            nplike = _context.nplike_lib
+            table = _context.nparray_to_context_array(
+                                                self.bunch_number_of_bucket)
+        within_ring = (bucket_index >= 0) & (bucket_index < self.num_buckets)
+        bunch_number = table[nplike.clip(bucket_index, 0,
+                                         self.num_buckets - 1)]
+        return nplike.where(within_ring, bunch_number, -1)
+
+    def get_bucket_population(self, zeta, delta, weights=None,
+                              _context=None):
+        '''
+        Return the number of captured particles in each RF bucket of the
+        ring (array of length num_buckets). The population of the filled
+        buckets is obtained with `population[train.filled_buckets]`, the
+        satellites are in the other buckets.
+
+        Parameters
+        ----------
+        zeta : array_like
+            Longitudinal positions.
+        delta : array_like
+            Momentum deviations.
+        weights : array_like, optional
+            Weight of each particle (e.g. particles.weight, with zeros for
+            the lost particles).
+        _context : xobjects context, optional
+            Context of the arrays (CPU by default).
+        '''
+        nplike = np if _context is None else _context.nplike_lib
+        in_bucket, bucket_index = self.classify(zeta, delta,
+                                                _context=_context)
+        counted = (in_bucket & (bucket_index >= 0)
+                   & (bucket_index < self.num_buckets))
+        if weights is None:
+            weights = counted.astype(np.float64)
+        else:
+            weights = nplike.where(counted, weights, 0.)
+        return nplike.bincount(nplike.where(counted, bucket_index, 0),
+                               weights=weights, minlength=self.num_buckets)
@@ -10,7 +10,8 @@ def generate_binomial_longitudinal_coordinates(num_particles=None,
                                                tracker=None,
                                                line=None,
                                                return_matcher=False,
-                                               m=5.0
+                                               m=5.0,
+                                               sampling='pseudo'
                                                ):
 
     """
@@ -34,6 +35,8 @@ def generate_binomial_longitudinal_coordinates(num_particles=None,
         whether to also return xp.SingleRFHarmonicMatcher object
     m : float
         binomial parameter, determines fatness of tails. 5.0 is typical value of Pb ions at extraction
+    sampling : str
+        sampling mode, 'pseudo', 'sobol' or 'halton'
 
     Returns:
     --------
@@ -80,7 +83,8 @@ def generate_binomial_longitudinal_coordinates(num_particles=None,
     zeta, delta, matcher = generate_longitudinal_coordinates(line=line, distribution='binomial',
                             num_particles=num_particles,
                             engine='single-rf-harmonic', sigma_z=sigma_z,
-                            particle_ref=particle_ref, return_matcher=True, m=m)
+                            particle_ref=particle_ref, return_matcher=True, m=m,
+                            sampling=sampling)
 
     if return_matcher:
         return zeta, delta, matcher
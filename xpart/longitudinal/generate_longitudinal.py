@@ -16,11 +16,16 @@ from .rfbucket_matching import ThermalDistribution
 from .rf_bucket import RFBucket
 from xtrack.particles import Particles
 from .single_rf_harmonic_matcher import SingleRFHarmonicMatcher
+from .multi_harmonic_matcher import MultiHarmonicMatcher
+from .. import profiling
 from ..general import _print
+from ..sampling import _check_sampling
+from ..transverse_generators.gaussian import generate_2D_gaussian
 
 logger = logging.getLogger(__name__)
 
-def _characterize_line(line, particle_ref,
+@profiling.timed('characterize_line')
+def _characterize_line(line, particle_ref, twiss=None,
                           **kwargs # passed to twiss
                           ):
 
@@ -84,8 +89,13 @@ def _characterize_line(line, particle_ref,
     if found_nonlinear_longitudinal:
         assert len(freq_list) > 0
 
-    tw = line.twiss(
-        particle_ref=particle_ref, **kwargs)
+    if twiss is not None:
+        # Precomputed optics (e.g. shared with build_particles)
+        tw = twiss
+    else:
+        with profiling.stage('twiss'):
+            tw = line.twiss(
+                particle_ref=particle_ref, **kwargs)
 
     p0c_increase_from_energy_program = None
     if line.energy_program is not None:
@@ -115,6 +125,26 @@ def get_bucket(line, **kwargs):
                                              _only_bucket=True,
                                              **kwargs)
 
+def _sample_from_matcher(matcher, num_particles, particle_ref,
+                         sampling='pseudo', rng=None):
+
+    if isinstance(matcher, RFBucketMatcher):
+        return matcher.sample(num_particles, rng=rng, sampling=sampling)
+
+    with profiling.stage('sampling'):
+        tau, ptau = matcher.sample(num_particles, rng=rng, sampling=sampling)
+
+    with profiling.stage('tau_ptau_to_zeta_delta'):
+        # convert (tau, ptau) to (zeta, delta)
+        z_particles = np.array(particle_ref._xobject.beta0[0]) * tau  # zeta
+        temp_particles = Particles(p0c=particle_ref._xobject.p0c[0],
+                                   zeta=z_particles, ptau=ptau)
+        delta_particles = np.array(temp_particles.delta)
+
+    return z_particles, delta_particles
+
+
+@profiling.timed('generate_longitudinal_coordinates')
 def generate_longitudinal_coordinates(
                                     line=None,
                                     num_particles=None,
@@ -133,6 +163,10 @@ def generate_longitudinal_coordinates(
                                     tracker=None,
                                     m=None,
                                     q=None,
+                                    sampling='pseudo',
+                                    rng=None,
+                                    matcher=None,
+                                    twiss=None,
                                     _only_bucket=False,
                                     **kwargs # passed to twiss
                                     ):
@@ -154,13 +188,28 @@ def generate_longitudinal_coordinates(
         RMS bunch length in meters.
     engine: str
         Engine to be used for the generation. Possible values are `pyheadtail`
-        and `single-rf-harmonic`.
+        and `single-rf-harmonic` (which also supports several RF harmonics
+        in a stationary bucket).
     return_matcher: bool
         If True, the matcher object is returned.
     m : float
         binomial parameter if distribution is 'binomial'
     q : float
         q-Gaussian parameter if distribution is 'qgaussian'
+    sampling : str
+        Sampling mode. Can be 'pseudo' (pseudo-random numbers), 'sobol' or
+        'halton' (scrambled low-discrepancy sequences).
+    rng : np.random.Generator, optional
+        Random number generator (used as scrambling seed for the
+        low-discrepancy sequences). If not provided, `np.random` is used.
+    matcher : RFBucketMatcher or SingleRFHarmonicMatcher, optional
+        Matcher returned by a previous call (with `return_matcher=True`).
+        If provided, the particles are sampled from the already matched
+        distribution and the line, RF and distribution parameters are not
+        used (except for the reference particle).
+    twiss : xtrack.TwissTable, optional
+        Precomputed twiss of the line, used for the slip factor and the
+        momentum compaction instead of computing a new twiss.
 
     Returns
     -------
@@ -178,17 +227,31 @@ def generate_longitudinal_coordinates(
         raise ValueError(
             'line and tracker cannot be provided at the same time.')
 
+    _check_sampling(sampling)
+
     if tracker is not None:
         _print('Warning! '
             "The argument tracker is deprecated. Please use line instead.",
             DeprecationWarning)
         line = tracker.line
 
+    if matcher is not None:
+        if particle_ref is None:
+            assert line is not None, (
+                '`line` or `particle_ref` must be provided')
+            particle_ref = line.particle_ref
+        z_particles, delta_particles = _sample_from_matcher(
+            matcher, num_particles, particle_ref, sampling=sampling, rng=rng)
+        if return_matcher:
+            return z_particles, delta_particles, matcher
+        else:
+            return z_particles, delta_particles
+
     if line is not None:
         if particle_ref is None:
             particle_ref = line.particle_ref
         assert particle_ref is not None
-        dct = _characterize_line(line, particle_ref, **kwargs)
+        dct = _characterize_line(line, particle_ref, twiss=twiss, **kwargs)
 
     assert particle_ref is not None
 
@@ -252,8 +315,11 @@ def generate_longitudinal_coordinates(
             raise NotImplementedError
         assert line is not None, ('Not yet implemented if line is not provided')
         sigma_dp = sigma_z / np.abs(dct['bets0'])
-        z_particles = sigma_z * np.random.normal(size=num_particles)
-        delta_particles = sigma_dp * np.random.normal(size=num_particles)
+        with profiling.stage('sampling'):
+            z_norm, delta_norm = generate_2D_gaussian(num_particles,
+                                                  sampling=sampling, rng=rng)
+        z_particles = sigma_z * z_norm
+        delta_particles = sigma_dp * delta_norm
         assert energy_ref_increment is None
     elif engine == "pyheadtail":
         if distribution != 'gaussian':
@@ -270,7 +336,8 @@ def generate_longitudinal_coordinates(
         dp0c_J = dp0c_eV * qe
         dp0_si = dp0c_J / clight
 
-        rfbucket = RFBucket(circumference=circumference,
+        with profiling.stage('rf_bucket'):
+            rfbucket = RFBucket(circumference=circumference,
                             gamma=gamma0,
                             mass_kg=mass0/(clight**2)*qe,
                             charge_coulomb=np.abs(q0)*qe,
@@ -290,14 +357,19 @@ def generate_longitudinal_coordinates(
             eta = momentum_compaction_factor - 1/particle_ref._xobject.gamma0[0]**2
             beta_z = np.abs(eta) * circumference / 2.0 / np.pi / rfbucket.Q_s
             sigma_dp = sigma_z / beta_z
-            z_particles = sigma_z * np.random.normal(size=num_particles)
-            delta_particles = sigma_dp * np.random.normal(size=num_particles)
+            with profiling.stage('sampling'):
+                z_norm, delta_norm = generate_2D_gaussian(num_particles,
+                                                  sampling=sampling, rng=rng)
+            z_particles = sigma_z * z_norm
+            delta_particles = sigma_dp * delta_norm
         else:
-            matcher = RFBucketMatcher(rfbucket=rfbucket,
-                distribution_type=ThermalDistribution,
-                sigma_z=sigma_z)
-            z_particles, delta_particles, _, _ = matcher.generate(
-                                        macroparticlenumber=num_particles)
+            with profiling.stage('rf_bucket_matcher'):
+                matcher = RFBucketMatcher(rfbucket=rfbucket,
+                    distribution_type=ThermalDistribution,
+                    sigma_z=sigma_z)
+                z_particles, delta_particles, _, _ = matcher.generate(
+                                        macroparticlenumber=num_particles,
+                                        sampling=sampling, rng=rng)
 
     elif engine == "single-rf-harmonic":
         if distribution not in ["parabolic", "gaussian", "binomial", "qgaussian"]:
@@ -312,11 +384,35 @@ def generate_longitudinal_coordinates(
 
         voltage = np.sum(rf_voltage)
 
-        harmonic_number = np.round(rf_harmonic).astype(int)[0]
-        if not np.allclose(harmonic_number, rf_harmonic, atol=5.e-1, rtol=0.):
-            raise Exception(f"Multiple harmonics detected in lattice: {rf_harmonic}")
-
-        matcher = SingleRFHarmonicMatcher(q0=q0,
+        rf_harmonic = np.atleast_1d(rf_harmonic)
+        rf_voltage = np.broadcast_to(rf_voltage, rf_harmonic.shape)
+        active = rf_voltage != 0
+        harmonic_number = np.round(rf_harmonic[active]).astype(int)[0]
+        if not np.allclose(harmonic_number, rf_harmonic[active],
+                           atol=5.e-1, rtol=0.):
+            # Several RF harmonics: action-angle variables computed
+            # numerically
+            if energy_ref_increment:
+                raise NotImplementedError(
+                    'Reference energy increment not supported for multiple '
+                    'RF harmonics')
+            beta0_ref = particle_ref._xobject.beta0[0]
+            with profiling.stage('matching'):
+                matcher = MultiHarmonicMatcher(q0=q0,
+                        voltage_list=rf_voltage[active],
+                        freq_list=(rf_harmonic[active] * beta0_ref * clight
+                                   / circumference),
+                        phase_list=np.broadcast_to(
+                                    rf_phase, rf_harmonic.shape)[active],
+                        length=circumference,
+                        p0c=particle_ref._xobject.p0c[0],
+                        slip_factor=eta,
+                        beta0=beta0_ref,
+                        rms_bunch_length=sigma_tau,
+                        distribution=distribution, m=m, q=q)
+        else:
+            with profiling.stage('matching'):
+                matcher = SingleRFHarmonicMatcher(q0=q0,
                                           voltage=voltage,
                                           length=circumference,
                                           freq=dct['freq_list'][0],
@@ -326,16 +422,13 @@ def generate_longitudinal_coordinates(
                                           rms_bunch_length=sigma_tau,
                                           distribution=distribution, m=m, q=q)
 
-        tau, ptau = matcher.sample_tau_ptau(n_particles=num_particles)
-
-        # convert (tau, ptau) to (zeta, delta)
-        z_particles = np.array(particle_ref._xobject.beta0[0]) * np.array(tau)  # zeta
-        temp_particles = Particles(p0c=particle_ref._xobject.p0c[0],
-                                   zeta=z_particles, ptau=ptau)
-        delta_particles = np.array(temp_particles.delta)
+        z_particles, delta_particles = _sample_from_matcher(
+            matcher, num_particles, particle_ref, sampling=sampling, rng=rng)
     else:
         raise NotImplementedError # TODO better message
 
+    profiling.record_arrays(z_particles, delta_particles)
+
     if return_matcher:
         return z_particles, delta_particles, matcher
     else:
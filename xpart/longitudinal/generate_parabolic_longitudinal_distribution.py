@@ -9,7 +9,8 @@ def generate_parabolic_longitudinal_coordinates(num_particles=None,
 												particle_ref=None, 
 												tracker=None,
 												line=None,
-												return_matcher=False
+												return_matcher=False,
+												sampling='pseudo'
 												):
 
 	"""
@@ -31,6 +32,8 @@ def generate_parabolic_longitudinal_coordinates(num_particles=None,
 	line: xt.line
 	return_matcher : bool
 		whether to also return xp.SingleRFHarmonicMatcher object
+	sampling : str
+		sampling mode, 'pseudo', 'sobol' or 'halton'
 
 	Returns:
 	-------- 
@@ -77,7 +80,8 @@ def generate_parabolic_longitudinal_coordinates(num_particles=None,
 	zeta, delta, matcher = generate_longitudinal_coordinates(line=line, distribution='parabolic', 
 							num_particles=num_particles, 
 							engine='single-rf-harmonic', sigma_z=sigma_z,
-							particle_ref=particle_ref, return_matcher=True)
+							particle_ref=particle_ref, return_matcher=True,
+							sampling=sampling)
 	
 	if return_matcher:
 		return zeta, delta, matcher
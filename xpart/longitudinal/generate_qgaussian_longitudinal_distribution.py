@@ -10,7 +10,8 @@ def generate_qgaussian_longitudinal_coordinates(num_particles=None,
 											   tracker=None,
 											   line=None,
 											   return_matcher=False,
-											   q=1.0
+											   q=1.0,
+											   sampling='pseudo'
 											   ):
 
 	"""
@@ -34,6 +35,8 @@ def generate_qgaussian_longitudinal_coordinates(num_particles=None,
 		whether to also return xp.SingleRFHarmonicMatcher object
 	q : float
 		q-Gaussia parameter, determines fatness of tails. q<1 means light tails, q=1 is Gaussian, q>1 means fat tails
+	sampling : str
+		sampling mode, 'pseudo', 'sobol' or 'halton'
 
 	Returns:
 	-------- 
@@ -80,7 +83,8 @@ def generate_qgaussian_longitudinal_coordinates(num_particles=None,
 	zeta, delta, matcher = generate_longitudinal_coordinates(line=line, distribution='qgaussian', 
 							num_particles=num_particles, 
 							engine='single-rf-harmonic', sigma_z=sigma_z,
-							particle_ref=particle_ref, return_matcher=True, q=q)
+							particle_ref=particle_ref, return_matcher=True, q=q,
+							sampling=sampling)
 	
 	if return_matcher:
 		return zeta, delta, matcher
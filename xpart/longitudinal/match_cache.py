@@ -0,0 +1,211 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+'''
+Opt-in persistent cache of matched longitudinal distributions.
+
+The results of the longitudinal matching (H0 and bucket geometry for the
+RFBucketMatcher, action distribution tables for the SingleRFHarmonicMatcher)
+are stored on disk, keyed on a hash of all the parameters they depend on, so
+that other jobs with the same machine configuration go straight to sampling.
+
+The cache is disabled by default. It is enabled by `enable_match_cache()` or
+by setting the environment variable `XPART_MATCH_CACHE_DIR`.
+'''
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# Version 2: RFBucketMatcher entries include H0_parameter
+_CACHE_FORMAT_VERSION = 2
+_ENV_VAR = 'XPART_MATCH_CACHE_DIR'
+DEFAULT_MAX_SIZE = 256 * 1024**2  # bytes
+
+
+def _canonical(obj):
+    # Exact and platform independent representation of the parameters
+    if isinstance(obj, dict):
+        return {str(kk): _canonical(vv) for kk, vv in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(vv) for vv in obj]
+    if isinstance(obj, np.ndarray):
+        return {'shape': list(obj.shape),
+                'values': [_canonical(vv) for vv in obj.ravel().tolist()]}
+    if obj is None or isinstance(obj, (bool, np.bool_, str)):
+        return obj if not isinstance(obj, np.bool_) else bool(obj)
+    if isinstance(obj, (int, np.integer)):
+        return int(obj)
+    if isinstance(obj, (float, np.floating)):
+        return float(obj).hex()
+    raise TypeError(f'Cannot use object of type {type(obj)} in a cache key')
+
+
+def compute_key(params):
+    '''
+    Return the content hash identifying a set of matching parameters.
+
+    Parameters
+    ----------
+    params : dict
+        Parameters (numbers, strings, arrays and nested lists/dicts of them)
+        determining the result of the matching.
+
+    Returns
+    -------
+    key : str
+        Hexadecimal SHA-256 digest.
+    '''
+    text = json.dumps({'version': _CACHE_FORMAT_VERSION,
+                       'params': _canonical(params)},
+                      sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class MatchCache:
+
+    '''
+    Content-addressed on-disk store of matching results.
+
+    Entries are `.npz` files named after the hash of the parameters. Writes
+    are atomic (temporary file + rename), so that concurrent jobs sharing
+    the cache directory never read partial entries. When the total size
+    exceeds `max_size`, the least recently used entries are removed.
+
+    Parameters
+    ----------
+    directory : str or Path
+        Cache directory (created if needed).
+    max_size : int
+        Maximum total size of the cache in bytes.
+    '''
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+
+    def _path(self, key):
+        return self.directory / f'{key}.npz'
+
+    def get(self, params):
+        '''
+        Return the data stored for `params` as a dictionary of arrays, or
+        None if not present.
+        '''
+        path = self._path(compute_key(params))
+        try:
+            with np.load(path, allow_pickle=False) as fid:
+                data = {kk: fid[kk] for kk in fid.files}
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Corrupted entry (e.g. truncated by a full disk)
+            self._remove(path)
+            return None
+
+        try:
+            os.utime(path) # mark as recently used
+        except OSError:
+            pass
+        return data
+
+    def put(self, params, data):
+        '''
+        Store the dictionary of arrays `data` for `params`.
+        '''
+        path = self._path(compute_key(params))
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fid:
+                np.savez(fid, **data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        '''
+        Remove the least recently used entries until the total size of the
+        cache is below `max_size`.
+        '''
+        entries = []
+        for pp in self.directory.glob('*.npz'):
+            try:
+                st = pp.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, pp))
+
+        total_size = sum(ee[1] for ee in entries)
+        for _, size, pp in sorted(entries, key=lambda ee: ee[0]):
+            if total_size <= self.max_size:
+                break
+            self._remove(pp)
+            total_size -= size
+
+    def clear(self):
+        '''
+        Remove all the entries.
+        '''
+        for pp in self.directory.glob('*.npz'):
+            self._remove(pp)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+_match_cache = None
+
+
+def enable_match_cache(directory=None, max_size=DEFAULT_MAX_SIZE):
+    '''
+    Enable the persistent cache of matched longitudinal distributions.
+
+    Parameters
+    ----------
+    directory : str or Path, optional
+        Cache directory. Defaults to the content of the environment variable
+        `XPART_MATCH_CACHE_DIR` or to `~/.cache/xpart/match`.
+    max_size : int
+        Maximum total size of the cache in bytes.
+
+    Returns
+    -------
+    cache : MatchCache
+        The enabled cache.
+    '''
+    global _match_cache
+    if directory is None:
+        directory = os.environ.get(_ENV_VAR,
+                                   Path.home() / '.cache' / 'xpart' / 'match')
+    _match_cache = MatchCache(directory, max_size=max_size)
+    return _match_cache
+
+
+def disable_match_cache():
+    '''
+    Disable the persistent cache of matched longitudinal distributions.
+    '''
+    global _match_cache
+    _match_cache = False
+
+
+def get_match_cache():
+    '''
+    Return the enabled MatchCache, or None if the cache is disabled.
+    '''
+    if _match_cache is None and os.environ.get(_ENV_VAR):
+        enable_match_cache()
+    return _match_cache or None
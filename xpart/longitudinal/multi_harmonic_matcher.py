@@ -0,0 +1,369 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+import numpy as np
+from scipy.constants import c
+from scipy.optimize import minimize_scalar
+
+from ..general import _print, progress
+from ..sampling import _check_sampling
+from .single_rf_harmonic_matcher import SingleRFHarmonicMatcher
+
+
+class MultiHarmonicMatcher(SingleRFHarmonicMatcher):
+
+    '''
+    Generalization of the SingleRFHarmonicMatcher to an arbitrary sum of RF
+    harmonics (e.g. double RF systems) in a stationary bucket.
+
+    The Hamiltonian is written as H = C ptau^2 + W(tau) with
+    W(tau) = sign(eta) sum_k A_k cos(phi_k - B_k tau), and the normalized
+    Hamiltonian m = (H - W_sfp) / (H_sep - W_sfp) takes values between 0 (at
+    the stable fixed point) and 1 (at the separatrix), as for the single
+    harmonic case. The angle variable (time along the orbit) is computed by
+    numerical integration over a grid of levels of m, which is tabulated once
+    and then used to map the sampled (m, angle) pairs to (tau, ptau). The
+    distribution of m is obtained from the target line density using the
+    exact projection of each orbit onto the tau axis.
+
+    Parameters
+    ----------
+    q0 : float
+        Charge of the particles in units of the elementary charge.
+    voltage_list : array_like
+        RF voltages in V.
+    freq_list : array_like
+        RF frequencies in Hz.
+    phase_list : array_like, optional
+        RF phases in rad (same convention as `generate_longitudinal_coordinates`).
+        Defaults to pi above transition and 0 below transition.
+    length : float
+        Machine circumference in m.
+    p0c : float
+        Reference momentum in eV.
+    slip_factor : float
+        Slip factor.
+    beta0 : float
+        Relativistic beta of the reference particle.
+    rms_bunch_length : float
+        Target RMS bunch length in tau (m).
+    distribution : str
+        Line density profile: 'parabolic', 'gaussian', 'qgaussian' or
+        'binomial'.
+    n_points_in_distribution : int
+        Number of points of the tabulated line density.
+    n_levels : int
+        Number of levels of m in the table of the angle variable.
+    n_angles : int
+        Number of angles in the table of the angle variable.
+    n_phi : int
+        Number of integration steps along each orbit.
+    m : float
+        Binomial parameter if distribution is 'binomial'.
+    q : float
+        q-Gaussian parameter if distribution is 'qgaussian'.
+    '''
+
+    def __init__(self,
+                 q0=None,
+                 voltage_list=None,
+                 freq_list=None,
+                 phase_list=None,
+                 length=None,
+                 p0c=None,
+                 slip_factor=None,
+                 beta0=None,
+                 rms_bunch_length=None, distribution="parabolic",
+                 n_points_in_distribution=300, n_levels=256, n_angles=256,
+                 n_phi=512, verbose=0, m=4.7, q=1.0):
+
+        self.voltage_list = np.atleast_1d(np.asarray(voltage_list, dtype=float))
+        self.freq_list = np.atleast_1d(np.asarray(freq_list, dtype=float))
+        if phase_list is None:
+            phase_list = np.pi if slip_factor > 0 else 0.
+        self.phase_list = np.broadcast_to(
+            np.asarray(phase_list, dtype=float), self.voltage_list.shape)
+        assert len(self.voltage_list) == len(self.freq_list)
+
+        self.n_levels = n_levels
+        self.n_angles = n_angles
+        self.n_phi = n_phi
+
+        # Potential: W(tau) = sign(eta) sum_k A_k cos(phi_k - B_k tau)
+        self.A_list = q0*self.voltage_list/(
+                                2.*np.pi*self.freq_list*p0c/c*length)
+        self.B_list = 2*np.pi*self.freq_list/c
+        self.eta_sign = np.sign(slip_factor)
+        self.C = abs(slip_factor)/(2.*beta0*beta0)
+
+        self._find_bucket()
+
+        tau_lim = 0.99*self.get_unstable_fixed_point()
+        m_max = max(self._m_of_u(-tau_lim), self._m_of_u(tau_lim))
+        self._build_angle_table(m_max)
+
+        i_fund = np.argmin(self.freq_list)
+        super().__init__(q0=q0, voltage=self.voltage_list[i_fund],
+                         length=length, freq=self.freq_list[i_fund], p0c=p0c,
+                         slip_factor=slip_factor, beta0=beta0,
+                         rms_bunch_length=rms_bunch_length,
+                         distribution=distribution,
+                         transformation_particles=None,
+                         n_points_in_distribution=n_points_in_distribution,
+                         verbose=verbose, m=m, q=q)
+
+    def _potential(self, tau):
+        tau = np.asarray(tau, dtype=float)
+        ww = np.zeros_like(tau)
+        for AA, BB, phi in zip(self.A_list, self.B_list, self.phase_list):
+            ww += AA*np.cos(phi - BB*tau)
+        return self.eta_sign*ww
+
+    def _potential_derivative(self, tau):
+        tau = np.asarray(tau, dtype=float)
+        dw = np.zeros_like(tau)
+        for AA, BB, phi in zip(self.A_list, self.B_list, self.phase_list):
+            dw += AA*BB*np.sin(phi - BB*tau)
+        return self.eta_sign*dw
+
+    def _find_bucket(self, n_grid=20001):
+        period = c/np.min(self.freq_list)
+
+        # Stable fixed point: minimum of the potential closest to tau = 0
+        tt = np.linspace(-period/2., period/2., n_grid)
+        ii = np.argmin(self._potential(tt))
+        dt = tt[1] - tt[0]
+        self.tau_sfp = minimize_scalar(
+            lambda tau: self._potential(tau),
+            bounds=(tt[ii] - dt, tt[ii] + dt), method='bounded',
+            options={'xatol': 1e-12*period}).x
+        self.W_min = self._potential(self.tau_sfp)
+
+        # Unstable fixed points: first maxima on each side
+        uu_ufp = []
+        for side in [1, -1]:
+            uu = side*np.linspace(0, period, n_grid)
+            ww = self._potential(self.tau_sfp + uu)
+            decreasing = np.where(np.diff(ww) < 0)[0]
+            if len(decreasing) == 0:
+                raise ValueError('No RF bucket found.')
+            kk = decreasing[0]
+            if ww[kk] < np.max(ww) - 1e-6*(np.max(ww) - self.W_min):
+                raise NotImplementedError(
+                    'RF potentials with several minima inside the bucket '
+                    'are not supported.')
+            du = uu[1] - uu[0]
+            u_ufp = minimize_scalar(
+                lambda u: -self._potential(self.tau_sfp + u),
+                bounds=sorted([uu[kk] - du, uu[kk] + du]), method='bounded',
+                options={'xatol': 1e-12*period}).x
+            uu_ufp.append(u_ufp)
+        self.u_ufp_right, self.u_ufp_left = uu_ufp
+
+        W_ufp = self._potential(self.tau_sfp + np.array(uu_ufp))
+        self.H_sep = np.min(W_ufp)
+        self.delta_W = self.H_sep - self.W_min
+
+        # Branches of the potential between the stable fixed point and the
+        # unstable fixed points, for the inversion tau(W). sqrt(W - W_min)
+        # is used as interpolation variable, which is linear in tau close
+        # to the stable fixed point.
+        self._branches = []
+        for u_ufp in [self.u_ufp_left, self.u_ufp_right]:
+            uu = np.linspace(0, u_ufp, n_grid)
+            ww = self._potential(self.tau_sfp + uu) - self.W_min
+            ww = np.maximum.accumulate(np.clip(ww, 0, None))
+            self._branches.append((np.sqrt(ww), uu))
+
+        u_left, u_right = self._turning_points(np.array([1.]))
+        self.u_sep_left = u_left[0]
+        self.u_sep_right = u_right[0]
+
+    def _m_of_u(self, u):
+        return (self._potential(self.tau_sfp + u) - self.W_min)/self.delta_W
+
+    def _turning_points(self, m, n_newton=3):
+        # Positions (relative to the stable fixed point) where the orbit of
+        # level m crosses ptau = 0
+        m = np.asarray(m, dtype=float)
+        ww = m*self.delta_W
+        out = []
+        for sqrt_w, uu in self._branches:
+            u = np.interp(np.sqrt(ww), sqrt_w, uu)
+            for _ in range(n_newton):
+                dw = self._potential_derivative(self.tau_sfp + u)
+                res = self._potential(self.tau_sfp + u) - self.W_min - ww
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    step = np.where(dw != 0, res/dw, 0.)
+                u = np.clip(u - step, min(uu[0], uu[-1]), max(uu[0], uu[-1]))
+            out.append(u)
+        return out[0], out[1]
+
+    def _orbit_time_fraction(self, m):
+        # For each level m, fraction of half period spent between the left
+        # turning point and the position u(phi) = a + (b - a)(1 - cos(phi))/2,
+        # at phi = 0, pi/n_phi, ..., pi. The substitution removes the
+        # singularity of dt = dtau/ptau at the turning points.
+        m = np.atleast_1d(m)
+        aa, bb = self._turning_points(m)
+        phi_edges = np.linspace(0, np.pi, self.n_phi + 1)
+        phi = 0.5*(phi_edges[1:] + phi_edges[:-1])
+        uu = aa[:, None] + (bb - aa)[:, None]*(1 - np.cos(phi))[None, :]/2.
+        kinetic = (m[:, None]*self.delta_W
+                   - (self._potential(self.tau_sfp + uu) - self.W_min))
+        degenerate = (bb - aa) <= 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dt = np.sin(phi)[None, :]/np.sqrt(np.clip(kinetic, 0, None))
+        dt[~np.isfinite(dt)] = 0.
+        dt[degenerate, :] = 1. # harmonic limit
+        frac = np.zeros((len(m), self.n_phi + 1))
+        frac[:, 1:] = np.cumsum(dt, axis=1)
+        frac /= frac[:, -1:]
+        return aa, bb, phi_edges, frac
+
+    def _build_angle_table(self, m_max):
+        # phi as a function of (m, fraction of half period) on a regular grid
+        self._m_table_max = m_max
+        m_table = np.linspace(0, m_max, self.n_levels)
+        _, _, phi_edges, frac = self._orbit_time_fraction(m_table)
+        ss = np.linspace(0, 1, self.n_angles)
+        self._phi_table = np.array(
+                    [np.interp(ss, ff, phi_edges) for ff in frac])
+
+    def _interpolate_phi(self, m, ss):
+        xx = np.clip(m/self._m_table_max, 0, 1)*(self.n_levels - 1)
+        jj = np.minimum(xx.astype(int), self.n_levels - 2)
+        ww = xx - jj
+        yy = np.clip(ss, 0, 1)*(self.n_angles - 1)
+        ii = np.minimum(yy.astype(int), self.n_angles - 2)
+        vv = yy - ii
+        tab = self._phi_table
+        return ((1 - ww)*((1 - vv)*tab[jj, ii] + vv*tab[jj, ii + 1])
+                + ww*((1 - vv)*tab[jj + 1, ii] + vv*tab[jj + 1, ii + 1]))
+
+    def _cache_parameters(self):
+        return dict(matcher='MultiHarmonicMatcher',
+                    A_list=self.A_list, B_list=self.B_list,
+                    phase_list=self.phase_list, eta_sign=self.eta_sign,
+                    C=self.C, n_phi=self.n_phi,
+                    tau_distr_x=self.tau_distr_x,
+                    tau_distr_y=self.tau_distr_y)
+
+    def transform_tau_distr_to_m_distr(self):
+        # Same peeling as in SingleRFHarmonicMatcher, with the projection of
+        # each orbit computed from the time spent in each bin instead of a
+        # histogram of sampled particles. tau_distr_x is measured from the
+        # stable fixed point.
+        xp = self.tau_distr_x.copy()
+        yp = self.tau_distr_y.copy()
+        N = int(len(xp)/2.)
+        dx = xp[1] - xp[0]
+        edges = np.linspace(min(xp) - dx/2., max(xp) + dx/2., len(xp) + 1)
+
+        jj_list = np.arange(len(xp) - 1, len(xp) - N - 1, -1)
+        m_list = self._m_of_u(xp[jj_list])
+        valid = m_list < 1.
+        aa, bb, phi_edges, frac = self._orbit_time_fraction(
+                                                        m_list[valid])
+        orbits = dict(zip(jj_list[valid], zip(aa, bb, frac)))
+
+        m_distr_x = []
+        m_distr_y = []
+        for ii, jj in enumerate(jj_list):
+            dens = yp[jj]
+            if dens == 0. or jj not in orbits:
+                continue
+            if self.verbose:
+                _print(f"tau = {xp[jj]:.3f}, f(tau) = {dens:.3f}")
+
+            m0 = self._m_of_u(xp[jj] - dx/2.)
+            m1 = self._m_of_u(xp[jj] + dx/2.)
+            dm = m1 - m0
+            progress('MultiHarmonicMatcher: Transforming distribution', ii/N)
+
+            a, b, ff = orbits[jj]
+            if b - a <= 0:
+                continue
+            xx = np.clip(edges, a, b)
+            phi = np.arccos(np.clip(1 - 2*(xx - a)/(b - a), -1, 1))
+            hist = np.diff(np.interp(phi, phi_edges, ff))
+
+            factor = dens/hist[jj]
+            yp -= hist*factor
+            m_distr_x.append(m_list[ii])
+            m_distr_y.append(np.sum(hist)*factor/dm)
+
+        m_distr_x.append(0)
+        m_distr_y.append(0)
+        m_distr_x = m_distr_x[::-1]
+        m_distr_y = m_distr_y[::-1]
+
+        progress('MultiHarmonicMatcher: Transforming distribution', 1.)
+        _print('MultiHarmonicMatcher: Done transforming distribution.')
+        return m_distr_x, m_distr_y
+
+    def get_separatrix(self):
+        xx = self.tau_sfp + np.linspace(self.u_sep_left, self.u_sep_right,
+                                        1000)
+        yy = np.sqrt(np.clip(self.H_sep - self._potential(xx), 0, None)
+                     / self.C)
+        return xx, yy
+
+    def get_unstable_fixed_point(self):
+        '''
+        Distance between the stable fixed point and the closest boundary of
+        the bucket (the unstable fixed point for a symmetric potential).
+        '''
+        return min(-self.u_sep_left, self.u_sep_right)
+
+    def get_m(self, tau=0, ptau=0):
+        return (self.C*np.asarray(ptau)**2 + self._potential(tau)
+                - self.W_min)/self.delta_W
+
+    def get_airbag_from_m(self, m, n_particles=20000, theta=None):
+        if n_particles is None:
+            n_particles = len(m)
+        m = np.broadcast_to(np.asarray(m, dtype=float), (n_particles,))
+        if theta is None:
+            theta = np.random.uniform(size=n_particles)*2.*np.pi
+        theta = np.mod(theta, 2.*np.pi)
+
+        # First half period from the left to the right turning point (ptau
+        # > 0), second half period back (ptau < 0)
+        upper = theta < np.pi
+        ss = np.where(upper, theta, theta - np.pi)/np.pi
+        aa, bb = self._turning_points(m)
+        shift = (bb - aa)*(1 - np.cos(self._interpolate_phi(m, ss)))/2.
+        uu = np.where(upper, aa + shift, bb - shift)
+
+        tau = self.tau_sfp + uu
+        kinetic = m*self.delta_W - (self._potential(tau) - self.W_min)
+        ptau = np.sqrt(np.clip(kinetic, 0, None)/self.C)
+        ptau[~upper] *= -1
+
+        return tau, ptau
+
+    def sample_tau_ptau(self, n_particles=20000, sampling='pseudo', rng=None):
+        _check_sampling(sampling)
+        return self._sample_tau_ptau_inverse_cdf(n_particles,
+                                                 sampling=sampling, rng=rng)
+
+    def _m_cdf(self, n_points_cdf):
+        # The CDF is built on the nodes of the distribution of m, which
+        # accumulate close to m = 1 when the potential is flat at the
+        # unstable fixed points (e.g. double RF in bunch shortening mode)
+        m_grid = np.array(self.m_distr_x, dtype=float)
+        pdf = np.array(self.m_distr_y, dtype=float)
+        cdf = np.concatenate([[0], np.cumsum(
+                        0.5 * (pdf[1:] + pdf[:-1]) * np.diff(m_grid))])
+        cdf /= cdf[-1]
+        return m_grid, cdf
+
+    def get_synchrotron_tune(self):
+        d2w = 0.
+        for AA, BB, phi in zip(self.A_list, self.B_list, self.phase_list):
+            d2w -= AA*BB**2*np.cos(phi - BB*self.tau_sfp)
+        d2w *= self.eta_sign
+        return np.sqrt(2*self.C*max(d2w, 0.))*self.length/(2*np.pi)
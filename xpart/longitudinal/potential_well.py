@@ -0,0 +1,269 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+'''
+Self-consistent matching in the potential well distorted by the
+longitudinal wake field of the bunch (solution of the Haissinski equation).
+
+The induced voltage is computed on a uniform grid by FFT convolution of the
+line density with the wake function (or by multiplication of its spectrum
+with the impedance), so that each iteration costs O(n_grid log n_grid) on
+top of the matching of the distribution in the updated bucket.
+
+Conventions: z > 0 is the head of the bunch, the wake function W(tau) acts
+at a delay tau > 0 behind the source and the impedance is
+Z(f) = integral of W(tau) exp(-2 pi i f tau) dtau (e.g. Z = 2 pi i f L for
+an inductance L).
+'''
+
+import logging
+
+import numpy as np
+from scipy.constants import c
+from scipy.fft import next_fast_len, rfft, irfft
+
+try:
+    from numpy import trapezoid
+except ImportError:
+    from numpy import trapz as trapezoid  # numpy<2.0
+
+from ..general import _print, progress
+
+logger = logging.getLogger(__name__)
+
+
+def induced_voltage(z, line_density, intensity, charge_coulomb, beta,
+                    wake_function=None, impedance=None):
+    '''
+    Voltage induced by a bunch through its longitudinal wake field,
+    computed by FFT convolution.
+
+    Parameters
+    ----------
+    z : np.ndarray
+        Uniform grid of longitudinal positions (in m, increasing).
+    line_density : np.ndarray
+        Line density on the grid (in 1/m, normalized to 1).
+    intensity : float
+        Number of particles in the bunch.
+    charge_coulomb : float
+        Charge of the particles (in C).
+    beta : float
+        Relativistic beta of the bunch.
+    wake_function : callable, optional
+        Longitudinal wake function W(tau) (in V/C), with tau the delay
+        behind the source (in s).
+    impedance : callable, optional
+        Longitudinal impedance Z(f) (in Ohm), with f >= 0 the frequency
+        (in Hz). Exactly one of `wake_function` and `impedance` must be
+        given.
+
+    Returns
+    -------
+    voltage : np.ndarray
+        Induced voltage on the grid (in V), i.e. energy kick per turn
+        divided by the charge of the particles.
+    '''
+    if (wake_function is None) == (impedance is None):
+        raise ValueError(
+            'Exactly one of `wake_function` and `impedance` must be given.')
+
+    z = np.asarray(z, dtype=np.float64)
+    n_grid = len(z)
+    dz = (z[-1] - z[0]) / (n_grid - 1)
+
+    # Grid in s = -z (head first), zero padded for a linear convolution
+    n_pad = next_fast_len(2 * n_grid)
+    spectrum = rfft(np.asarray(line_density, dtype=np.float64)[::-1],
+                    n=n_pad)
+
+    if wake_function is not None:
+        # Wake at the delays k * dz / (beta c) for k in [-(n - 1), n - 1],
+        # stored in wrap-around order
+        kk = np.arange(n_grid)
+        wake = np.zeros(n_pad)
+        wake[:n_grid] = wake_function(kk * dz / (beta * c))
+        wake[n_pad - n_grid + 1:] = wake_function(
+            -kk[:0:-1] * dz / (beta * c))
+        convolution = dz * irfft(spectrum * rfft(wake), n=n_pad)
+    else:
+        frequencies = np.arange(len(spectrum)) * beta * c / (n_pad * dz)
+        convolution = beta * c * irfft(
+            spectrum * np.asarray(impedance(frequencies), dtype=complex),
+            n=n_pad)
+
+    return -charge_coulomb * intensity * convolution[:n_grid][::-1]
+
+
+class _GridField:
+
+    # Force and potential energy of the induced voltage, interpolated on
+    # the grid (added once to the RFBucket and updated in place)
+
+    def __init__(self, rfbucket, z):
+        self.rfbucket = rfbucket
+        self.z = z
+        self.voltage = np.zeros_like(z)
+        self._force = np.zeros_like(z)
+        self._potential = np.zeros_like(z)
+        self.potential_offset = 0.
+
+    def set_voltage(self, voltage):
+        rfbucket = self.rfbucket
+        self.voltage = voltage
+        self._force = rfbucket.charge_coulomb * voltage / rfbucket.circumference
+        # Potential energy: -integral of the force
+        self._potential = np.zeros_like(self.z)
+        self._potential[1:] = -np.cumsum(
+            0.5 * (self._force[1:] + self._force[:-1]) * np.diff(self.z))
+
+        # Recompute the bucket and calibrate the separatrix Hamiltonian to
+        # zero (as done for the RF potential)
+        self.potential_offset = 0.
+        rfbucket.add_fields([], [])
+        self.potential_offset = float(np.interp(rfbucket.z_ufp_separatrix,
+                                                self.z, self._potential))
+        rfbucket.add_fields([], [])
+
+    def force(self, z):
+        return np.interp(z, self.z, self._force, left=0, right=0)
+
+    def potential(self, z):
+        return np.interp(z, self.z, self._potential) - self.potential_offset
+
+
+class PotentialWell:
+
+    '''
+    Potential-well distortion of the RF bucket of an RFBucketMatcher by the
+    longitudinal wake field of the bunch, solved self-consistently
+    (Haissinski equation) by fixed point iteration:
+    line density -> induced voltage -> distorted bucket -> matched
+    distribution -> line density.
+
+    Normally set up through `RFBucketMatcher.set_potential_well`.
+
+    Parameters
+    ----------
+    intensity : float
+        Number of particles in the bunch.
+    wake_function : callable, optional
+        Longitudinal wake function W(tau) (in V/C), tau in s.
+    impedance : callable, optional
+        Longitudinal impedance Z(f) (in Ohm), f in Hz.
+    n_grid : int
+        Number of points of the grid covering the RF bucket.
+    max_iterations : int
+        Maximum number of iterations.
+    tol : float
+        Convergence threshold on the maximum change of the line density
+        between two iterations (relative to its peak value).
+    relaxation : float
+        Fraction of the new induced voltage mixed into the bucket at each
+        iteration (values below 1 damp the iteration at high intensity).
+    '''
+
+    def __init__(self, intensity, wake_function=None, impedance=None,
+                 n_grid=2048, max_iterations=50, tol=1e-3, relaxation=1.):
+        if (wake_function is None) == (impedance is None):
+            raise ValueError(
+                'Exactly one of `wake_function` and `impedance` must be '
+                'given.')
+        assert 0 < relaxation <= 1
+        self.intensity = intensity
+        self.wake_function = wake_function
+        self.impedance = impedance
+        self.n_grid = n_grid
+        self.max_iterations = max_iterations
+        self.tol = tol
+        self.relaxation = relaxation
+
+        self.field = None
+        self.residuals = []
+        self.converged = False
+
+    @property
+    def z(self):
+        '''Grid of the line density and of the induced voltage.'''
+        return self.field.z
+
+    @property
+    def induced_voltage(self):
+        '''Induced voltage of the matched distribution on the grid.'''
+        return self.field.voltage
+
+    def attach(self, rfbucket):
+        '''Add the (initially vanishing) induced field to the RF bucket.'''
+        assert self.field is None, 'Already attached to an RF bucket'
+        z = np.linspace(*rfbucket.interval, self.n_grid)
+        self.field = _GridField(rfbucket, z)
+        rfbucket.add_fields([self.field.force], [self.field.potential])
+
+    def detach(self):
+        '''Remove the induced field from the RF bucket.'''
+        rfbucket = self.field.rfbucket
+        rfbucket._add_forces.remove(self.field.force)
+        rfbucket._add_potentials.remove(self.field.potential)
+        rfbucket.add_fields([], [])
+        self.field = None
+
+    def _line_density(self, matcher):
+        lam = matcher.profiles.linedensity(self.z)
+        return lam / trapezoid(lam, self.z)
+
+    def _update_bucket(self, matcher, voltage):
+        self.field.set_voltage(voltage)
+        matcher.psi_object.Hmax = matcher.rfbucket.h_sfp(make_convex=True)
+        matcher.profiles.clear_cache()
+
+    def solve(self, matcher):
+        '''
+        Match the distribution of the matcher (to its target bunch length
+        or emittance) in the self-consistently distorted bucket.
+        '''
+        rfbucket = matcher.rfbucket
+
+        # The diagnostics of the matching are not printed at each iteration
+        suppress = _print.suppress
+        _print.suppress = True
+        try:
+            self._update_bucket(matcher, np.zeros_like(self.z))
+            matcher.psi_for_variable(matcher.variable)
+            line_density = self._line_density(matcher)
+
+            self.residuals = []
+            self.converged = False
+            for ii in range(self.max_iterations):
+                voltage = induced_voltage(
+                    self.z, line_density, self.intensity,
+                    rfbucket.charge_coulomb, rfbucket.beta,
+                    wake_function=self.wake_function,
+                    impedance=self.impedance)
+                self._update_bucket(
+                    matcher, ((1 - self.relaxation) * self.field.voltage
+                              + self.relaxation * voltage))
+                matcher.psi_for_variable(matcher.variable)
+
+                new_line_density = self._line_density(matcher)
+                residual = (np.max(np.abs(new_line_density - line_density))
+                            / np.max(line_density))
+                self.residuals.append(residual)
+                line_density = new_line_density
+                progress('PotentialWell: Iterating',
+                         message=f'iteration {ii}, residual {residual:.2e}')
+                if residual < self.tol:
+                    self.converged = True
+                    break
+        finally:
+            _print.suppress = suppress
+
+        self.line_density = line_density
+        progress.done('PotentialWell: Iterating', message='done')
+        if self.converged:
+            _print(f'--> Potential well converged in {ii + 1} iterations.')
+        else:
+            logger.warning('PotentialWell: not converged after '
+                           f'{self.max_iterations} iterations (residual '
+                           f'{self.residuals[-1]:.2e}).')
@@ -0,0 +1,331 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+'''
+Fit of measured bunch profiles with the line densities generated by the
+SingleRFHarmonicMatcher (parabolic, gaussian, binomial and q-Gaussian).
+
+The line densities of the SingleRFHarmonicMatcher are the analytic shapes
+truncated at 99% of the bucket half length. For a given bucket and shape,
+the truncated line densities are tabulated once on a grid of widths and of
+shape parameters (m or q). The fit interpolates between these templates, so
+that no matcher is built during the fit. The best-fit parameters can be
+passed directly to `generate_longitudinal_coordinates`.
+'''
+
+import functools
+
+import numpy as np
+from scipy.optimize import least_squares
+
+try:
+    from numpy import trapezoid
+except ImportError:
+    from numpy import trapz as trapezoid  # numpy<2.0
+
+from ..general import _print
+
+# Same truncation as in SingleRFHarmonicMatcher
+_BUCKET_FRACTION = 0.99
+
+_DEFAULT_PARAMETER_RANGE = {
+    'binomial': (1., 15.),
+    'qgaussian': (0.2, 1.6),
+}
+
+# Each fitter holds its full template grids, only the most recent ones are
+# kept
+_TEMPLATES_CACHE_SIZE = 8
+
+
+def _main_rf_harmonic(line, particle_ref):
+    # Harmonic of the largest RF voltage, as in the generators
+    from .generate_longitudinal import _characterize_line
+    dct = _characterize_line(line, particle_ref)
+    assert len(dct['voltage_list']) > 0
+    return dct['h_list'][np.argmax(dct['voltage_list'])]
+
+
+@functools.lru_cache(maxsize=_TEMPLATES_CACHE_SIZE)
+def _cached_fitter(cls, distribution, circumference, rf_harmonic, kwargs):
+    return cls(distribution, circumference=circumference,
+               rf_harmonic=rf_harmonic, **dict(kwargs))
+
+
+def _get_fitter(cls, distribution, circumference, rf_harmonic, kwargs):
+    # Fitters are cached per bucket, distribution and options (sequences
+    # converted to tuples of floats to be hashable)
+    kwargs = tuple(sorted(
+        (kk, tuple(np.asarray(vv, dtype=np.float64).ravel().tolist())
+         if np.ndim(vv) > 0 else vv)
+        for kk, vv in kwargs.items()))
+    return _cached_fitter(cls, distribution, float(circumference),
+                          float(rf_harmonic), kwargs)
+
+
+def _shape(distribution, z, width, parameter):
+    # Line density (not normalized) of the SingleRFHarmonicMatcher shapes,
+    # with z of shape (n_points,) and width, parameter broadcastable
+    uu = z / width
+    if distribution == 'parabolic':
+        return np.clip(1 - uu**2, 0, None)
+    elif distribution == 'gaussian':
+        return np.exp(-uu**2 / 2)
+    elif distribution == 'binomial':
+        return np.clip(1 - uu**2, 0, None)**(parameter - 0.5)
+    elif distribution == 'qgaussian':
+        qq = parameter
+        # q-exponential of -uu**2 (see SingleRFHarmonicMatcher._eq)
+        one_minus_q = np.where(qq == 1, 1., 1 - qq)
+        base = np.clip(1 - one_minus_q * uu**2, 0, None)
+        with np.errstate(divide='ignore'):
+            return np.where(qq == 1, np.exp(-uu**2),
+                            base**(1 / one_minus_q))
+    raise NotImplementedError(f'Distribution `{distribution}` not supported')
+
+
+class LongitudinalProfileFitter:
+
+    '''
+    Least-squares fit of measured line densities with the shapes of the
+    SingleRFHarmonicMatcher, based on templates tabulated once per bucket.
+
+    Parameters
+    ----------
+    distribution : str
+        Shape of the line density. Can be 'parabolic', 'gaussian',
+        'binomial' (parameter m) or 'qgaussian' (parameter q).
+    circumference : float
+        Length of the ring (in m).
+    rf_harmonic : float
+        Harmonic number of the RF system.
+    parameter_range : tuple, optional
+        Range of the shape parameter (m or q) covered by the templates.
+    n_parameters : int
+        Number of values of the shape parameter in the templates.
+    n_widths : int
+        Number of widths in the templates.
+    n_points : int
+        Number of points of the tabulated line densities.
+    '''
+
+    def __init__(self, distribution, circumference, rf_harmonic,
+                 parameter_range=None, n_parameters=40, n_widths=100,
+                 n_points=501):
+
+        if distribution not in ['parabolic', 'gaussian', 'binomial',
+                                'qgaussian']:
+            raise NotImplementedError(
+                f'Distribution `{distribution}` not supported')
+
+        self.distribution = distribution
+        self.z_lim = _BUCKET_FRACTION * circumference / (2 * rf_harmonic)
+
+        if distribution in _DEFAULT_PARAMETER_RANGE:
+            if parameter_range is None:
+                parameter_range = _DEFAULT_PARAMETER_RANGE[distribution]
+            self.parameters = np.linspace(*parameter_range, n_parameters)
+        else:
+            self.parameters = np.array([0.])
+        self.log_widths = np.linspace(np.log(self.z_lim / 100),
+                                      np.log(3 * self.z_lim), n_widths)
+        self.z_grid = np.linspace(-self.z_lim, self.z_lim, n_points)
+
+        # Templates normalized to unit area, shape
+        # (n_parameters, n_widths, n_points)
+        templates = _shape(distribution, self.z_grid,
+                           np.exp(self.log_widths)[None, :, None],
+                           self.parameters[:, None, None])
+        templates = templates / trapezoid(templates, self.z_grid,
+                                          axis=-1)[..., None]
+        self.templates = templates
+
+        # RMS bunch length of the truncated line densities, i.e. the
+        # sigma_z to be passed to the generators
+        self.sigma_z = np.sqrt(trapezoid(templates * self.z_grid**2,
+                                         self.z_grid, axis=-1))
+
+    @classmethod
+    def from_line(cls, line, distribution, particle_ref=None, **kwargs):
+        '''
+        Build the fitter for the RF bucket of a line (harmonic of the
+        largest RF voltage, as in the generators). The fitter is shared
+        with `fit_longitudinal_profile` for the same bucket and options.
+        '''
+        if particle_ref is None:
+            particle_ref = line.particle_ref
+        return _get_fitter(cls, distribution, line.get_length(),
+                           _main_rf_harmonic(line, particle_ref), kwargs)
+
+    @staticmethod
+    def _weights(grid, value):
+        # Indices and weight for the linear interpolation in grid
+        if len(grid) == 1:
+            return 0, 0, 0.
+        ii = int(np.clip(np.searchsorted(grid, value) - 1, 0, len(grid) - 2))
+        ff = float(np.clip((value - grid[ii]) / (grid[ii + 1] - grid[ii]),
+                           0, 1))
+        return ii, ii + 1, ff
+
+    def _interpolate(self, table, parameter, log_width=None):
+        # Linear interpolation in the parameter and, if log_width is given,
+        # in the log of the width
+        i0, i1, fi = self._weights(self.parameters, parameter)
+        row = (1 - fi) * table[i0] + fi * table[i1]
+        if log_width is None:
+            return row
+        j0, j1, fj = self._weights(self.log_widths, log_width)
+        return (1 - fj) * row[j0] + fj * row[j1]
+
+    def line_density(self, z, amplitude, z0, sigma_z=None, parameter=None,
+                     log_width=None):
+        '''
+        Interpolated template line density at the positions z.
+
+        Parameters
+        ----------
+        z : array_like
+            Longitudinal positions (in m).
+        amplitude : float
+            Area of the line density.
+        z0 : float
+            Center of the bunch (in m).
+        sigma_z : float, optional
+            RMS bunch length (in m). Alternatively, the logarithm of the
+            width of the shape can be given with `log_width`.
+        parameter : float, optional
+            Shape parameter (m or q).
+
+        Returns
+        -------
+        line_density : np.ndarray
+            Line density at z.
+        '''
+        if parameter is None:
+            parameter = self.parameters[0]
+        if log_width is None:
+            log_width = np.interp(sigma_z,
+                                  self._interpolate(self.sigma_z, parameter),
+                                  self.log_widths)
+        profile = self._interpolate(self.templates, parameter, log_width)
+        return amplitude * np.interp(np.asarray(z) - z0, self.z_grid, profile,
+                                     left=0, right=0)
+
+    def fit(self, z, profile, weights=None):
+        '''
+        Fit a measured line density.
+
+        Parameters
+        ----------
+        z : array_like
+            Longitudinal positions of the measurement (in m).
+        profile : array_like
+            Measured line density (arbitrary units).
+        weights : array_like, optional
+            Weights of the residuals (e.g. inverse of the measurement
+            errors).
+
+        Returns
+        -------
+        result : dict
+            Best-fit parameters: 'sigma_z' (RMS bunch length in m, within
+            the bucket), 'm' or 'q' for the binomial and q-Gaussian shapes,
+            'z0', 'amplitude' (area of the profile) and 'residual_rms'.
+            'generator_kwargs' contains the arguments to be passed to
+            `generate_longitudinal_coordinates`.
+        '''
+        z = np.asarray(z, dtype=np.float64)
+        profile = np.asarray(profile, dtype=np.float64)
+        if weights is None:
+            weights = np.ones_like(profile)
+
+        # Initial guess from the moments of the measured profile
+        area = trapezoid(profile, z)
+        z0 = trapezoid(z * profile, z) / area
+        sigma = np.sqrt(np.abs(trapezoid((z - z0)**2 * profile, z) / area))
+        ip = len(self.parameters) // 2
+        log_width = np.interp(sigma, self.sigma_z[ip], self.log_widths)
+
+        # The shape parameter is fitted only if there is one
+        n_free = 4 if len(self.parameters) > 1 else 3
+
+        def residuals(xx):
+            amplitude, z0, log_width = xx[:3]
+            parameter = xx[3] if n_free == 4 else self.parameters[0]
+            return weights * (self.line_density(z, amplitude, z0,
+                                                parameter=parameter,
+                                                log_width=log_width)
+                              - profile)
+
+        x0 = [area, z0, log_width, self.parameters[ip]]
+        lower = [0, z.min(), self.log_widths[0], self.parameters[0]]
+        upper = [np.inf, z.max(), self.log_widths[-1], self.parameters[-1]]
+        x_scale = [area, sigma, 1., 1.]
+        res = least_squares(residuals, x0[:n_free],
+                            bounds=(lower[:n_free], upper[:n_free]),
+                            x_scale=x_scale[:n_free])
+        if not res.success:
+            _print('Warning! LongitudinalProfileFitter: ' + res.message)
+
+        amplitude, z0, log_width = map(float, res.x[:3])
+        parameter = float(res.x[3]) if n_free == 4 else self.parameters[0]
+        sigma_z = float(self._interpolate(self.sigma_z, parameter, log_width))
+
+        result = {'distribution': self.distribution,
+                  'sigma_z': sigma_z,
+                  'z0': z0,
+                  'amplitude': amplitude,
+                  'residual_rms': np.sqrt(np.mean(res.fun**2))}
+        generator_kwargs = {'distribution': self.distribution,
+                            'engine': 'single-rf-harmonic',
+                            'sigma_z': sigma_z}
+        if self.distribution == 'binomial':
+            result['m'] = generator_kwargs['m'] = parameter
+        elif self.distribution == 'qgaussian':
+            result['q'] = generator_kwargs['q'] = parameter
+        result['generator_kwargs'] = generator_kwargs
+        return result
+
+
+def fit_longitudinal_profile(z, profile, distribution, line=None,
+                             circumference=None, rf_harmonic=None,
+                             weights=None, **kwargs):
+    '''
+    Fit a measured line density with the shapes of the
+    SingleRFHarmonicMatcher. The templates are computed at the first call
+    for a given bucket and distribution and reused by the following calls.
+
+    Parameters
+    ----------
+    z : array_like
+        Longitudinal positions of the measurement (in m).
+    profile : array_like
+        Measured line density.
+    distribution : str
+        Shape of the line density ('parabolic', 'gaussian', 'binomial' or
+        'qgaussian').
+    line : xtrack.Line, optional
+        Line defining the RF bucket. Alternatively `circumference` and
+        `rf_harmonic` can be provided.
+    weights : array_like, optional
+        Weights of the residuals.
+    kwargs :
+        Passed to LongitudinalProfileFitter.
+
+    Returns
+    -------
+    result : dict
+        See LongitudinalProfileFitter.fit.
+    '''
+    if line is not None:
+        if circumference is None:
+            circumference = line.get_length()
+        if rf_harmonic is None:
+            rf_harmonic = _main_rf_harmonic(line, line.particle_ref)
+    assert circumference is not None and rf_harmonic is not None
+
+    fitter = _get_fitter(LongitudinalProfileFitter, distribution,
+                         circumference, rf_harmonic, kwargs)
+    return fitter.fit(z, profile, weights=weights)
@@ -0,0 +1,180 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+'''
+Vectorised evaluation of the profiles (line density, momentum profile and
+phase-space density) of a distribution matched to an RF bucket.
+'''
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+PROFILE_CACHE_SIZE = 16
+
+
+def _gauss_legendre(n_nodes):
+    # Nodes and weights on [0, 1]
+    tt, ww = np.polynomial.legendre.leggauss(n_nodes)
+    return (tt + 1) / 2, ww / 2
+
+
+class ProfileEngine:
+
+    '''
+    Profiles of the distribution matched by an RFBucketMatcher.
+
+    The integrals over the bucket are computed with Gauss-Legendre nodes
+    broadcast over all the requested points at once (no loop in python).
+    The results are cached for the matched state of the matcher (H0 of the
+    distribution and bucket boundaries), so that repeated evaluations on the
+    same grid (e.g. when comparing with measured profiles) are free.
+
+    Parameters
+    ----------
+    matcher : RFBucketMatcher
+        Matcher providing the distribution function psi(z, dp) and the
+        RF bucket.
+    n_nodes : int
+        Default number of Gauss-Legendre nodes. With the default of 5 the
+        line density is the same as with `scipy.integrate.fixed_quad`.
+    '''
+
+    def __init__(self, matcher, n_nodes=5):
+        self.matcher = matcher
+        self.n_nodes = n_nodes
+        self._cache = OrderedDict()
+        self._cache_state = None
+
+    def _state(self):
+        psi_object = self.matcher.psi_object
+        rfbucket = self.matcher.rfbucket
+        return (psi_object.H0, psi_object.Hmax,
+                rfbucket.z_left, rfbucket.z_right)
+
+    def _cached(self, kind, params, arrays, compute):
+        state = self._state()
+        if state != self._cache_state:
+            self._cache.clear()
+            self._cache_state = state
+
+        hh = hashlib.sha256(repr((kind, params)).encode())
+        for aa in arrays:
+            hh.update(repr(aa.shape).encode())
+            hh.update(aa.tobytes())
+        key = hh.hexdigest()
+
+        if key in self._cache:
+            self._cache.move_to_end(key)
+        else:
+            self._cache[key] = compute()
+            while len(self._cache) > PROFILE_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return self._cache[key].copy()
+
+    def clear_cache(self):
+        '''
+        Clear the cached profiles.
+        '''
+        self._cache.clear()
+
+    def linedensity(self, z, n_nodes=None):
+        '''
+        Line density at the positions z, 2 * integral of psi(z, dp) for dp
+        from 0 to the separatrix (same normalization as
+        `RFBucketMatcher.linedensity`).
+
+        Parameters
+        ----------
+        z : array_like
+            Longitudinal positions.
+        n_nodes : int, optional
+            Number of Gauss-Legendre nodes.
+
+        Returns
+        -------
+        linedensity : np.ndarray
+            Line density, with the shape of z.
+        '''
+        n_nodes = n_nodes or self.n_nodes
+        z = np.asarray(z, dtype=np.float64)
+
+        def compute():
+            tt, ww = _gauss_legendre(n_nodes)
+            zz = z.reshape(-1, 1)
+            dp_max = self.matcher.rfbucket.separatrix(zz)
+            values = self.matcher.psi(zz, dp_max * tt)
+            return (2 * dp_max[:, 0] * (values @ ww)).reshape(z.shape)
+
+        return self._cached('linedensity', (n_nodes,), [z], compute)
+
+    def momentum_profile(self, dp, n_nodes=None, n_intervals=64):
+        '''
+        Momentum profile at the values dp, integral of psi(z, dp) over z in
+        the bucket.
+
+        The bucket is split in n_intervals equal intervals, each integrated
+        with n_nodes Gauss-Legendre nodes.
+
+        Parameters
+        ----------
+        dp : array_like
+            Momentum deviations.
+        n_nodes : int, optional
+            Number of Gauss-Legendre nodes per interval.
+        n_intervals : int
+            Number of intervals.
+
+        Returns
+        -------
+        momentum_profile : np.ndarray
+            Momentum profile, with the shape of dp.
+        '''
+        n_nodes = n_nodes or self.n_nodes
+        dp = np.asarray(dp, dtype=np.float64)
+
+        def compute():
+            rfbucket = self.matcher.rfbucket
+            tt, ww = _gauss_legendre(n_nodes)
+            edges = np.linspace(rfbucket.z_left, rfbucket.z_right,
+                                n_intervals + 1)
+            dz = np.diff(edges)
+            zz = (edges[:-1, None] + dz[:, None] * tt).ravel()
+            weights = (dz[:, None] * ww).ravel()
+            inside = rfbucket.is_in_separatrix(zz, dp.reshape(-1, 1))
+            values = np.where(inside,
+                              self.matcher.psi(zz, dp.reshape(-1, 1)), 0)
+            return (values @ weights).reshape(dp.shape)
+
+        return self._cached('momentum_profile', (n_nodes, n_intervals),
+                            [dp], compute)
+
+    def density_grid(self, z, dp):
+        '''
+        Phase-space density psi on the grid defined by z and dp (zero
+        outside the separatrix).
+
+        Parameters
+        ----------
+        z : array_like
+            Longitudinal positions (1D).
+        dp : array_like
+            Momentum deviations (1D).
+
+        Returns
+        -------
+        density : np.ndarray
+            Density of shape (len(z), len(dp)).
+        '''
+        z = np.atleast_1d(np.asarray(z, dtype=np.float64))
+        dp = np.atleast_1d(np.asarray(dp, dtype=np.float64))
+
+        def compute():
+            zz = z.reshape(-1, 1)
+            inside = self.matcher.rfbucket.is_in_separatrix(zz, dp)
+            return np.where(inside, self.matcher.psi(zz, dp), 0)
+
+        return self._cached('density_grid', (), [z, dp], compute)
@@ -0,0 +1,229 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+import numpy as np
+from scipy.constants import c as clight
+from scipy.constants import e as qe
+from scipy.optimize import newton
+
+from .. import profiling
+from .rf_bucket import RFBucket
+from .rfbucket_matching import RFBucketMatcher, ThermalDistribution
+
+
+def _per_step(value, n_steps, n_harmonics=None):
+    value = np.asarray(value, dtype=np.float64)
+    if n_harmonics is None:
+        return np.broadcast_to(value, (n_steps,))
+    if n_harmonics == 1 and value.ndim == 1:
+        value = value[:, None]
+    return np.broadcast_to(value, (n_steps, n_harmonics))
+
+
+def _eta0(bucket_kwargs):
+    return bucket_kwargs['alpha_array'][0] - bucket_kwargs['gamma']**-2
+
+
+def _same_bucket_centre(bucket_kwargs, prev_bucket_kwargs):
+    # The bucket centre (RFBucket.z_offset) only depends on the shape of the
+    # stationary RF potential and on the sign of the slippage factor
+    if prev_bucket_kwargs is None:
+        return False
+    if np.sign(_eta0(bucket_kwargs)) != np.sign(_eta0(prev_bucket_kwargs)):
+        return False
+    if not np.array_equal(bucket_kwargs['phi_offset_list'],
+                          prev_bucket_kwargs['phi_offset_list']):
+        return False
+    voltage = bucket_kwargs['voltage_list']
+    prev_voltage = prev_bucket_kwargs['voltage_list']
+    return np.allclose(voltage * prev_voltage[0], prev_voltage * voltage[0],
+                       rtol=1e-12, atol=0)
+
+
+def _warm_match(matcher, x0, rtol):
+    '''
+    Match the distribution with a secant iteration on the argument of
+    guess_H0 starting from x0. Raise RuntimeError if not converged.
+    '''
+    rfbucket = matcher.rfbucket
+    if matcher.variable_name == 'sigma_z':
+        from_variable, compute = 'sigma', matcher._compute_sigma
+    else:
+        from_variable, compute = 'epsn', matcher._compute_emittance
+    target = matcher.variable
+
+    def error(xx):
+        matcher.psi_object.H0 = rfbucket.guess_H0(xx,
+                                                  from_variable=from_variable)
+        value = compute(rfbucket, matcher.psi)
+        if np.isnan(value):
+            raise RuntimeError('Matching failed')
+        return value / target - 1.
+
+    xx, res = newton(error, x0, tol=rtol * abs(x0), maxiter=20,
+                     full_output=True, disp=False)
+    if not res.converged or xx <= 0:
+        raise RuntimeError('Matching did not converge')
+
+    matcher.psi_object.H0 = rfbucket.guess_H0(xx, from_variable=from_variable)
+    matcher.H0_parameter = xx
+    matcher._matched_target = matcher._match_key()
+
+
+@profiling.timed('match_longitudinal_ramp')
+def match_longitudinal_ramp(gamma0, rf_voltage, rf_phase,
+                            circumference, momentum_compaction_factor,
+                            rf_harmonic, mass0, q0=1.,
+                            energy_ref_increment=0.,
+                            sigma_z=None, epsn_z=None,
+                            num_particles=None, sample_steps=None, rng=None,
+                            return_matchers=False, rtol=1e-5):
+    '''
+    Match a thermal longitudinal distribution at each step of an energy ramp
+    or RF voltage program.
+
+    Each step is matched starting from the solution of the previous steps
+    (linearly extrapolated), which needs only a few evaluations of the
+    bunch length or emittance integrals instead of a full bracketing root
+    search. The bucket centre is also reused when the RF shape does not
+    change. Steps for which the warm start does not converge fall back to
+    the standard matching.
+
+    Parameters
+    ----------
+    gamma0 : array_like
+        Relativistic gamma of the reference particle at each step.
+    rf_voltage : array_like
+        RF voltages in V. Shape (n_steps,) or (n_steps, n_harmonics), or
+        (n_harmonics,) if constant along the ramp.
+    rf_phase : array_like
+        RF phases in rad (same conventions as in
+        `generate_longitudinal_coordinates`), same shapes as rf_voltage.
+    circumference : float
+        Machine circumference in m.
+    momentum_compaction_factor : float
+        Momentum compaction factor.
+    rf_harmonic : array_like
+        Harmonic numbers of the RF systems.
+    mass0 : float
+        Rest mass of the particles in eV.
+    q0 : float
+        Charge of the particles in units of the elementary charge.
+    energy_ref_increment : float or array_like
+        Energy gain of the reference particle per turn in eV, at each step.
+    sigma_z : float or array_like
+        Target RMS bunch length in m (scalar or one value per step).
+    epsn_z : float or array_like
+        Target RMS longitudinal emittance in eV s (alternative to sigma_z).
+    num_particles : int, optional
+        If provided, particles are sampled at the steps listed in
+        `sample_steps` (all steps if not provided).
+    sample_steps : list of int, optional
+        Steps at which particles are sampled.
+    rng : np.random.Generator, optional
+        Random number generator used for the sampling.
+    return_matchers : bool
+        If True, the RFBucketMatcher of each step is returned in the result,
+        allowing for sampling at a later stage.
+    rtol : float
+        Relative tolerance of the matching.
+
+    Returns
+    -------
+    result : dict
+        Per-step arrays: `H0` (matched H0), `H0_parameter` (corresponding
+        argument of RFBucket.guess_H0), `z_sfp`, `z_left`, `z_right`
+        (bucket geometry), `Q_s` (synchrotron tune in the linear
+        approximation) and `warm_start` (whether the warm start was
+        successful). If sampling is requested, `samples` maps each sampled
+        step to the tuple (zeta, delta). If `return_matchers` is True,
+        `matchers` holds the list of matchers.
+    '''
+
+    if (sigma_z is None) == (epsn_z is None):
+        raise ValueError('Exactly one of `sigma_z` and `epsn_z` must be '
+                         'provided.')
+
+    gamma0 = np.atleast_1d(np.asarray(gamma0, dtype=np.float64))
+    n_steps = len(gamma0)
+    rf_harmonic = np.atleast_1d(rf_harmonic)
+    n_harmonics = len(rf_harmonic)
+    rf_voltage = _per_step(rf_voltage, n_steps, n_harmonics)
+    rf_phase = _per_step(rf_phase, n_steps, n_harmonics)
+    energy_ref_increment = _per_step(energy_ref_increment, n_steps)
+    target_name = 'sigma_z' if sigma_z is not None else 'epsn_z'
+    target = _per_step(sigma_z if sigma_z is not None else epsn_z, n_steps)
+
+    if num_particles is not None and sample_steps is None:
+        sample_steps = range(n_steps)
+    sample_steps = set(sample_steps or [])
+
+    result = {kk: np.zeros(n_steps) for kk in
+              ['H0', 'H0_parameter', 'z_sfp', 'z_left', 'z_right', 'Q_s']}
+    result['warm_start'] = np.zeros(n_steps, dtype=bool)
+    if sample_steps:
+        result['samples'] = {}
+    if return_matchers:
+        result['matchers'] = []
+
+    prev_bucket = prev_bucket_kwargs = None
+    parameters = []
+    for ii in range(n_steps):
+        beta0 = np.sqrt(1 - 1 / gamma0[ii]**2)
+        # valid for small energy change, see generate_longitudinal_coordinates
+        dp0_si = energy_ref_increment[ii] / beta0 * qe / clight
+
+        bucket_kwargs = dict(circumference=circumference,
+                             gamma=gamma0[ii],
+                             mass_kg=mass0/(clight**2)*qe,
+                             charge_coulomb=np.abs(q0)*qe,
+                             alpha_array=np.atleast_1d(
+                                            momentum_compaction_factor),
+                             harmonic_list=rf_harmonic,
+                             voltage_list=rf_voltage[ii],
+                             phi_offset_list=rf_phase[ii],
+                             p_increment=dp0_si)
+        with profiling.stage('rf_bucket'):
+            z_offset = None
+            if _same_bucket_centre(bucket_kwargs, prev_bucket_kwargs):
+                # Skip the search of the bucket centre
+                z_offset = prev_bucket.z_offset
+            rfbucket = RFBucket(z_offset=z_offset, **bucket_kwargs)
+
+        matcher = RFBucketMatcher(rfbucket=rfbucket,
+                                  distribution_type=ThermalDistribution,
+                                  **{target_name: target[ii]})
+
+        with profiling.stage('matching'):
+            if parameters:
+                x0 = parameters[-1]
+                if len(parameters) > 1:
+                    x0_extrapolated = 2 * parameters[-1] - parameters[-2]
+                    if x0_extrapolated > 0:
+                        x0 = x0_extrapolated
+                try:
+                    _warm_match(matcher, x0, rtol)
+                    result['warm_start'][ii] = True
+                except RuntimeError:
+                    pass
+            if not result['warm_start'][ii]:
+                matcher.match()
+
+        parameters.append(matcher.H0_parameter)
+        result['H0'][ii] = matcher.psi_object.H0
+        result['H0_parameter'][ii] = matcher.H0_parameter
+        result['z_sfp'][ii] = rfbucket.z_sfp_extr
+        result['z_left'][ii] = rfbucket.z_left
+        result['z_right'][ii] = rfbucket.z_right
+        result['Q_s'][ii] = rfbucket.Q_s
+
+        if ii in sample_steps:
+            result['samples'][ii] = matcher.sample(num_particles, rng=rng)
+        if return_matchers:
+            result['matchers'].append(matcher)
+
+        prev_bucket, prev_bucket_kwargs = rfbucket, bucket_kwargs
+
+    return result
@@ -279,6 +279,48 @@ class RFBucket:
         return np.sqrt(self.charge_coulomb*np.abs(self.eta0)*hV /
                        (2*np.pi*self.p0*self.beta*c))
 
+    def _cache_parameters(self):
+        '''Return the parameters defining this RFBucket as a dictionary
+        (used as key for the persistent matching cache), or None if the
+        bucket includes additional fields which cannot be hashed.
+        '''
+        if self._add_forces or self._add_potentials:
+            return None
+        return dict(circumference=self.circumference, gamma=self.gamma,
+                    mass_kg=self.mass_kg,
+                    charge_coulomb=self.charge_coulomb,
+                    alpha0=self.alpha0, p_increment=self.p_increment,
+                    harmonic_list=np.atleast_1d(self.h),
+                    voltage_list=np.atleast_1d(self.V),
+                    phi_offset_list=np.atleast_1d(self.dphi),
+                    z_offset=self.z_offset)
+
+    def _get_geometry(self):
+        '''Return the fix points and the bucket boundaries.'''
+        return dict(z_sfp=np.atleast_1d(self.z_sfp),
+                    z_ufp=np.atleast_1d(self.z_ufp),
+                    z_left=self.z_left, z_right=self.z_right)
+
+    def _set_geometry(self, geometry):
+        '''Set the fix points and the bucket boundaries (as returned by
+        _get_geometry) without recomputing them.
+        '''
+        self._z_sfp = np.atleast_1d(geometry['z_sfp'])
+        self._z_ufp = np.atleast_1d(geometry['z_ufp'])
+        self._z_left = float(geometry['z_left'])
+        self._z_right = float(geometry['z_right'])
+        self._clean_separatrix_tables()
+
+    def _clean_separatrix_tables(self):
+        '''Remove the cached Hamiltonian value at the stable fix point
+        and the tabulated separatrices.
+        '''
+        for name in ['_h_sfp', '_separatrix_tables']:
+            try:
+                delattr(self, name)
+            except AttributeError:
+                pass
+
     def add_fields(self, add_forces, add_potentials):
         '''Include additional (e.g. non-RF) effects to this RFBucket.
         Use this interface for adding space charge influence etc.
@@ -309,6 +351,7 @@ class RFBucket:
             delattr(self, "_z_right")
         except AttributeError:
             pass
+        self._clean_separatrix_tables()
 
     # FORCE FIELDS AND POTENTIALS OF MULTI-HARMONIC ACCELERATING BUCKET
     # =================================================================
@@ -642,7 +685,13 @@ class RFBucket:
         '''Return the extremal Hamiltonian value at the corresponding
         stable fix point (self.z_sfp_extr, 0) of the bucket.
         '''
-        return self.hamiltonian(self.z_sfp_extr, 0, make_convex)
+        try:
+            h = self._h_sfp
+        except AttributeError:
+            h = self._h_sfp = self.hamiltonian(self.z_sfp_extr, 0)
+        if make_convex:
+            h = h * np.sign(self.eta0)
+        return h
 
     def dp_max(self, zcut):
         '''Return the maximal dp value along the equihamiltonian which
@@ -667,6 +716,92 @@ class RFBucket:
                              margin * self.h_sfp(make_convex=True))
         return np.logical_and(within_interval, within_separatrix)
 
+    def separatrix_table(self, margin=0, n_points=10001):
+        '''Return the tabulated squared dp limit of the bucket,
+        (z, dp_squared), on n_points equally spaced z values from
+        self.z_left to self.z_right. Coordinates (z, dp) within this
+        interval are inside the separatrix (or inside the equihamiltonian
+        defined by margin*self.h_sfp, as in is_in_separatrix) if
+        dp**2 < dp_squared(z). The table is computed once and cached.
+        '''
+        try:
+            tables = self._separatrix_tables
+        except AttributeError:
+            tables = self._separatrix_tables = {}
+        key = (margin, n_points)
+        if key not in tables:
+            z = np.linspace(self.z_left, self.z_right, n_points)
+            dp_squared = 2./(np.abs(self.eta0)*self.beta*c) * (
+                self.total_potential(z, make_convex=True)/self.p0
+                - margin*self.h_sfp(make_convex=True))
+            tables[key] = (z, dp_squared)
+        return tables[key]
+
+    def classify(self, z, dp, margin=0, n_points=10001, _context=None,
+                 bucket_length=None):
+        '''Classify the coordinates (z, dp) as captured or not by
+        interpolation in the tabulated separatrix (see separatrix_table),
+        without evaluating the Hamiltonian.
+
+        The RF buckets are assumed to repeat with the period of the
+        fundamental harmonic, bucket i being centred at
+        self.z_sfp_extr - i * circumference / min(harmonic_list)
+        (i.e. bucket numbers increase towards negative z, as for the
+        bunches of a filling scheme), unless bucket_length is given.
+
+        Arguments:
+            - z, dp: arrays of coordinates (on the device of _context
+              if provided)
+            - margin: see is_in_separatrix
+            - n_points: number of points of the separatrix table
+            - _context: xobjects context of the arrays (CPU by default)
+            - bucket_length: period of the RF buckets (default:
+              circumference / min(harmonic_list))
+
+        Returns (in_bucket, bucket_index): in_bucket is True for the
+        coordinates within the separatrix of their bucket, bucket_index
+        is the number of the bucket containing z.
+        For coordinates in bucket 0, in_bucket is equivalent to
+        is_in_separatrix up to the interpolation accuracy.
+        '''
+        if _context is None:
+            nplike = np
+            z_table, dp_squared = self.separatrix_table(margin, n_points)
+        else:
+            nplike = _context.nplike_lib
+            z_table, dp_squared = self.separatrix_table(margin, n_points)
+            dp_squared = _context.nparray_to_context_array(dp_squared)
+
+        z_left, z_right = self.z_left, self.z_right
+        if bucket_length is None:
+            bucket_length = self.circumference / np.amin(self.h)
+        dz = z_table[1] - z_table[0]
+
+        def inside(z_local, dp):
+            xx = (z_local - z_left) / dz
+            ii = nplike.clip(xx.astype(np.int64), 0, n_points - 2)
+            ww = xx - ii
+            dp_squared_max = ((1 - ww) * dp_squared[ii]
+                              + ww * dp_squared[ii + 1])
+            return ((z_local > z_left) & (z_local < z_right)
+                    & (dp * dp < dp_squared_max))
+
+        bucket_index = -nplike.floor((z - z_left) / bucket_length)
+        z_local = z + bucket_index * bucket_length
+        in_bucket = inside(z_local, dp)
+        bucket_index = bucket_index.astype(np.int64)
+
+        if z_right - z_left > bucket_length:
+            # The separatrix of an accelerating bucket can extend beyond
+            # the unstable fix point of the adjacent bucket
+            overlap = nplike.nonzero(
+                ~in_bucket & (z_local + bucket_length < z_right))[0]
+            in_next = inside(z_local[overlap] + bucket_length, dp[overlap])
+            in_bucket[overlap] = in_next
+            bucket_index[overlap] += in_next
+
+        return in_bucket, bucket_index
+
     def make_is_accepted(self, margin=0):
         """Return the function is_accepted(z, dp) definining the
         equihamiltonian with a value of margin*self.h_sfp .
@@ -19,7 +19,12 @@ from functools import partial
 from abc import abstractmethod
 
 from . import pdf_integrators_2d as integr
-from ..general import _print
+from .match_cache import get_match_cache
+from .profiles import ProfileEngine
+from .potential_well import PotentialWell
+from .. import profiling
+from ..general import _print, progress
+from ..sampling import _check_sampling, _seed_from_rng, _qmc_engine, _qmc_draw
 
 logger = logging.getLogger(__name__)
 
@@ -64,12 +69,19 @@ class RFBucketMatcher:
         self.psi = self.psi_object.function
 
         self.verbose_regeneration = verbose_regeneration
+        self._matched_target = None
+        # Argument of rfbucket.guess_H0 giving the matched H0
+        self.H0_parameter = None
+        self.profiles = ProfileEngine(self)
+        self.potential_well = None
 
         if sigma_z and not epsn_z:
             self.variable = sigma_z
+            self.variable_name = 'sigma_z'
             self.psi_for_variable = self.psi_for_bunchlength_newton_method
         elif not sigma_z and epsn_z:
             self.variable = epsn_z
+            self.variable_name = 'epsn_z'
             self.psi_for_variable = self.psi_for_emittance_newton_method
         else:
             raise ValueError("Can not generate mismatched matched "
@@ -97,8 +109,9 @@ class RFBucketMatcher:
 
             if np.isnan(emittance): raise ValueError
 
-            _print('... distance to target emittance: ' +
-                        '{:.2e}'.format(emittance-epsn_z))
+            progress('RFBucketMatcher: Matching emittance',
+                     message='distance to target emittance: ' +
+                             '{:.2e}'.format(emittance-epsn_z))
 
             return emittance-epsn_z
 
@@ -110,9 +123,11 @@ class RFBucketMatcher:
                 'RFBucketMatcher: failed to converge with Brent method, '
                 'continuing with Newton-Raphson method.')
             ec_bar = newton(error_from_target_epsn, epsn_z, tol=1e-5)
+        progress.done('RFBucketMatcher: Matching emittance', message='done')
 
         self.psi_object.H0 = self.rfbucket.guess_H0(
             ec_bar, from_variable='epsn')
+        self.H0_parameter = ec_bar
         emittance = self._compute_emittance(self.rfbucket, self.psi)
         _print('--> Emittance: ' + str(emittance))
         sigma = self._compute_sigma(self.rfbucket, self.psi)
@@ -138,8 +153,9 @@ class RFBucketMatcher:
 
             if np.isnan(length): raise ValueError
 
-            _print('... distance to target bunch length: ' +
-                        '{:.4e}'.format(length-sigma))
+            progress('RFBucketMatcher: Matching bunch length',
+                     message='distance to target bunch length: ' +
+                             '{:.4e}'.format(length-sigma))
 
             return length-sigma
 
@@ -151,15 +167,60 @@ class RFBucketMatcher:
                 'RFBucketMatcher: failed to converge with Brent method, '
                 'continuing with Newton-Raphson method.')
             sc_bar = newton(error_from_target_sigma, sigma, tol=1e-5)
+        progress.done('RFBucketMatcher: Matching bunch length',
+                      message='done')
 
         self.psi_object.H0 = self.rfbucket.guess_H0(
             sc_bar, from_variable='sigma')
+        self.H0_parameter = sc_bar
         sigma = self._compute_sigma(self.rfbucket, self.psi)
         _print('--> Bunch length: ' + str(sigma))
         emittance = self._compute_emittance(self.rfbucket, self.psi)
         _print('--> Emittance: ' + str(emittance))
 
-    def linedensity(self, xx, quad_type=fixed_quad):
+    def _cache_parameters(self):
+        bucket_parameters = self.rfbucket._cache_parameters()
+        if bucket_parameters is None:
+            return None
+        return dict(matcher='RFBucketMatcher',
+                    bucket=bucket_parameters,
+                    distribution_type=self.psi_object.__class__.__name__,
+                    variable_name=self.variable_name,
+                    variable=self.variable,
+                    integrationmethod=self.integrationmethod)
+
+    def _match_with_cache(self):
+        '''Set H0 of the distribution to match the target bunch length or
+        emittance, using the persistent matching cache if enabled.
+        '''
+        cache = get_match_cache()
+        params = self._cache_parameters() if cache is not None else None
+        if params is None:
+            self.psi_for_variable(self.variable)
+            return
+
+        data = cache.get(params)
+        if data is not None:
+            self.rfbucket._set_geometry(data)
+            self.psi_object.H0 = float(data['H0'])
+            self.H0_parameter = float(data['H0_parameter'])
+            return
+
+        self.psi_for_variable(self.variable)
+        cache.put(params, dict(H0=self.psi_object.H0,
+                               H0_parameter=self.H0_parameter,
+                               **self.rfbucket._get_geometry()))
+
+    def linedensity(self, xx, quad_type=fixed_quad, n_nodes=None):
+        '''Line density of the distribution at the positions xx.
+
+        With the default fixed_quad the integrals are evaluated for all
+        the positions at once by self.profiles (see ProfileEngine), with
+        n_nodes Gauss-Legendre nodes (5 as fixed_quad by default).
+        '''
+        if quad_type is fixed_quad:
+            return self.profiles.linedensity(xx, n_nodes=n_nodes)
+
         L = []
         try:
             L = np.array([quad_type(lambda y: self.psi(x, y), 0,
@@ -172,51 +233,176 @@ class RFBucketMatcher:
 
         return 2*L
 
-    def generate(self, macroparticlenumber, cutting_margin=0):
-        '''Generate a 2d phase space of n_particles particles randomly distributed
-        according to the particle distribution function psi within the region
-        [xmin, xmax, ymin, ymax].
+    def momentum_profile(self, dp, n_nodes=None, n_intervals=64):
+        '''Momentum profile of the distribution at the values dp
+        (see ProfileEngine.momentum_profile).
         '''
-        self.psi_for_variable(self.variable)
+        return self.profiles.momentum_profile(dp, n_nodes=n_nodes,
+                                              n_intervals=n_intervals)
 
-        xmin, xmax = self.rfbucket.z_left, self.rfbucket.z_right
-        ymin = -self.rfbucket.dp_max(self.rfbucket.z_right)
-        ymax = -ymin
+    def density_grid(self, z, dp):
+        '''Phase-space density of the distribution on the (z, dp) grid
+        (see ProfileEngine.density_grid).
+        '''
+        return self.profiles.density_grid(z, dp)
+
+    def set_potential_well(self, intensity, wake_function=None,
+                           impedance=None, **kwargs):
+        '''Include the potential-well distortion of the bucket by the
+        wake field of the bunch: match() then solves the Haissinski
+        equation self-consistently (see PotentialWell, kwargs are passed
+        to it). Exactly one of wake_function(tau) (in V/C) and
+        impedance(f) (in Ohm) must be given. With intensity=None the
+        distortion is removed. Returns the matcher itself.
+        '''
+        if self.potential_well is not None:
+            self.potential_well.detach()
+            self.potential_well = None
+        if intensity is not None:
+            self.potential_well = PotentialWell(
+                intensity, wake_function=wake_function,
+                impedance=impedance, **kwargs)
+            self.potential_well.attach(self.rfbucket)
+        self.psi_object.Hmax = self.rfbucket.h_sfp(make_convex=True)
+        self._matched_target = None
+        return self
+
+    def _match_key(self):
+        '''Return the target of the matching together with the RF
+        parameters and the geometry of the bucket it is matched to.
+        '''
+        rfbucket = self.rfbucket
+        # Geometry as currently computed (not computed here, so that the
+        # persistent matching cache can provide it): it is removed when
+        # fields are added and missing for a new bucket
+        geometry = {kk: rfbucket.__dict__.get('_' + kk)
+                    for kk in ['z_sfp', 'z_ufp', 'z_left', 'z_right']}
+        return ((self.variable_name, self.variable),
+                (tuple(np.atleast_1d(rfbucket.h).tolist()),
+                 tuple(np.atleast_1d(rfbucket.V).tolist()),
+                 tuple(np.atleast_1d(rfbucket.dphi).tolist()),
+                 rfbucket.p_increment),
+                tuple((kk, None if vv is None
+                       else tuple(np.atleast_1d(vv).tolist()))
+                      for kk, vv in sorted(geometry.items())))
+
+    def match(self):
+        '''Match the distribution to the target bunch length or emittance.
+        The matching is performed only if it was not done yet for the
+        current target and RF bucket, so that the matcher can be reused
+        to sample repeatedly. Returns the matcher itself.
+        '''
+        key = self._match_key()
+        if self._matched_target != key:
+            if self._matched_target is not None:
+                if self._matched_target[1] != key[1]:
+                    # RF parameters changed in place, the bucket geometry
+                    # has to be recomputed
+                    self.rfbucket.add_fields([], [])
+                # The bucket may have been replaced or modified
+                self.psi_object.H = partial(self.rfbucket.hamiltonian,
+                                            make_convex=True)
+                self.psi_object.Hmax = self.rfbucket.h_sfp(make_convex=True)
+            with profiling.stage('matching'):
+                if self.potential_well is None:
+                    self._match_with_cache()
+                else:
+                    self.potential_well.solve(self)
+            self._matched_target = self._match_key()
+        return self
+
+    def sample(self, n_particles, rng=None, out=None, cutting_margin=0,
+               sampling='pseudo'):
+        '''Sample n_particles particles from the matched distribution
+        (the matching is performed first if needed).
+
+        Arguments:
+        - rng: np.random.Generator used for the sampling (np.random
+          if not given). For quasi-random sampling it is used as
+          scrambling seed.
+        - out: optional tuple of two float arrays of length n_particles,
+          filled in place with z and dp.
+        - cutting_margin: if non-zero, particles are generated within
+          the equihamiltonian cutting_margin*self.rfbucket.h_sfp .
+        - sampling: 'pseudo', 'sobol' or 'halton'.
+
+        Return (z, dp).
+        '''
+        _check_sampling(sampling)
+        self.match()
+
+        with profiling.stage('sampling'):
+            xmin, xmax = self.rfbucket.z_left, self.rfbucket.z_right
+            ymin = -self.rfbucket.dp_max(self.rfbucket.z_right)
+            ymax = -ymin
+
+            # rejection sampling
+            if sampling != 'pseudo':
+                engine = _qmc_engine(3, sampling=sampling,
+                                     seed=_seed_from_rng(rng))
+            uniform = (np.random if rng is None else rng).uniform
+
+            def draw(n_gen):
+                if sampling == 'pseudo':
+                    return (uniform(low=xmin, high=xmax, size=n_gen),
+                            uniform(low=ymin, high=ymax, size=n_gen),
+                            uniform(size=n_gen))
+                uu = _qmc_draw(engine, n_gen)
+                return (xmin + (xmax - xmin) * uu[:, 0],
+                        ymin + (ymax - ymin) * uu[:, 1],
+                        uu[:, 2])
+
+            n_gen = n_particles
+            if out is None:
+                u, v, s = draw(n_gen)
+            else:
+                u, v = out
+                assert len(u) == len(v) == n_particles
+                u[:], v[:], s = draw(n_gen)
 
-        # rejection sampling
-        uniform = np.random.uniform
-        n_gen = macroparticlenumber
-        u = uniform(low=xmin, high=xmax, size=n_gen)
-        v = uniform(low=ymin, high=ymax, size=n_gen)
-        s = uniform(size=n_gen)
+            def mask_out(s, u, v):
+                return s >= self.psi(u, v)
 
-        def mask_out(s, u, v):
-            return s >= self.psi(u, v)
+            if cutting_margin:
+                mask_out_nocut = mask_out
 
-        if cutting_margin:
-            mask_out_nocut = mask_out
+                def mask_out(s, u, v):
+                    return np.logical_or(
+                        mask_out_nocut(s, u, v),
+                        ~self.rfbucket.is_in_separatrix(u, v, cutting_margin))
 
-            def mask_out(s, u, v):
-                return np.logical_or(
-                    mask_out_nocut(s, u, v),
-                    ~self.rfbucket.is_in_separatrix(u, v, cutting_margin))
-
-        # masked_out = ~(s<self.psi(u, v))
-        masked_out = mask_out(s, u, v)
-        while np.any(masked_out):
-            masked_ids = np.where(masked_out)[0]
-            n_gen = len(masked_ids)
-            u[masked_out] = uniform(low=xmin, high=xmax, size=n_gen)
-            v[masked_out] = uniform(low=ymin, high=ymax, size=n_gen)
-            s[masked_out] = uniform(size=n_gen)
             # masked_out = ~(s<self.psi(u, v))
-            masked_out[masked_ids] = mask_out(
-                s[masked_out], u[masked_out], v[masked_out]
-            )
-            if self.verbose_regeneration:
-                _print(
-                    'Thou shalt not give up! :-) '
-                    'Regenerating {0} macro-particles...'.format(n_gen))
+            masked_out = mask_out(s, u, v)
+            while np.any(masked_out):
+                masked_ids = np.where(masked_out)[0]
+                n_gen = len(masked_ids)
+                u[masked_out], v[masked_out], s[masked_out] = draw(n_gen)
+                # masked_out = ~(s<self.psi(u, v))
+                masked_out[masked_ids] = mask_out(
+                    s[masked_out], u[masked_out], v[masked_out]
+                )
+                if self.verbose_regeneration:
+                    progress('RFBucketMatcher: Sampling',
+                             message='Thou shalt not give up! :-) '
+                             'Regenerating {0} macro-particles...'.format(n_gen))
+            progress.done('RFBucketMatcher: Sampling', message='done')
+            profiling.record_arrays(u, v)
+
+        return u, v
+
+    def generate(self, macroparticlenumber, cutting_margin=0,
+                 sampling='pseudo', rng=None):
+        '''Generate a 2d phase space of n_particles particles randomly distributed
+        according to the particle distribution function psi within the region
+        [xmin, xmax, ymin, ymax].
+
+        With sampling 'sobol' or 'halton' the candidates of the rejection
+        sampling are drawn from a 3d scrambled low-discrepancy sequence.
+
+        The matching is done only at the first call (see match and sample).
+        '''
+        u, v = self.sample(macroparticlenumber, rng=rng,
+                           cutting_margin=cutting_margin, sampling=sampling)
 
         return u, v, self.psi, self.linedensity
 
@@ -9,7 +9,9 @@ import scipy.special
 import scipy.integrate as integrate
 from scipy.special import gamma as Gamma
 
-from ..general import _print
+from ..general import _print, progress
+from .match_cache import get_match_cache
+from ..sampling import _check_sampling, _seed_from_rng, qmc_uniform
 
 
 class SingleRFHarmonicMatcher:
@@ -102,8 +104,32 @@ class SingleRFHarmonicMatcher:
         else:
             raise NotImplementedError
 
-        self.m_distr_x, self.m_distr_y = self.transform_tau_distr_to_m_distr()
+        self.m_distr_x, self.m_distr_y = self._transform_with_cache()
 
+    def _transform_with_cache(self):
+        # The transformation only depends on the Hamiltonian coefficients
+        # and on the tabulated profile
+        cache = get_match_cache()
+        if cache is None:
+            return self.transform_tau_distr_to_m_distr()
+
+        params = self._cache_parameters()
+        data = cache.get(params)
+        if data is not None:
+            return list(data['m_distr_x']), list(data['m_distr_y'])
+
+        m_distr_x, m_distr_y = self.transform_tau_distr_to_m_distr()
+        cache.put(params, dict(m_distr_x=np.array(m_distr_x),
+                               m_distr_y=np.array(m_distr_y)))
+        return m_distr_x, m_distr_y
+
+
+    def _cache_parameters(self):
+        return dict(matcher='SingleRFHarmonicMatcher',
+                    A=self.A, B=self.B, C=self.C,
+                    tau_distr_x=self.tau_distr_x,
+                    tau_distr_y=self.tau_distr_y,
+                    transformation_particles=self.transformation_particles)
 
     def transform_tau_distr_to_m_distr(self):
         xp = self.tau_distr_x.copy()
@@ -127,8 +153,8 @@ class SingleRFHarmonicMatcher:
             m = self.get_m(tau=tau)
             if m == 1.0:
                 continue
-            _print('SingleRFHarmonicMatcher: Transforming distribution: '
-                        f'{round(ii/N*100):2d}%  ',end="\r", flush=True)
+            progress('SingleRFHarmonicMatcher: Transforming distribution',
+                     ii/N)
             tau_test, ptau_test = self.get_airbag_from_m(m=m, n_particles=self.transformation_particles)
             hist, bin_edges = np.histogram(tau_test, bins=len(xp), range=(min(xp)-dx/2., max(xp)+dx/2.))
 
@@ -143,6 +169,7 @@ class SingleRFHarmonicMatcher:
         m_distr_x = m_distr_x[::-1]
         m_distr_y = m_distr_y[::-1]
 
+        progress('SingleRFHarmonicMatcher: Transforming distribution', 1.)
         _print('SingleRFHarmonicMatcher: Done transforming distribution.')
         return m_distr_x, m_distr_y
 
@@ -159,13 +186,14 @@ class SingleRFHarmonicMatcher:
     def get_m(self, tau=0, ptau=0):
         return ( np.sin(self.B/2. * tau) )**2 + self.C / 2. / self.A * (ptau ** 2)
 
-    def get_airbag_from_m(self, m, n_particles=20000):
+    def get_airbag_from_m(self, m, n_particles=20000, theta=None):
         if n_particles is None:
             n_particles = len(m)
 
         K = scipy.special.ellipk(m)
         G = 2.*K/np.pi
-        theta = np.random.uniform(size=n_particles)*2.*np.pi
+        if theta is None:
+            theta = np.random.uniform(size=n_particles)*2.*np.pi
         sn, cn, dn, ph = scipy.special.ellipj(G*theta,m)
 
         tau = 2./self.B*np.arcsin(np.sqrt(m)*sn)
@@ -173,7 +201,13 @@ class SingleRFHarmonicMatcher:
 
         return tau, ptau
 
-    def sample_tau_ptau(self, n_particles=20000):
+    def sample_tau_ptau(self, n_particles=20000, sampling='pseudo', rng=None):
+        _check_sampling(sampling)
+        if sampling != 'pseudo':
+            return self._sample_tau_ptau_inverse_cdf(n_particles,
+                                                     sampling=sampling, rng=rng)
+
+        random = (np.random if rng is None else rng).random
         max_m = max(self.m_distr_x)
         tau_new = []
         ptau_new = []
@@ -184,23 +218,92 @@ class SingleRFHarmonicMatcher:
         ### The random angle is the conjugate variable to the action variable and is only
         ### approximately equal to the angle in the tau-ptau space.
         while counter < n_particles:
-            m = np.random.random(size=chunk)*max_m
-            rand_test = np.random.random(size=chunk)*max_y
+            m = random(size=chunk)*max_m
+            rand_test = random(size=chunk)*max_y
             yy = np.interp(m, self.m_distr_x, self.m_distr_y)
 
-            tau, ptau = self.get_airbag_from_m(m, n_particles=None)
+            theta = None if rng is None else random(size=chunk)*2.*np.pi
+            tau, ptau = self.get_airbag_from_m(m, n_particles=None,
+                                               theta=theta)
 
             mask = rand_test < yy
 
             tau_new.extend(list(tau[mask]))
             ptau_new.extend(list(ptau[mask]))
             counter += sum(mask)
-            _print('SingleRFHarmonicMatcher: Sampling particles: '
-                        f'{round(counter/n_particles*100):2d}%  ',end="\r", flush=True)
+            progress('SingleRFHarmonicMatcher: Sampling particles',
+                     min(counter/n_particles, 1.))
         _print(f"SingleRFHarmonicMatcher: Sampled {n_particles} particles")
 
         return tau_new[:n_particles], ptau_new[:n_particles]
 
+    def _sample_tau_ptau_inverse_cdf(self, n_particles, sampling, rng=None,
+                                     n_points_cdf=10000):
+        ### Rejection-free sampling (needed to preserve the low-discrepancy
+        ### of quasi-random sequences): m is obtained from the inverse CDF
+        ### of the (linearly interpolated) distribution of m and the angle
+        ### from the second dimension of the sequence.
+        m_grid, cdf = self._m_cdf(n_points_cdf)
+
+        if sampling == 'pseudo':
+            uu = (np.random if rng is None else rng).random(
+                                                    size=(n_particles, 2))
+        else:
+            uu = qmc_uniform(n_particles, 2, sampling=sampling,
+                             seed=_seed_from_rng(rng))
+        m = np.interp(uu[:, 0], cdf, m_grid)
+        tau, ptau = self.get_airbag_from_m(m, n_particles=None,
+                                           theta=uu[:, 1]*2.*np.pi)
+        _print(f"SingleRFHarmonicMatcher: Sampled {n_particles} particles")
+
+        return tau, ptau
+
+    def _m_cdf(self, n_points_cdf):
+        m_grid = np.linspace(0, max(self.m_distr_x), n_points_cdf)
+        pdf = np.interp(m_grid, self.m_distr_x, self.m_distr_y)
+        cdf = np.concatenate([[0], np.cumsum(
+                        0.5 * (pdf[1:] + pdf[:-1]) * np.diff(m_grid))])
+        cdf /= cdf[-1]
+        return m_grid, cdf
+
+    def match(self):
+        '''
+        The matching is performed at construction, this method is provided
+        for consistency with RFBucketMatcher. Returns the matcher itself.
+        '''
+        return self
+
+    def sample(self, n_particles, rng=None, out=None, sampling='pseudo'):
+        '''
+        Sample particles from the matched distribution. Can be called
+        repeatedly without repeating the matching.
+
+        Parameters
+        ----------
+        n_particles : int
+            Number of particles to be generated.
+        rng : np.random.Generator, optional
+            Random number generator (np.random if not given). For
+            quasi-random sampling it is used as scrambling seed.
+        out : tuple of np.ndarray, optional
+            Two float arrays of length n_particles filled in place with tau
+            and ptau.
+        sampling : str
+            Sampling mode. Can be 'pseudo', 'sobol' or 'halton'.
+
+        Returns
+        -------
+        tau, ptau : np.ndarray
+            Sampled coordinates.
+        '''
+        tau, ptau = self.sample_tau_ptau(n_particles=n_particles,
+                                         sampling=sampling, rng=rng)
+        if out is None:
+            return np.asarray(tau), np.asarray(ptau)
+        out[0][:] = tau
+        out[1][:] = ptau
+        return out
+
     def generate(self, n_particles=20000):
         tau, ptau = self.sample_tau_ptau(n_particles=n_particles)
 
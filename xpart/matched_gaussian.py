@@ -5,7 +5,10 @@
 
 import numpy as np
 
+from . import profiling
 from .general import _print
+from .sampling import normal_on_context, qmc_normal, _seed_from_rng
+from .transverse_generators import generate_2D_gaussian_tail
 
 from .longitudinal import generate_longitudinal_coordinates, _characterize_line
 from .build_particles import build_particles
@@ -13,6 +16,28 @@ from .build_particles import build_particles
 # To get the right Particles class depending on pyheatail interface state
 import xpart as xp
 
+def _pad_filling_scheme(filling_scheme, circumference, bunch_spacing):
+    # Fill the ring with empty slots
+    assert filling_scheme is not None
+    assert len(filling_scheme) <= np.floor(circumference/bunch_spacing+0.5)
+
+    if len(filling_scheme) < np.floor(circumference/bunch_spacing+0.5):
+        filling_scheme = np.concatenate(
+            (filling_scheme,
+            np.zeros(int(np.floor(circumference/bunch_spacing+0.5) - len(filling_scheme)),
+                    dtype=np.int64)))
+    return filling_scheme
+
+
+def _shared_twiss(line, particle_ref, particle_on_co=None, **kwargs):
+    # Single twiss used both for the longitudinal matching (slip factor,
+    # momentum compaction, bets0) and by build_particles (W matrix, closed
+    # orbit), with the arguments used by build_particles
+    with profiling.stage('twiss'):
+        return line.twiss(particle_on_co=particle_on_co,
+                          particle_ref=particle_ref, **kwargs)
+
+@profiling.timed('generate_matched_gaussian_bunch')
 def generate_matched_gaussian_bunch(num_particles,
                                     nemitt_x, nemitt_y, sigma_z,
                                     total_intensity_particles=None,
@@ -29,6 +54,10 @@ def generate_matched_gaussian_bunch(num_particles,
                                     particle_ref=None,
                                     engine=None,
                                     return_matcher=False,
+                                    sampling='pseudo',
+                                    tail_sampling=None,
+                                    twiss=None,
+                                    rng=None,
                                     _context=None, _buffer=None, _offset=None,
                                     **kwargs,  # Passed to build_particles
                                     ):
@@ -49,6 +78,25 @@ def generate_matched_gaussian_bunch(num_particles,
         RMS bunch length in meters.
     total_intensity_particles : float
         Total intensity of the bunch in particles.
+    sampling : str
+        Sampling mode. Can be 'pseudo' (pseudo-random numbers), 'sobol' or
+        'halton' (scrambled low-discrepancy sequences).
+    tail_sampling : dict, optional
+        Importance sampling of the transverse tails. Maps the plane ('x'
+        and/or 'y') to the arguments of `generate_2D_gaussian_tail` (e.g.
+        {'x': {'mode': 'uniform_action', 'n_sigma_min': 5,
+        'n_sigma_max': 7}}). The normalized coordinates of these planes are
+        generated from the biased distribution and the likelihood ratios
+        are included in the particle weights, which then add up to the
+        intensity of the corresponding part of the Gaussian bunch.
+    twiss : xtrack.TwissTable, optional
+        Precomputed twiss of the line. If not provided, the twiss is computed
+        once and shared between the longitudinal matching and the
+        generation of the transverse coordinates.
+    rng : np.random.Generator, optional
+        Random number generator used for all the coordinates (as scrambling
+        seed for the quasi-random sampling), for reproducible bunches. If
+        not provided, the global numpy generator is used.
 
     Returns
     -------
@@ -84,6 +132,11 @@ def generate_matched_gaussian_bunch(num_particles,
             raise ValueError(
                 "`line`, `particle_ref` or `particle_on_co` must be provided!")
 
+    if (twiss is None and line is not None and R_matrix is None
+            and kwargs.get('W_matrix') is None):
+        twiss = _shared_twiss(line, particle_ref=particle_ref,
+                              particle_on_co=particle_on_co, **kwargs)
+
     zeta, delta, matcher = generate_longitudinal_coordinates(
         distribution='gaussian',
         num_particles=num_particles,
@@ -99,14 +152,45 @@ def generate_matched_gaussian_bunch(num_particles,
         sigma_z=sigma_z,
         engine=engine,
         return_matcher=True,
+        sampling=sampling,
+        twiss=twiss,
+        rng=rng,
         **kwargs)
 
     assert len(zeta) == len(delta) == num_particles
 
-    x_norm = np.random.normal(size=num_particles)
-    px_norm = np.random.normal(size=num_particles)
-    y_norm = np.random.normal(size=num_particles)
-    py_norm = np.random.normal(size=num_particles)
+    if _context is None and _buffer is None and line is not None:
+        _context = line._buffer.context
+    target_context = _context if _context is not None else (
+                            _buffer.context if _buffer is not None else None)
+
+    with profiling.stage('transverse_sampling'):
+        if sampling == 'pseudo' and rng is None:
+            # Drawn directly on the target context (e.g. on the GPU)
+            x_norm = normal_on_context(num_particles, target_context)
+            px_norm = normal_on_context(num_particles, target_context)
+            y_norm = normal_on_context(num_particles, target_context)
+            py_norm = normal_on_context(num_particles, target_context)
+        elif sampling == 'pseudo':
+            x_norm, px_norm, y_norm, py_norm = rng.normal(
+                                                size=(4, num_particles))
+        else:
+            x_norm, px_norm, y_norm, py_norm = qmc_normal(
+                                num_particles, 4, sampling=sampling,
+                                seed=_seed_from_rng(rng)).T
+        likelihood_ratio = 1.
+        for plane, tail_kwargs in (tail_sampling or {}).items():
+            if plane not in ('x', 'y'):
+                raise ValueError(f'Invalid plane `{plane}` for tail sampling')
+            uu_norm, puu_norm, ratio = generate_2D_gaussian_tail(
+                        num_particles, sampling=sampling, rng=rng,
+                        **tail_kwargs)
+            if plane == 'x':
+                x_norm, px_norm = uu_norm, puu_norm
+            else:
+                y_norm, py_norm = uu_norm, puu_norm
+            likelihood_ratio = likelihood_ratio * ratio
+        profiling.record_arrays(x_norm, px_norm, y_norm, py_norm)
 
     if total_intensity_particles is None:
         # go to particles.weight = 1
@@ -122,7 +206,9 @@ def generate_matched_gaussian_bunch(num_particles,
                       x_norm=x_norm, px_norm=px_norm,
                       y_norm=y_norm, py_norm=py_norm,
                       nemitt_x=nemitt_x, nemitt_y=nemitt_y,
-                      weight=total_intensity_particles/num_particles,
+                      weight=(total_intensity_particles/num_particles
+                              * likelihood_ratio),
+                      twiss=twiss,
                       **kwargs)
     if return_matcher:
         return part, matcher
@@ -160,6 +246,7 @@ def split_scheme(filling_scheme, n_chunk=1):
     return bunches_per_rank
 
 
+@profiling.timed('generate_matched_gaussian_multibunch_beam')
 def generate_matched_gaussian_multibunch_beam(filling_scheme,
                                               bunch_num_particles,
                                               nemitt_x, nemitt_y, sigma_z,
@@ -182,12 +269,21 @@ def generate_matched_gaussian_multibunch_beam(filling_scheme,
                                               bunch_spacing_buckets=1,
                                               prepare_line_and_particles_for_mpi_wake_sim=False,
                                               communicator=None,
+                                              twiss=None,
                                               **kwargs,  # Passed to build_particles
                                               ):
 
     if particle_ref is None and line is not None:
         particle_ref = line.particle_ref
 
+    if (twiss is None and line is not None and R_matrix is None
+            and kwargs.get('W_matrix') is None):
+        # Shared by the bucket characterization and the bunch generation
+        twiss = _shared_twiss(line, particle_ref=(
+                                particle_on_co if particle_on_co is not None
+                                else particle_ref),
+                              particle_on_co=particle_on_co, **kwargs)
+
     assert ((line is not None and particle_ref is not None) or
             (rf_harmonic is not None and rf_voltage is not None) or
             bucket_length is not None)
@@ -203,20 +299,14 @@ def generate_matched_gaussian_multibunch_beam(filling_scheme,
         if rf_harmonic is not None and rf_voltage is not None:
             main_harmonic_number = rf_harmonic[np.argmax(rf_voltage)]
         else:
-            dct_line = _characterize_line(line, particle_ref)
+            dct_line = _characterize_line(line, particle_ref, twiss=twiss)
             assert len(dct_line['voltage_list']) > 0
             main_harmonic_number = int(np.floor(
                         dct_line['h_list'][np.argmax(dct_line['voltage_list'])]+0.5))
         bucket_length = circumference/main_harmonic_number
     bunch_spacing = bunch_spacing_buckets * bucket_length
-    assert filling_scheme is not None
-    assert len(filling_scheme) <= np.floor(circumference/bunch_spacing+0.5)
-
-    if len(filling_scheme) < np.floor(circumference/bunch_spacing+0.5):
-        filling_scheme = np.concatenate(
-            (filling_scheme,
-            np.zeros(int(np.floor(circumference/bunch_spacing+0.5) - len(filling_scheme)),
-                    dtype=np.int64)))
+    filling_scheme = _pad_filling_scheme(filling_scheme, circumference,
+                                         bunch_spacing)
 
     if prepare_line_and_particles_for_mpi_wake_sim and bunch_selection is None:
         if communicator is None:
@@ -249,6 +339,7 @@ def generate_matched_gaussian_multibunch_beam(filling_scheme,
         line=line,
         particle_ref=particle_ref,
         engine=engine,
+        twiss=twiss,
         _context=_context, _buffer=_buffer, _offset=_offset,
         **kwargs,  # They are passed to build_particles
     )
@@ -270,3 +361,71 @@ def generate_matched_gaussian_multibunch_beam(filling_scheme,
             communicator=communicator)
 
     return macro_bunch
+
+
+def get_bucket_train(filling_scheme,
+                     bunch_spacing_buckets=1,
+                     line=None,
+                     particle_ref=None,
+                     circumference=None,
+                     momentum_compaction_factor=None,
+                     rf_harmonic=None,
+                     rf_voltage=None,
+                     rf_phase=None,
+                     energy_ref_increment=None,
+                     margin=0, n_points=10001,
+                     **kwargs, # passed to twiss
+                     ):
+    '''
+    Build the RF bucket geometry of a bunch train with the same filling
+    scheme conventions as `generate_matched_gaussian_multibunch_beam`.
+
+    Parameters
+    ----------
+    filling_scheme : array_like
+        Filling scheme (non-zero for the filled slots).
+    bunch_spacing_buckets : int
+        Number of RF buckets between two slots of the filling scheme.
+    line : xtrack.Line, optional
+        Line from which the RF parameters are obtained (alternatively,
+        particle_ref and the RF parameters can be provided).
+    particle_ref : xtrack.Particles, optional
+        Reference particle.
+    circumference : float, optional
+        Machine circumference in m.
+    momentum_compaction_factor : float, optional
+        Momentum compaction factor.
+    rf_harmonic : array_like, optional
+        Harmonic numbers of the RF systems.
+    rf_voltage : array_like, optional
+        RF voltages in V.
+    rf_phase : array_like, optional
+        RF phases in rad.
+    energy_ref_increment : float, optional
+        Energy gain of the reference particle per turn in eV.
+    margin : float
+        Classify with respect to the equihamiltonian margin * h_sfp instead
+        of the separatrix.
+    n_points : int
+        Number of points of the separatrix table.
+
+    Returns
+    -------
+    bucket_train : BucketTrain
+        Bucket geometry, see `xpart.longitudinal.BucketTrain`.
+    '''
+    from .longitudinal import BucketTrain, get_bucket
+
+    if particle_ref is None and line is not None:
+        particle_ref = line.particle_ref
+
+    rfbucket = get_bucket(line=line, particle_ref=particle_ref,
+                          circumference=circumference,
+                          momentum_compaction_factor=momentum_compaction_factor,
+                          rf_harmonic=rf_harmonic, rf_voltage=rf_voltage,
+                          rf_phase=rf_phase,
+                          energy_ref_increment=energy_ref_increment,
+                          **kwargs)
+    return BucketTrain(filling_scheme, rfbucket,
+                       bunch_spacing_buckets=bunch_spacing_buckets,
+                       margin=margin, n_points=n_points)
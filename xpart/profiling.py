@@ -0,0 +1,229 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+'''
+Opt-in timing instrumentation of the particle generation pipelines.
+
+The stages of the generation (twiss, line characterization, RF bucket
+construction, matching, sampling, allocation of the particles, ...) are
+wrapped in `stage` blocks. When profiling is disabled (default) a stage
+costs one attribute lookup. When enabled, nested wall-clock timings, call
+counts and the peak size of the arrays produced in each stage are recorded.
+
+Usage::
+
+    import xpart as xp
+
+    with xp.profiling.profile() as prof:
+        particles = xp.generate_matched_gaussian_bunch(...)
+    print(prof.to_json())
+
+or, to accumulate over a whole job::
+
+    xp.profiling.enable()
+    ...
+    report = xp.profiling.get_report()
+'''
+
+import functools
+import json
+import time
+from contextlib import contextmanager
+
+
+class _Stage:
+
+    __slots__ = ('calls', 'time', 'peak_array_size', 'peak_array_bytes',
+                 'children')
+
+    def __init__(self):
+        self.calls = 0
+        self.time = 0.
+        self.peak_array_size = 0
+        self.peak_array_bytes = 0
+        self.children = {}
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'time': self.time,
+            'self_time': self.time - sum(cc.time
+                                         for cc in self.children.values()),
+            'peak_array_size': self.peak_array_size,
+            'peak_array_bytes': self.peak_array_bytes,
+            'stages': {nn: cc.to_dict() for nn, cc in self.children.items()},
+        }
+
+
+class Profile:
+
+    '''
+    Collection of nested stage timings. Returned by `profile()`.
+    '''
+
+    def __init__(self):
+        self._root = _Stage()
+        self._stack = [self._root]
+
+    def get_report(self):
+        '''
+        Return the recorded timings as a nested dictionary. For each stage
+        the dictionary contains the number of calls, the total and self time
+        in seconds, the peak size (elements and bytes) of the recorded
+        arrays and the nested stages.
+        '''
+        return {'stages': {nn: cc.to_dict()
+                           for nn, cc in self._root.children.items()}}
+
+    def to_json(self, **kwargs):
+        '''
+        Return the report as a JSON string (kwargs are passed to json.dumps).
+        '''
+        return json.dumps(self.get_report(), **kwargs)
+
+
+class _State:
+    enabled = False
+    current = Profile()
+
+
+_state = _State()
+
+
+class _NullStage:
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _StageTimer:
+
+    __slots__ = ('name', 'profile', 'node', 't0')
+
+    def __init__(self, name, profile):
+        self.name = name
+        self.profile = profile
+
+    def __enter__(self):
+        stack = self.profile._stack
+        children = stack[-1].children
+        node = children.get(self.name)
+        if node is None:
+            node = children[self.name] = _Stage()
+        node.calls += 1
+        stack.append(node)
+        self.node = node
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.node.time += time.perf_counter() - self.t0
+        self.profile._stack.pop()
+        return False
+
+
+def stage(name):
+    '''
+    Context manager timing the enclosed block as stage `name`, nested in the
+    currently active stage.
+    '''
+    if not _state.enabled:
+        return _NULL_STAGE
+    return _StageTimer(name, _state.current)
+
+
+def timed(name):
+    '''
+    Decorator timing each call of the decorated function as stage `name`.
+    '''
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state.enabled:
+                return func(*args, **kwargs)
+            with _StageTimer(name, _state.current):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_arrays(*arrays):
+    '''
+    Record the size of the given arrays in the currently active stage.
+    '''
+    if not _state.enabled:
+        return
+    node = _state.current._stack[-1]
+    for aa in arrays:
+        size = getattr(aa, 'size', None)
+        if size is None:
+            continue
+        node.peak_array_size = max(node.peak_array_size, int(size))
+        node.peak_array_bytes = max(node.peak_array_bytes,
+                                    int(getattr(aa, 'nbytes', 0)))
+
+
+def enable():
+    '''
+    Enable the recording of the stage timings in the global profile.
+    '''
+    _state.enabled = True
+
+
+def disable():
+    '''
+    Disable the recording of the stage timings.
+    '''
+    _state.enabled = False
+
+
+def is_enabled():
+    return _state.enabled
+
+
+def reset():
+    '''
+    Discard all the timings recorded in the active profile.
+    '''
+    _state.current = Profile()
+
+
+def get_report():
+    '''
+    Return the timings recorded in the active profile as a nested
+    dictionary (see `Profile.get_report`).
+    '''
+    return _state.current.get_report()
+
+
+def to_json(**kwargs):
+    '''
+    Return the timings recorded in the active profile as a JSON string.
+    '''
+    return _state.current.to_json(**kwargs)
+
+
+@contextmanager
+def profile():
+    '''
+    Context manager recording the stage timings of the enclosed block in a
+    new `Profile`, which is returned. The previous profiling state is
+    restored on exit.
+    '''
+    prof = Profile()
+    previous_enabled, previous_current = _state.enabled, _state.current
+    _state.enabled, _state.current = True, prof
+    try:
+        yield prof
+    finally:
+        _state.enabled, _state.current = previous_enabled, previous_current
@@ -0,0 +1,189 @@
+# copyright ############################### #
+# This file is part of the Xpart Package.   #
+# Copyright (c) CERN, 2025.                 #
+# ######################################### #
+
+import warnings
+
+import numpy as np
+
+SAMPLING_MODES = ('pseudo', 'sobol', 'halton')
+
+
+def _check_sampling(sampling):
+    if sampling not in SAMPLING_MODES:
+        raise ValueError(f'Invalid sampling mode `{sampling}`. '
+                         f'Possible values are {SAMPLING_MODES}.')
+
+
+def _seed_from_rng(rng):
+    # np.random (the module) cannot be used as a seed by scipy.stats.qmc
+    if rng is None or rng is np.random:
+        return None
+    return rng
+
+
+def _qmc_engine(dim, sampling, seed=None):
+    from scipy.stats import qmc
+
+    if sampling == 'sobol':
+        return qmc.Sobol(d=dim, scramble=True, seed=seed)
+    elif sampling == 'halton':
+        return qmc.Halton(d=dim, scramble=True, seed=seed)
+    else:
+        raise ValueError(f'Invalid quasi-random sampling mode `{sampling}`. '
+                         f'Possible values are `sobol` and `halton`.')
+
+
+def _qmc_draw(engine, num_particles):
+    with warnings.catch_warnings():
+        # Sobol sequences warn when num_particles is not a power of two,
+        # the truncated sequence is still a valid (scrambled) sample
+        warnings.simplefilter('ignore', UserWarning)
+        uu = engine.random(int(num_particles))
+
+    # Keep away from the boundaries to allow inverse-CDF transforms
+    eps = np.finfo(np.float64).eps
+    return np.clip(uu, eps, 1 - eps)
+
+
+def qmc_uniform(num_particles, dim, sampling='sobol', seed=None):
+
+    '''
+    Generate points of a scrambled low-discrepancy sequence, uniformly
+    distributed in the unit hypercube.
+
+    Parameters
+    ----------
+    num_particles : int
+        Number of points to be generated.
+    dim : int
+        Dimension of the hypercube.
+    sampling : str
+        Low-discrepancy sequence to be used. Can be 'sobol' or 'halton'.
+    seed : int or np.random.Generator, optional
+        Seed or generator used for the scrambling.
+
+    Returns
+    -------
+    uu : np.ndarray
+        Array of shape (num_particles, dim) with values in (0, 1).
+    '''
+
+    engine = _qmc_engine(dim, sampling=sampling, seed=seed)
+    return _qmc_draw(engine, num_particles)
+
+
+def qmc_normal(num_particles, dim, sampling='sobol', seed=None):
+
+    '''
+    Generate standard normal samples from a scrambled low-discrepancy
+    sequence using the inverse CDF of the normal distribution.
+
+    Parameters
+    ----------
+    num_particles : int
+        Number of points to be generated.
+    dim : int
+        Number of independent normal coordinates.
+    sampling : str
+        Low-discrepancy sequence to be used. Can be 'sobol' or 'halton'.
+    seed : int or np.random.Generator, optional
+        Seed or generator used for the scrambling.
+
+    Returns
+    -------
+    xx : np.ndarray
+        Array of shape (num_particles, dim).
+    '''
+
+    from scipy.special import ndtri
+
+    return ndtri(qmc_uniform(num_particles, dim, sampling=sampling, seed=seed))
+
+
+def normal_on_context(num_particles, _context=None):
+    '''
+    Generate standard normal samples directly on the given context.
+
+    On GPU contexts providing a random module (cupy) the numbers are drawn
+    on the device, avoiding the generation on the host and the transfer.
+    Otherwise they are drawn with `np.random` (the global numpy generator,
+    as for the cpu generation) and moved to the context.
+
+    Parameters
+    ----------
+    num_particles : int
+        Number of samples to be generated.
+    _context : xobjects context, optional
+        Context on which the samples are generated (CPU by default).
+
+    Returns
+    -------
+    xx : array
+        Array of length num_particles on the context.
+    '''
+
+    import xobjects as xo
+
+    if _context is None or isinstance(_context, xo.ContextCpu):
+        return np.random.normal(size=num_particles)
+
+    random = getattr(_context.nplike_lib, 'random', None)
+    if random is not None and hasattr(random, 'standard_normal'):
+        return random.standard_normal(num_particles, dtype=np.float64)
+
+    return _context.nparray_to_context_array(
+                                    np.random.normal(size=num_particles))
+
+
+def check_weights(weights, expected_mean=1., n_sigma=5.):
+    '''
+    Check the normalisation of importance sampling weights (likelihood
+    ratios), e.g. from `generate_2D_gaussian_tail`.
+
+    Parameters
+    ----------
+    weights : array_like
+        Weights of the particles.
+    expected_mean : float
+        Expected mean of the weights: 1 if the biased distribution covers
+        the whole target distribution, or the probability of the sampled
+        region (e.g. `gaussian_tail_probability`).
+    n_sigma : float
+        Tolerance on the mean in units of its standard error.
+
+    Returns
+    -------
+    stats : dict
+        Mean of the weights (`mean`), its standard error (`std_error`) and
+        the effective sample size (`effective_sample_size`), i.e. the
+        number of unweighted particles giving the same statistical
+        accuracy.
+
+    Raises
+    ------
+    ValueError
+        If some weights are negative or not finite, or if the mean of the
+        weights is not compatible with `expected_mean`.
+    '''
+
+    weights = np.asarray(weights, dtype=np.float64)
+    if not np.all(np.isfinite(weights)) or np.any(weights < 0):
+        raise ValueError('Weights must be finite and non-negative')
+
+    num_particles = len(weights)
+    mean = np.mean(weights)
+    std_error = np.std(weights) / np.sqrt(num_particles)
+    sum_weights = np.sum(weights)
+    effective_sample_size = (sum_weights**2 / np.sum(weights**2)
+                             if sum_weights > 0 else 0.)
+
+    tolerance = n_sigma * std_error + 1e-12 * abs(expected_mean)
+    if abs(mean - expected_mean) > tolerance:
+        raise ValueError(
+            f'Weights are not normalised: mean = {mean:.6g} +- '
+            f'{std_error:.2g}, expected {expected_mean:.6g}')
+
+    return dict(mean=mean, std_error=std_error,
+                effective_sample_size=effective_sample_size)
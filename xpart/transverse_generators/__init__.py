@@ -3,9 +3,12 @@
 # Copyright (c) CERN, 2021.                 #
 # ######################################### #
 
-from .polar import generate_2D_polar_grid
+from .polar import generate_2D_polar_grid, generate_2D_polar_grid_tiles
 from .polar import generate_2D_uniform_circular_sector
-from .pencil import generate_2D_pencil, generate_2D_pencil_with_absolute_cut
-from .gaussian import generate_2D_gaussian
+from .pencil import (generate_2D_pencil, generate_2D_pencil_with_absolute_cut,
+                     generate_2D_pencils_with_absolute_cut)
+from .gaussian import (generate_2D_gaussian, generate_2D_gaussian_tail,
+                       gaussian_tail_probability)
 from .hypersphere import generate_hypersphere_2D, generate_hypersphere_4D, generate_hypersphere_6D
+from .hypersphere import hypersphere_gaussian_weights
 from .q_gaussian_round import generate_round_4D_q_gaussian_normalised
@@ -5,7 +5,9 @@
 
 import numpy as np
 
-def generate_2D_gaussian(num_particles):
+from ..sampling import _check_sampling, _seed_from_rng, qmc_normal, qmc_uniform
+
+def generate_2D_gaussian(num_particles, sampling='pseudo', rng=None):
 
     '''
     Generate a 2D Gaussian distribution.
@@ -14,6 +16,12 @@ def generate_2D_gaussian(num_particles):
     ----------
     num_particles : int
         Number of particles to be generated.
+    sampling : str
+        Sampling mode. Can be 'pseudo' (pseudo-random numbers), 'sobol' or
+        'halton' (scrambled low-discrepancy sequences).
+    rng : np.random.Generator, optional
+        Random number generator (used as scrambling seed for the
+        low-discrepancy sequences). If not provided, `np.random` is used.
 
     Returns
     -------
@@ -24,8 +32,131 @@ def generate_2D_gaussian(num_particles):
 
     '''
 
-    x_norm = np.random.normal(size=num_particles)
-    px_norm = np.random.normal(size=num_particles)
+    _check_sampling(sampling)
+
+    if sampling != 'pseudo':
+        xx = qmc_normal(num_particles, 2, sampling=sampling,
+                        seed=_seed_from_rng(rng))
+        return xx[:, 0], xx[:, 1]
+
+    if rng is None:
+        rng = np.random
+
+    x_norm = rng.normal(size=num_particles)
+    px_norm = rng.normal(size=num_particles)
 
     return x_norm, px_norm
 
+
+def gaussian_tail_probability(n_sigma_min, n_sigma_max=None):
+
+    '''
+    Probability for a particle of a 2D Gaussian distribution to have an
+    amplitude between n_sigma_min and n_sigma_max (in units of sigma).
+    This is the expected mean weight of the particles generated by
+    `generate_2D_gaussian_tail` with the same limits.
+
+    Parameters
+    ----------
+    n_sigma_min : float
+        Minimum amplitude in sigma.
+    n_sigma_max : float, optional
+        Maximum amplitude in sigma (no limit if not provided).
+
+    Returns
+    -------
+    probability : float
+        Probability of the amplitude range.
+
+    '''
+
+    J_min = 0.5 * n_sigma_min**2
+    J_max = np.inf if n_sigma_max is None else 0.5 * n_sigma_max**2
+    return np.exp(-J_min) - np.exp(-J_max)
+
+
+def generate_2D_gaussian_tail(num_particles, mode='uniform_action',
+                              n_sigma_min=0., n_sigma_max=None, scale=2.,
+                              sampling='pseudo', rng=None):
+
+    '''
+    Generate a 2D distribution oversampling the tails of a 2D Gaussian
+    distribution, together with the likelihood ratio of each particle with
+    respect to the Gaussian distribution. Using the likelihood ratios as
+    particle weights, weighted sums over the particles (e.g. loss rates)
+    are unbiased estimates of the corresponding quantities for the Gaussian
+    distribution restricted to amplitudes between n_sigma_min and
+    n_sigma_max.
+
+    Parameters
+    ----------
+    num_particles : int
+        Number of particles to be generated.
+    mode : str
+        Biased distribution. With 'uniform_action' the action
+        J = (x1^2 + x2^2)/2 is uniformly distributed between
+        n_sigma_min^2/2 and n_sigma_max^2/2. With 'tilted' the particles
+        are generated from a Gaussian distribution with an RMS `scale`
+        times larger, restricted to the same amplitude range.
+    n_sigma_min : float
+        Minimum amplitude in sigma.
+    n_sigma_max : float, optional
+        Maximum amplitude in sigma. Needed for mode 'uniform_action'.
+    scale : float
+        Ratio between the RMS of the biased and of the target distribution
+        for mode 'tilted' (larger than 1 to oversample the tails).
+    sampling : str
+        Sampling mode. Can be 'pseudo' (pseudo-random numbers), 'sobol' or
+        'halton' (scrambled low-discrepancy sequences).
+    rng : np.random.Generator, optional
+        Random number generator (used as scrambling seed for the
+        low-discrepancy sequences). If not provided, `np.random` is used.
+
+    Returns
+    -------
+    x1 : np.ndarray
+        First normalized coordinate.
+    x2 : np.ndarray
+        Second normalized coordinate.
+    weight : np.ndarray
+        Likelihood ratio of each particle. Its mean is
+        `gaussian_tail_probability(n_sigma_min, n_sigma_max)`.
+
+    '''
+
+    _check_sampling(sampling)
+
+    J_min = 0.5 * n_sigma_min**2
+    J_max = np.inf if n_sigma_max is None else 0.5 * n_sigma_max**2
+    if not J_max > J_min:
+        raise ValueError('`n_sigma_max` must be larger than `n_sigma_min`')
+
+    if sampling == 'pseudo':
+        uu = (np.random if rng is None else rng).random(
+                                                    size=(num_particles, 2))
+    else:
+        uu = qmc_uniform(num_particles, 2, sampling=sampling,
+                         seed=_seed_from_rng(rng))
+
+    if mode == 'uniform_action':
+        if not np.isfinite(J_max):
+            raise ValueError('`n_sigma_max` must be provided for mode '
+                             '`uniform_action`')
+        J = J_min + uu[:, 0] * (J_max - J_min)
+        weight = np.exp(-J) * (J_max - J_min)
+    elif mode == 'tilted':
+        if scale < 1:
+            raise ValueError('`scale` must be larger than 1')
+        s2 = scale**2
+        # Probability of the amplitude range for the biased distribution
+        p_range = -np.expm1(-(J_max - J_min) / s2)
+        J = J_min - s2 * np.log1p(-uu[:, 0] * p_range)
+        weight = s2 * p_range * np.exp(-J + (J - J_min) / s2)
+    else:
+        raise ValueError(f'Invalid mode `{mode}`. Possible values are '
+                         '`uniform_action` and `tilted`.')
+
+    amplitude = np.sqrt(2 * J)
+    theta = 2 * np.pi * uu[:, 1]
+
+    return amplitude * np.cos(theta), -amplitude * np.sin(theta), weight
@@ -1,10 +1,12 @@
 
 import numpy as np
 
+from ..sampling import _check_sampling, qmc_uniform
 
 
 
-def generate_hypersphere(N, D, r=1, rng_seed = 0, surface=False ,unpack = False):
+def generate_hypersphere(N, D, r=1, rng_seed = 0, surface=False ,unpack = False,
+                         sampling='pseudo'):
     '''
     Generate points uniformly distributed inside or on the surface of an N-dimensional hypersphere.
     Adapted from : https://baezortega.github.io/2018/10/14/hypersphere-sampling/
@@ -23,19 +25,36 @@ def generate_hypersphere(N, D, r=1, rng_seed = 0, surface=False ,unpack = False)
         If True, points will be generated on the surface. If False, points will be generated inside the hypersphere.
     unpack : bool
         If True, returns individual arrays for each dimension. If False, returns a single array with shape (N, D).
+    sampling : str
+        Sampling mode. Can be 'pseudo' (pseudo-random numbers), 'sobol' or 'halton'
+        (scrambled low-discrepancy sequences, with rng_seed used for the scrambling).
 
     Returns
     -------
     samples : np.ndarray or tuple of np.ndarray
         Generated points. Shape is (N, D) if unpack is False, otherwise D arrays of shape (N,).
     '''
+    _check_sampling(sampling)
+
     # Set the random seed for reproducibility
     rng = np.random.default_rng(int(rng_seed))
 
-    # Sample D vectors of N Gaussian coordinates
     N = int(N)
     D = int(D)
-    samples = rng.standard_normal(size = (N, D))
+
+    if sampling == 'pseudo':
+        # Sample D vectors of N Gaussian coordinates
+        samples = rng.standard_normal(size = (N, D))
+        if not surface:
+            uu_radii = np.random.uniform(low=0.0, high=1.0, size=(N, 1))
+    else:
+        # One extra dimension of the sequence is used for the radii
+        from scipy.special import ndtri
+        uu = qmc_uniform(N, D + (0 if surface else 1), sampling=sampling,
+                         seed=rng)
+        samples = ndtri(uu[:, :D])
+        if not surface:
+            uu_radii = uu[:, D:]
 
     # Normalise all distances (radii) to 1
     radii = np.sqrt(np.sum(samples ** 2, axis=1))[:,np.newaxis]
@@ -43,7 +62,7 @@ def generate_hypersphere(N, D, r=1, rng_seed = 0, surface=False ,unpack = False)
 
     # Sample N radii with exponential distribution (unless points are to be on the surface)
     if not surface:
-        new_radii = np.random.uniform(low=0.0, high=1.0, size=(N, 1)) ** (1 / D)
+        new_radii = uu_radii ** (1 / D)
         samples = samples * new_radii
 
     # Scale the samples to the desired radius
@@ -59,7 +78,7 @@ def generate_hypersphere(N, D, r=1, rng_seed = 0, surface=False ,unpack = False)
         return samples.T
 
 
-def generate_hypersphere_2D(num_particles,r = 1, rng_seed = 0):
+def generate_hypersphere_2D(num_particles,r = 1, rng_seed = 0, sampling='pseudo'):
     '''
     Generate points uniformly distributed inside a 2-dimensional hypersphere (circle).
 
@@ -71,6 +90,8 @@ def generate_hypersphere_2D(num_particles,r = 1, rng_seed = 0):
         Radius of the circle.
     rng_seed : int
         Seed for the random number generator for reproducibility.
+    sampling : str
+        Sampling mode. Can be 'pseudo', 'sobol' or 'halton'.
 
     Returns
     -------
@@ -79,12 +100,13 @@ def generate_hypersphere_2D(num_particles,r = 1, rng_seed = 0):
     px_norm : np.ndarray
         y-coordinates of the generated points.
     '''
-    x_norm , px_norm  = generate_hypersphere(num_particles,D=2,r=r, rng_seed=rng_seed, surface = False,unpack=True)
+    x_norm , px_norm  = generate_hypersphere(num_particles,D=2,r=r, rng_seed=rng_seed, surface = False,unpack=True,
+                                sampling=sampling)
 
     return x_norm, px_norm
 
 
-def generate_hypersphere_4D(num_particles,rx =1,ry =1, rng_seed = 0):
+def generate_hypersphere_4D(num_particles,rx =1,ry =1, rng_seed = 0, sampling='pseudo'):
     '''
     Generate points uniformly distributed inside a 4-dimensional hypersphere with anisotropic scaling.
 
@@ -98,6 +120,8 @@ def generate_hypersphere_4D(num_particles,rx =1,ry =1, rng_seed = 0):
         Scaling factor for the y and py dimensions.
     rng_seed : int
         Seed for the random number generator for reproducibility.
+    sampling : str
+        Sampling mode. Can be 'pseudo', 'sobol' or 'halton'.
 
     Returns
     -------
@@ -105,12 +129,13 @@ def generate_hypersphere_4D(num_particles,rx =1,ry =1, rng_seed = 0):
         Coordinates of the generated points in the 4-dimensional space.
     '''
 
-    x_norm , px_norm , y_norm, py_norm = generate_hypersphere(num_particles,D=4,r=[rx,rx,ry,ry], rng_seed=rng_seed, surface = False,unpack=True)
+    x_norm , px_norm , y_norm, py_norm = generate_hypersphere(num_particles,D=4,r=[rx,rx,ry,ry], rng_seed=rng_seed, surface = False,unpack=True,
+                                sampling=sampling)
 
     return x_norm , px_norm , y_norm, py_norm
 
 
-def generate_hypersphere_6D(num_particles,rx =1,ry =1, rzeta=1, rng_seed = 0):
+def generate_hypersphere_6D(num_particles,rx =1,ry =1, rzeta=1, rng_seed = 0, sampling='pseudo'):
     '''
     Generate points uniformly distributed inside a 6-dimensional hypersphere with anisotropic scaling.
 
@@ -122,6 +147,8 @@ def generate_hypersphere_6D(num_particles,rx =1,ry =1, rzeta=1, rng_seed = 0):
         Scaling factors for the x, px, y, py, zeta, and pzeta dimensions respectively.
     rng_seed : int
         Seed for the random number generator for reproducibility.
+    sampling : str
+        Sampling mode. Can be 'pseudo', 'sobol' or 'halton'.
 
     Returns
     -------
@@ -129,6 +156,44 @@ def generate_hypersphere_6D(num_particles,rx =1,ry =1, rzeta=1, rng_seed = 0):
         Coordinates of the generated points in the 6-dimensional space.
     '''
 
-    x_norm , px_norm , y_norm, py_norm, zeta_norm, pzeta_norm = generate_hypersphere(num_particles,D=6,r=[rx,rx,ry,ry,rzeta,rzeta], rng_seed=rng_seed, surface = False,unpack=True)
+    x_norm , px_norm , y_norm, py_norm, zeta_norm, pzeta_norm = generate_hypersphere(num_particles,D=6,r=[rx,rx,ry,ry,rzeta,rzeta], rng_seed=rng_seed, surface = False,unpack=True,
+                                sampling=sampling)
+
+    return x_norm , px_norm , y_norm, py_norm, zeta_norm, pzeta_norm
 
-    return x_norm , px_norm , y_norm, py_norm, zeta_norm, pzeta_norm
\ No newline at end of file
+def hypersphere_gaussian_weights(coordinates, r=1):
+    '''
+    Likelihood ratio, with respect to a Gaussian distribution with unit RMS
+    in each coordinate, of points generated uniformly inside a hypersphere
+    by the functions of this module. Used as particle weights, weighted
+    sums over the particles are unbiased estimates of the corresponding
+    quantities for the Gaussian distribution restricted to the
+    hypersphere. The mean weight is the Gaussian probability of the
+    hypersphere.
+
+    Parameters
+    ----------
+    coordinates : np.ndarray or tuple of np.ndarray
+        Generated points, either as an array of shape (N, D) or as D arrays
+        of shape (N,) (as returned with unpack=True).
+    r : float or list
+        Radius of the hypersphere, as given to `generate_hypersphere` (e.g.
+        [rx, rx, ry, ry] for `generate_hypersphere_4D`).
+
+    Returns
+    -------
+    weight : np.ndarray
+        Likelihood ratio of each point.
+    '''
+    from scipy.special import gammaln
+
+    if isinstance(coordinates, (tuple, list)):
+        coordinates = np.stack(coordinates, axis=1)
+    D = coordinates.shape[1]
+    r = np.broadcast_to(np.asarray(r, dtype=float), (D,))
+
+    # log of the volume of the (scaled) hypersphere
+    log_volume = (0.5 * D * np.log(np.pi) - gammaln(0.5 * D + 1)
+                  + np.sum(np.log(r)))
+    return np.exp(log_volume - 0.5 * D * np.log(2 * np.pi)
+                  - 0.5 * np.sum(coordinates**2, axis=1))
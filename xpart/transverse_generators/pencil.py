@@ -4,17 +4,45 @@
 # ######################################### #
 
 import numpy as np
-from .polar import generate_2D_uniform_circular_sector
-from ..general import _print
 
 import xpart as xp
+from ..build_particles import (_check_drift_to_match_at_s,
+                               _drift_particles, _propagate_through_drift)
+
+def _invert_circular_segment_area(area_fraction, phi_max):
+    """
+    Solve 2*phi - sin(2*phi) = area_fraction * (2*phi_max - sin(2*phi_max))
+    for phi in [0, phi_max], with phi_max <= pi/2 (vectorized Newton).
+    """
+    target = area_fraction * (2 * phi_max - np.sin(2 * phi_max))
+
+    # 2*phi - sin(2*phi) <= 4/3*phi^3, hence the cubic estimate is a lower
+    # bound and the Newton iterations on the convex function converge
+    # monotonically from above after the first step
+    phi = np.minimum(np.cbrt(0.75 * target), phi_max)
+    for _ in range(50):
+        gg = 2 * phi - np.sin(2 * phi) - target
+        dgg = 4 * np.sin(phi)**2
+        step = np.divide(gg, dgg, out=np.zeros_like(phi), where=dgg > 0)
+        phi = np.clip(phi - step, 0, phi_max)
+        if np.all(np.abs(step) <= 1e-15 * phi_max):
+            break
+
+    return phi
+
 
 def generate_2D_pencil(num_particles, pos_cut_sigmas, dr_sigmas,
-                       side='+'):
+                       side='+', rng=None):
 
     '''
     Generate a 2D pencil beam distribution.
 
+    The particles are uniformly distributed in the circular segment of radius
+    `pos_cut_sigmas + dr_sigmas` beyond the cut. The segment is sampled
+    directly (inverse CDF in the position, followed by a conditional uniform
+    distribution in the momentum), hence exactly `num_particles` particles
+    are generated without rejection.
+
     Parameters
     ----------
     num_particles : int
@@ -25,6 +53,8 @@ def generate_2D_pencil(num_particles, pos_cut_sigmas, dr_sigmas,
         Radius of the pencil beam in sigmas.
     side : str
         Side of the pencil beam. Can be '+', '-' or '+-'.
+    rng : np.random.Generator, optional
+        Random number generator. If not provided, `np.random` is used.
 
     Returns
     -------
@@ -32,18 +62,27 @@ def generate_2D_pencil(num_particles, pos_cut_sigmas, dr_sigmas,
         First normalized coordinate.
     x2 : np.ndarray
         Second normalized coordinate.
+    r_points : np.ndarray
+        Radial coordinate.
+    theta_points : np.ndarray
+        Angular coordinate.
 
     '''
 
     assert side == '+' or side == '-' or side == '+-'
 
+    if rng is None:
+        rng = np.random
+
     if side == '+-':
         n_plus = int(num_particles/2)
         n_minus = num_particles - n_plus
         x_plus, px_plus, r_plus, theta_plus = generate_2D_pencil(n_plus,
-                                                 pos_cut_sigmas, dr_sigmas, side='+')
+                                                 pos_cut_sigmas, dr_sigmas, side='+',
+                                                 rng=rng)
         x_minus, px_minus, r_minus, theta_minus = generate_2D_pencil(n_minus,
-                                                 pos_cut_sigmas, dr_sigmas, side='-')
+                                                 pos_cut_sigmas, dr_sigmas, side='-',
+                                                 rng=rng)
         x_norm = np.concatenate([x_minus, x_plus])
         px_norm = np.concatenate([px_minus, px_plus])
         r_points = np.concatenate([r_minus, r_plus])
@@ -55,30 +94,18 @@ def generate_2D_pencil(num_particles, pos_cut_sigmas, dr_sigmas,
 
         r_min = np.abs(pos_cut_sigmas)
         r_max = r_min + dr_sigmas
-        theta_max = np.arccos(pos_cut_sigmas/(np.abs(pos_cut_sigmas) + dr_sigmas))
-        target_area = r_max**2/2*(2 * theta_max - np.sin(2 * theta_max))
-        generated_area = (r_max**2 - r_min**2) * theta_max
-
-        n_gen = int(num_particles*generated_area/target_area)
-
-        x_gen, px_gen, r_points, theta_points = generate_2D_uniform_circular_sector(
-                # Should avoid regen most of the times
-                num_particles=int(n_gen*1.5+100),
-                r_range=(r_min, r_max),
-                theta_range=(-theta_max, theta_max))
+        phi_max = np.arccos(r_min/r_max)
 
-        mask = x_gen > r_min
-        x_norm = x_gen[mask]
-        px_norm = px_gen[mask]
-        r_points = r_points[mask]
-        theta_points = theta_points[mask]
+        # The area of the segment beyond x = r_max*cos(phi) is
+        # r_max^2/2*(2*phi - sin(2*phi)), which gives the CDF in x
+        phi = _invert_circular_segment_area(
+                    rng.uniform(low=0, high=1., size=num_particles), phi_max)
+        x_norm = r_max * np.cos(phi)
+        px_norm = (r_max * np.sin(phi)
+                   * rng.uniform(low=-1., high=1., size=num_particles))
 
-        assert len(x_norm) > num_particles
-
-        x_norm = x_norm[:num_particles]
-        px_norm = px_norm[:num_particles]
-        r_points = r_points[:num_particles]
-        theta_points = theta_points[:num_particles]
+        r_points = np.sqrt(x_norm**2 + px_norm**2)
+        theta_points = np.arctan2(px_norm, x_norm)
 
         if side == '-':
             x_norm = -x_norm
@@ -108,6 +135,21 @@ def generate_2D_pencil_with_absolute_cut(num_particles,
         Radius of the pencil beam in sigmas.
     side : str
         Side of the pencil beam. Can be '+' or '-'.
+    nemitt_x : float
+        Normalized emittance in the horizontal plane (in m rad).
+    nemitt_y : float
+        Normalized emittance in the vertical plane (in m rad).
+    at_element : str or int
+        Element (name or index) at which the pencil is generated.
+    match_at_s : float, optional
+        Position at which the pencil is matched and cut. It must lie in the
+        drifts downstream of `at_element`: the optics is propagated through
+        the drift.
+    twiss : xtrack.TwissTable, optional
+        Twiss table of the line including `at_element` (e.g. the twiss of
+        the full line), as in `generate_2D_pencils_with_absolute_cut`. If
+        not provided it is computed as
+        `line.twiss(at_elements=[at_element], **kwargs)`.
 
     Returns
     -------
@@ -125,6 +167,7 @@ def generate_2D_pencil_with_absolute_cut(num_particles,
             'line and tracker cannot be provided at the same time.')
 
     if tracker is not None:
+        from ..general import _print
         _print('Warning! '
             "The argument tracker is deprecated. Please use line instead.")
         line = tracker.line
@@ -144,48 +187,45 @@ def generate_2D_pencil_with_absolute_cut(num_particles,
     if at_element is None:
         at_element = 0
 
-    if match_at_s is not None:
-        import xtrack as xt
-        drift_to_at_s = xt.Drift(_context=line._context,
-            length=match_at_s - line.get_s_position(at_element))
+    if isinstance(at_element, str):
+        i_ele = line._element_names_unique.index(at_element)
     else:
-        drift_to_at_s = None
+        i_ele = at_element
 
     if twiss is None:
-        twiss = line.twiss(at_s=match_at_s,
-            at_elements=([at_element] if match_at_s is None else None),
-            **kwargs)
+        twiss = line.twiss(at_elements=[at_element], **kwargs)
+    tw_init = twiss.get_twiss_init(
+        at_element=line._element_names_unique[i_ele])
+    WW = tw_init.W_matrix
+    particle_on_co = tw_init.particle_on_co
+    if match_at_s is not None:
+        # The optics is propagated analytically through the drift
+        # (no auxiliary tracker is needed)
+        _check_drift_to_match_at_s(line, i_ele, match_at_s)
+        WW, particle_on_co = _propagate_through_drift(WW, particle_on_co,
+            length=match_at_s - line.get_s_position(at_element),
+            exact=line.config.get('XTRACK_USE_EXACT_DRIFTS', False))
+
+    # Closed orbit at the location of the cut
+    w_co = (particle_on_co._xobject.x[0] if plane == 'x'
+            else particle_on_co._xobject.y[0])
 
     if side=='+':
-        assert twiss[plane][0] < absolute_cut, 'The cut is on the wrong side'
+        assert w_co < absolute_cut, 'The cut is on the wrong side'
     else:
-        assert twiss[plane][0] > absolute_cut, 'The cut is on the wrong side'
-
-    # Generate a particle exactly on the jaw with no amplitude in other eigenvectors
-    p_on_cut_at_element = line.build_particles(
-        nemitt_x=nemitt_x, nemitt_y=nemitt_y,
-        x={'x': absolute_cut, 'y': None}[plane],
-        y={'x': None, 'y': absolute_cut}[plane],
-        x_norm={'x': None, 'y': 0}[plane],
-        y_norm={'x': 0, 'y': None}[plane],
-        px_norm=0, py_norm=0,
-        zeta_norm=0, pzeta_norm=0,
-        at_element=at_element, match_at_s=match_at_s, **kwargs)
-    if drift_to_at_s is not None:
-        p_on_cut_at_s = p_on_cut_at_element.copy()
-        drift_to_at_s.track(p_on_cut_at_s)
+        assert w_co > absolute_cut, 'The cut is on the wrong side'
+
+    # Get cut in (accurate) sigmas: a particle on the jaw with no amplitude in
+    # the other eigenvectors has w = w_co + sqrt(gemitt) * W[i_w, i_w] * w_norm
+    i_w = {'x': 0, 'y': 2}[plane]
+    nemitt = {'x': nemitt_x, 'y': nemitt_y}[plane]
+    if nemitt is None:
+        gemitt = 1.
     else:
-        p_on_cut_at_s = p_on_cut_at_element
-
-    # Get cut in (accurate) sigmas
-    p_on_cut_norm = twiss.get_normalized_coordinates(p_on_cut_at_s,
-                                        nemitt_x=nemitt_x, nemitt_y=nemitt_y,
-                                        _force_at_element=0 # the twiss has only this element
-                                        )
-    if plane == 'x':
-        pencil_cut_sigmas = np.abs(p_on_cut_norm.x_norm)
-    else:
-        pencil_cut_sigmas = np.abs(p_on_cut_norm.y_norm)
+        gemitt = (nemitt / line.particle_ref._xobject.beta0[0]
+                  / line.particle_ref._xobject.gamma0[0])
+    pencil_cut_sigmas = np.abs(
+        (absolute_cut - w_co) / (np.sqrt(gemitt) * WW[i_w, i_w]))
 
     # Generate normalized pencil in the selected plane (here w is x or y according to plane)
     w_in_sigmas, pw_in_sigmas, r_points, theta_points = xp.generate_2D_pencil(
@@ -194,25 +234,192 @@ def generate_2D_pencil_with_absolute_cut(num_particles,
                              dr_sigmas=dr_sigmas,
                              side=side)
 
-    # Generate geometric coordinates in the selected plane only
-    # (by construction y_cut is preserved)
-    p_pencil_at_element = line.build_particles(
+    # Generate geometric coordinates in the selected plane only, directly at
+    # the location of the cut (by construction y_cut is preserved)
+    p_pencil_at_s = line.build_particles(
+                    W_matrix=WW, particle_on_co=particle_on_co,
                     nemitt_x=nemitt_x, nemitt_y=nemitt_y,
                     x_norm={'x': w_in_sigmas, 'y': None}[plane],
                     px_norm={'x': pw_in_sigmas, 'y': None}[plane],
                     y_norm={'x': None, 'y': w_in_sigmas}[plane],
                     py_norm={'x': None, 'y': pw_in_sigmas}[plane],
-                    zeta_norm=0, pzeta_norm=0,
-                    at_element=at_element, match_at_s=match_at_s, **kwargs)
-
-    if drift_to_at_s is not None:
-        p_pencil_at_s = p_pencil_at_element.copy()
-        drift_to_at_s.track(p_pencil_at_s)
-    else:
-        p_pencil_at_s = p_pencil_at_element
+                    zeta_norm=0, pzeta_norm=0)
 
     if plane=='x':
         return p_pencil_at_s.x, p_pencil_at_s.px
     else:
         return p_pencil_at_s.y, p_pencil_at_s.py
 
+
+
+def generate_2D_pencils_with_absolute_cut(num_particles,
+    plane, absolute_cut, dr_sigmas, at_element, side='+', line=None,
+    nemitt_x=None, nemitt_y=None, twiss=None, return_dict=False,
+    match_at_s=None, rng=None, _context=None, **kwargs):
+
+    '''
+    Generate 2D pencil beam distributions with absolute cuts at several
+    locations (e.g. collimator jaws) in one call.
+
+    The optics is computed with a single twiss of the line (or taken from
+    `twiss`, if provided) and the W matrix and closed orbit at each location
+    are taken from the twiss table, without building auxiliary particles.
+    As in `generate_2D_pencil_with_absolute_cut`, only the selected plane of
+    each pencil is populated, while the other transverse plane and the
+    longitudinal plane are left on the closed orbit.
+
+    Parameters
+    ----------
+    num_particles : int or array-like
+        Number of particles to be generated for each pencil.
+    plane : str or array-like
+        Plane of each pencil beam. Can be 'x' or 'y'.
+    absolute_cut : float or array-like
+        Absolute cut in meters for each pencil.
+    dr_sigmas : float or array-like
+        Radius of each pencil beam in sigmas.
+    at_element : str, int or array-like
+        Element (name or index) at which each pencil is generated.
+    side : str or array-like
+        Side of each pencil beam. Can be '+' or '-'.
+    line : xtrack.Line
+        Line for which the coordinates are generated.
+    nemitt_x : float
+        Normalized emittance in the horizontal plane (in m rad).
+    nemitt_y : float
+        Normalized emittance in the vertical plane (in m rad).
+    twiss : xtrack.TwissTable, optional
+        Twiss table of the line including all the `at_element` (e.g. the
+        twiss of the full line). If not provided it is computed as
+        `line.twiss(**kwargs)`.
+    return_dict : bool
+        If True, a dictionary is returned with one Particles object for each
+        pencil, keyed by `(element_name, plane, side)`. If False, a single
+        Particles object is returned containing all the pencils.
+    match_at_s : float or array-like, optional
+        Position at which each pencil is matched and cut (None for the
+        position of `at_element`). It must lie in the drifts downstream of
+        `at_element`: the optics is propagated through the drift and the
+        generated particles are backtracked to `at_element`.
+    rng : np.random.Generator, optional
+        Random number generator. If not provided, `np.random` is used.
+
+    Returns
+    -------
+    particles : xtrack.Particles or dict
+        Generated particles. In the concatenated output, the particles of
+        each pencil are tagged by `at_element` and `s` of the corresponding
+        location and are stored in the order in which the pencils are
+        specified.
+
+    '''
+
+    import xtrack as xt
+
+    assert line is not None
+    assert line.tracker is not None
+
+    (at_element, num_particles, plane, absolute_cut, dr_sigmas, side,
+        match_at_s) = np.broadcast_arrays(*[
+            np.atleast_1d(np.array(vv, dtype=object))
+            for vv in (at_element, num_particles, plane, absolute_cut,
+                       dr_sigmas, side, match_at_s)])
+
+    if line.iscollective:
+        line_optics = line._get_non_collective_line()
+    else:
+        line_optics = line
+
+    if twiss is None:
+        twiss = line_optics.twiss(**kwargs)
+
+    if _context is None:
+        _context = line._buffer.context
+
+    gemitt = {}
+    for pp, nemitt in zip('xy', [nemitt_x, nemitt_y]):
+        if nemitt is None:
+            gemitt[pp] = 1.
+        else:
+            gemitt[pp] = (nemitt / line.particle_ref._xobject.beta0[0]
+                          / line.particle_ref._xobject.gamma0[0])
+
+    pencils = []
+    exact_drifts = line_optics.config.get('XTRACK_USE_EXACT_DRIFTS', False)
+    for ee, nn, pp, cc, dr, sd, ss in zip(at_element, num_particles, plane,
+                                          absolute_cut, dr_sigmas, side,
+                                          match_at_s):
+
+        assert sd == '+' or sd == '-'
+        assert pp == 'x' or pp == 'y'
+
+        if isinstance(ee, str):
+            ee_name = ee
+        else:
+            ee_name = line_optics._element_names_unique[int(ee)]
+        i_ele = line_optics._element_names_unique.index(ee_name)
+
+        tw_init = twiss.get_twiss_init(at_element=ee_name)
+        WW = tw_init.W_matrix
+        particle_on_co = tw_init.particle_on_co
+        s_element = particle_on_co._xobject.s[0]
+        length_drift = 0
+        if ss is not None:
+            _check_drift_to_match_at_s(line_optics, i_ele, ss)
+            length_drift = ss - line_optics.get_s_position(i_ele)
+            WW, particle_on_co = _propagate_through_drift(WW, particle_on_co,
+                        length=length_drift, exact=exact_drifts)
+
+        i_w = {'x': 0, 'y': 2}[pp]
+        w_co = particle_on_co._xobject.x[0] if pp == 'x' else (
+                                            particle_on_co._xobject.y[0])
+
+        if sd == '+':
+            assert w_co < cc, 'The cut is on the wrong side'
+        else:
+            assert w_co > cc, 'The cut is on the wrong side'
+
+        # A particle on the jaw with no amplitude in the other eigenvectors
+        # has w = w_co + sqrt(gemitt) * W[i_w, i_w] * w_norm
+        pencil_cut_sigmas = np.abs(
+            (cc - w_co) / (np.sqrt(gemitt[pp]) * WW[i_w, i_w]))
+
+        w_in_sigmas, pw_in_sigmas, _, _ = generate_2D_pencil(
+                             num_particles=int(nn),
+                             pos_cut_sigmas=pencil_cut_sigmas,
+                             dr_sigmas=dr,
+                             side=sd, rng=rng)
+
+        # The W matrix and the closed orbit at the element are provided
+        # explicitly, so no twiss is performed here
+        pencil = xp.build_particles(
+                    _context=_context,
+                    W_matrix=WW,
+                    particle_on_co=particle_on_co,
+                    nemitt_x=nemitt_x, nemitt_y=nemitt_y,
+                    x_norm={'x': w_in_sigmas, 'y': 0}[pp],
+                    px_norm={'x': pw_in_sigmas, 'y': 0}[pp],
+                    y_norm={'x': 0, 'y': w_in_sigmas}[pp],
+                    py_norm={'x': 0, 'y': pw_in_sigmas}[pp],
+                    zeta_norm=0, pzeta_norm=0)
+        if length_drift != 0:
+            # Backtrack to at_element
+            _drift_particles(pencil, int(nn), -length_drift,
+                             exact=exact_drifts)
+        pencil.s[:] = s_element
+        pencil.at_element[:] = i_ele
+        pencil.start_tracking_at_element = i_ele
+
+        pencils.append(((ee_name, pp, sd), pencil))
+
+    if return_dict:
+        out = dict(pencils)
+        assert len(out) == len(pencils), (
+            'Pencils must have different (at_element, plane, side) '
+            'to be returned as a dictionary')
+        return out
+
+    particles = xt.Particles.merge([pencil for _, pencil in pencils])
+    particles.particle_id[:] = particles._buffer.context.nparray_to_context_array(
+                        np.arange(0, particles._capacity, dtype=np.int64))
+    return particles
@@ -3,10 +3,10 @@
 # Copyright (c) CERN, 2021.                 #
 # ######################################### #
 
-import itertools
-
 import numpy as np
 
+from ..sampling import _check_sampling, _seed_from_rng, qmc_uniform
+
 def _configure_grid(vname, v_grid, dv, v_range, nv):
 
     # Check input consistency
@@ -34,7 +34,7 @@ def _configure_grid(vname, v_grid, dv, v_range, nv):
                                     f'if d{vname} is not provided ')
             v_grid = np.linspace(v_range[0], v_range[1], nv)
 
-    return v_grid
+    return np.asarray(v_grid)
 
 
 def generate_2D_polar_grid(
@@ -79,19 +79,67 @@ def generate_2D_polar_grid(
     _theta_grid = _configure_grid('theta', theta_grid, dtheta,
                                   theta_range, ntheta)
 
-    temp = np.array([(ii[0], ii[1]) for ii in
-                    itertools.product(_r_grid, _theta_grid)])
-
-    r_all = temp[:, 0]
-    theta_all = temp[:, 1]
+    # Same ordering as itertools.product(r_grid, theta_grid)
+    r_all = np.repeat(_r_grid, len(_theta_grid))
+    theta_all = np.tile(_theta_grid, len(_r_grid))
 
     a1 = r_all*np.cos(theta_all)
     a2 = r_all*np.sin(theta_all)
 
     return a1, a2, r_all, theta_all
 
+
+def generate_2D_polar_grid_tiles(tile_size,
+        r_range=None, r_grid=None, dr=None, nr=None,
+        theta_range=None, theta_grid=None, dtheta=None, ntheta=None):
+
+    '''
+    Generate a 2D polar grid lazily, in tiles of at most `tile_size` points.
+    The concatenation of all tiles is identical to the output of
+    `generate_2D_polar_grid` called with the same grid parameters.
+
+    Parameters
+    ----------
+    tile_size : int
+        Maximum number of points in each tile.
+    r_range, r_grid, dr, nr, theta_range, theta_grid, dtheta, ntheta :
+        Grid definition, see `generate_2D_polar_grid`.
+
+    Yields
+    ------
+    a1 : np.ndarray
+        First normalized coordinate.
+    a2 : np.ndarray
+        Second normalized coordinate.
+    r_all : np.ndarray
+        Radial coordinate.
+    theta_all : np.ndarray
+        Angular coordinate.
+    '''
+
+    tile_size = int(tile_size)
+    assert tile_size > 0, 'tile_size must be positive'
+
+    _r_grid = _configure_grid('r', r_grid, dr, r_range, nr)
+    _theta_grid = _configure_grid('theta', theta_grid, dtheta,
+                                  theta_range, ntheta)
+
+    n_theta = len(_theta_grid)
+    n_tot = len(_r_grid) * n_theta
+
+    for i_start in range(0, n_tot, tile_size):
+        idx = np.arange(i_start, min(i_start + tile_size, n_tot))
+        r_all = _r_grid[idx // n_theta]
+        theta_all = _theta_grid[idx % n_theta]
+
+        a1 = r_all*np.cos(theta_all)
+        a2 = r_all*np.sin(theta_all)
+
+        yield a1, a2, r_all, theta_all
+
 def generate_2D_uniform_circular_sector(num_particles, r_range=(0, 1),
-                                        theta_range=(0, 2*np.pi)):
+                                        theta_range=(0, 2*np.pi),
+                                        sampling='pseudo', rng=None):
 
     '''
     Generate a 2D uniform circular sector.
@@ -104,6 +152,12 @@ def generate_2D_uniform_circular_sector(num_particles, r_range=(0, 1),
         Range of the radial coordinate.
     theta_range : tuple
         Range of the angular coordinate.
+    sampling : str
+        Sampling mode. Can be 'pseudo' (pseudo-random numbers), 'sobol' or
+        'halton' (scrambled low-discrepancy sequences).
+    rng : np.random.Generator, optional
+        Random number generator (used as scrambling seed for the
+        low-discrepancy sequences). If not provided, `np.random` is used.
 
     Returns
     -------
@@ -120,15 +174,23 @@ def generate_2D_uniform_circular_sector(num_particles, r_range=(0, 1),
     # CDF(r) = (r^2 - r0^2)/(r1^2 - r0^2)
     # InvCDF(u) = sqrt(r0^2 + u * (r1^2 -r0^2))
 
+    _check_sampling(sampling)
+
     r0 = r_range[0]
     r1 = r_range[1]
 
-    uu = np.random.uniform(low=0, high=1., size=num_particles)
+    if sampling == 'pseudo':
+        if rng is None:
+            rng = np.random
+        uu = rng.uniform(low=0, high=1., size=num_particles)
+        vv = rng.uniform(low=0, high=1., size=num_particles)
+    else:
+        uu, vv = qmc_uniform(num_particles, 2, sampling=sampling,
+                             seed=_seed_from_rng(rng)).T
 
     r_all = np.sqrt(r0*r0 + uu * (r1*r1 - r0*r0))
 
-    theta_all = np.random.uniform(low=theta_range[0], high=theta_range[1],
-                           size=num_particles)
+    theta_all = theta_range[0] + vv * (theta_range[1] - theta_range[0])
 
     a1 = r_all*np.cos(theta_all)
     a2 = r_all*np.sin(theta_all)
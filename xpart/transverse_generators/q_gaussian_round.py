@@ -9,8 +9,6 @@
 #################################################
 
 import numpy as np
-from scipy.special import gamma
-from scipy.interpolate import interp1d
 
 
 def generate_radial_distribution(q, beta, F):
@@ -31,6 +29,8 @@ def generate_radial_distribution(q, beta, F):
     assert q < 5/3, "q must be less than 5/3"
     assert beta > 0, "beta must be greater than 0"
 
+    from scipy.special import gamma
+
     term1 = -(beta**2) * (q - 3) * (q**2 - 1) / 4 / np.pi**2
     if abs(q - 1) < 1e-2:
         term2 = -1 / (1 - q)
@@ -87,6 +87,8 @@ def sample_from_inv_cdf(Np, cdf_g, F):
     Returns:
         np.ndarray: Sampled F values (F_G).
     """
+    from scipy.interpolate import interp1d
+
     cdf_g /= cdf_g[-1]  # normalize
     uniform_samples = np.random.uniform(0, 1, Np)
     interpolator = interp1d(